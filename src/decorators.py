@@ -1,5 +1,8 @@
+import threading
+from collections import OrderedDict
 from functools import wraps
-from time import monotonic
+
+from src.primitive_db.utils import ConflictError
 
 
 def handle_db_errors(func):
@@ -24,6 +27,8 @@ def handle_db_errors(func):
                   " не инициализирована.")
         except KeyError as e:
             print(f"Ошибка: Таблица или столбец {e} не найден.")
+        except ConflictError as e:
+            print(f"Ошибка: {e} Транзакция отменена, её изменения не сохранены.")
         except ValueError as e:
             print(f"Ошибка валидации: {e}")
         except Exception as e:
@@ -31,12 +36,26 @@ def handle_db_errors(func):
     return wrapper
 
 
+_settings = {"assume_yes": False}
+
+
+def set_assume_yes(value: bool) -> None:
+    """Включает или выключает автоматическое подтверждение действий.
+
+    Args:
+        value (bool): True — confirm_action не задаёт вопрос и сразу
+            выполняет действие.
+    """
+    _settings["assume_yes"] = value
+
+
 def confirm_action(action_name):
     """Декоратор для запроса подтверждения перед выполнением действия.
 
     Перед выполнением декорированной функции запрашивает подтверждение
     у пользователя. Если пользователь не подтверждает действие (не вводит 'y'),
-    функция не выполняется.
+    функция не выполняется. После set_assume_yes(True) действие выполняется
+    без вопроса.
 
     Args:
         action_name (str): Название действия для отображения в запросе подтверждения.
@@ -47,6 +66,8 @@ def confirm_action(action_name):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if _settings["assume_yes"]:
+                return func(*args, **kwargs)
             answer = input(
                 f'Вы уверены, что хотите выполнить "{action_name}"? [y/n]: '
             ).strip().lower()
@@ -61,37 +82,72 @@ def confirm_action(action_name):
 
     return decorator
 
-def log_time(func):
-    """Декоратор для логирования времени выполнения функции.
+def create_cacher(max_entries=None, max_bytes=None):
+    """Создаёт LRU-кэш результатов с группами ключей и счётчиками.
+
+    Ключ кэша — кортеж, первый элемент которого задаёт группу (например,
+    имя таблицы): clear(group) сбрасывает только записи этой группы.
+    При превышении количества записей или суммарного размера вытесняются
+    давно не использованные записи. Методы кэша можно вызывать из
+    нескольких потоков.
 
     Args:
-        func: Декорируемая функция.
+        max_entries (int, optional): Максимальное количество записей.
+        max_bytes (int, optional): Максимальный суммарный размер записей.
 
     Returns:
-        Обёрнутая функция с логированием времени выполнения.
+        function: Функция cache_result(key, value_func) с методами
+            get, put, clear и stats.
     """
-    
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        start_time = monotonic()
-        result = func(*args, **kwargs)
-        end_time = monotonic()
-        elapsed_time = end_time - start_time
-        print(f"Функция {func.__name__} выполнилась за {elapsed_time:.3f} секунд")
-        return result
-    return wrapper
-
-def create_cacher():
-    cache= {}
+    cache = OrderedDict()
+    stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0,
+             "bytes": 0}
+    lock = threading.RLock()
+
+    def get(key):
+        with lock:
+            if key not in cache:
+                stats["misses"] += 1
+                return None
+            stats["hits"] += 1
+            cache.move_to_end(key)
+            return cache[key][0]
+    def put(key, value, size=0):
+        with lock:
+            if key in cache:
+                stats["bytes"] -= cache.pop(key)[1]
+            if max_bytes is not None and size > max_bytes:
+                return
+            cache[key] = (value, size)
+            stats["bytes"] += size
+            while cache and (
+                (max_entries is not None and len(cache) > max_entries)
+                or (max_bytes is not None and stats["bytes"] > max_bytes)
+            ):
+                _, (_, evicted_size) = cache.popitem(last=False)
+                stats["bytes"] -= evicted_size
+                stats["evictions"] += 1
+    def clear(group=None):
+        with lock:
+            keys = [key for key in cache if group is None or key[0] == group]
+            for key in keys:
+                stats["bytes"] -= cache.pop(key)[1]
+            stats["invalidations"] += len(keys)
+    def get_stats():
+        with lock:
+            return {**stats, "entries": len(cache)}
 
     def cache_result(key, value_func):
-        if key in cache:
-            return cache[key]
+        with lock:
+            if key in cache:
+                return get(key)
+            stats["misses"] += 1
         value = value_func()
-        cache[key] = value
+        put(key, value)
         return value
-    def clear():
-        cache.clear()
 
+    cache_result.get = get # type:ignore
+    cache_result.put = put # type:ignore
     cache_result.clear = clear # type:ignore
+    cache_result.stats = get_stats # type:ignore
     return cache_result
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from collections.abc import Callable
+from importlib import metadata as package_metadata
+from time import perf_counter_ns
+
+from src.decorators import set_assume_yes
+
+from .codec import CODEC
+from .consts import META_LOCATION, PROFILE_TOP
+from .core import (
+    create_index,
+    create_table,
+    delete,
+    insert,
+    iter_select,
+    load_file,
+    update,
+)
+from .engine import cache_result, show_select
+from .parser import parse_statement, parse_where
+from .storage import STORAGES, migrate_table, wait_compactions
+from .table import ColumnTable
+from .utils import (
+    invalidate_cache,
+    load_metadata,
+    load_table_data,
+    save_metadata,
+    save_table_data,
+    set_row_count,
+    table_indexes,
+    table_state,
+)
+
+BENCH_TABLE = "bench"
+DEFAULT_SCHEMA = ["name:str", "age:int", "vip:bool"]
+SCENARIOS = ("insert", "bulk_insert", "point_select", "full_scan", "update",
+             "delete", "cached_select", "cold_start", "parse", "serialize",
+             "startup")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки.
+
+    Args:
+        argv (list[str], optional): Аргументы. По умолчанию sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: Разобранные аргументы.
+    """
+    parser = argparse.ArgumentParser(
+        prog="database-bench",
+        description="Замеры производительности основных операций базы данных.")
+    parser.add_argument("-n", "--rows", type=int, default=100_000,
+                        help="количество записей синтетической таблицы")
+    parser.add_argument("-s", "--schema", nargs="+", default=DEFAULT_SCHEMA,
+                        metavar="СТОЛБЕЦ:ТИП", help="столбцы таблицы")
+    parser.add_argument("-r", "--repeat", type=int, default=200,
+                        help="количество замеров в сценарии")
+    parser.add_argument("--batch", type=int, default=10_000,
+                        help="размер пачки в сценариях bulk_insert и parse")
+    parser.add_argument("--storage", choices=sorted(STORAGES), default="log",
+                        help="хранилище таблицы")
+    parser.add_argument("--index", action="store_true",
+                        help="построить индексы по всем столбцам")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="начальное значение генератора данных")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS,
+                        default=list(SCENARIOS), metavar="СЦЕНАРИЙ",
+                        help=f"выполняемые сценарии: {', '.join(SCENARIOS)}")
+    parser.add_argument("-o", "--output", metavar="ФАЙЛ",
+                        help="файл для результатов json (по умолчанию stdout)")
+    return parser.parse_args(argv)
+
+
+def make_value(rng: random.Random, col_type: str, rows: int):
+    """Генерирует значение столбца синтетической таблицы."""
+    if col_type == "int":
+        return rng.randrange(rows)
+    if col_type == "bool":
+        return rng.random() < 0.5
+    return f"s{rng.randrange(max(rows // 10, 1))}"
+
+
+def make_rows(rng: random.Random, columns: dict, count: int, rows: int,
+              first_id: int = 1) -> list[dict]:
+    """Генерирует записи синтетической таблицы.
+
+    Args:
+        rng (random.Random): Генератор случайных чисел.
+        columns (dict): Столбцы без ID (имя: тип).
+        count (int): Количество записей.
+        rows (int): Размер таблицы, задающий разброс значений.
+        first_id (int): ID первой записи.
+
+    Returns:
+        list[dict]: Записи по возрастанию ID.
+    """
+    return [{"ID": first_id + i,
+             **{name: make_value(rng, typ, rows) for name, typ in columns.items()}}
+            for i in range(count)]
+
+
+def make_statements(rng: random.Random, columns: dict, count: int,
+                    rows: int) -> list[str]:
+    """Генерирует команды insert, select, update и delete для разбора.
+
+    Строковые значения записываются в кавычках и содержат пробелы,
+    запятые и '='.
+    """
+    def literal(col_type: str) -> str:
+        value = make_value(rng, col_type, rows)
+        return f'"{value}, x = {value}"' if col_type == "str" else str(value).lower()
+
+    name, typ = next(iter(columns.items()))
+    statements = []
+    for i in range(count):
+        where = f"ID = {rng.randrange(1, rows + 1)}"
+        match i % 4:
+            case 0:
+                values = ", ".join(literal(t) for t in columns.values())
+                statements.append(f"insert into {BENCH_TABLE} values ({values})")
+            case 1:
+                statements.append(f"select from {BENCH_TABLE} where {where} "
+                                  f"or {name} = {literal(typ)} limit 10")
+            case 2:
+                statements.append(f"update {BENCH_TABLE} set {name} = "
+                                  f"{literal(typ)} where {where}")
+            case _:
+                statements.append(f"delete from {BENCH_TABLE} where {where}")
+    return statements
+
+
+def percentile(quantiles: list[float], p: int) -> float:
+    return quantiles[p - 1] / 1e6
+
+
+def measure(op: Callable[[], object], repeat: int) -> dict:
+    """Замеряет операцию несколько раз.
+
+    Время замеряется без трассировки памяти; пиковый объём выделенной
+    памяти — отдельным запуском под tracemalloc.
+
+    Args:
+        op (Callable): Замеряемая операция.
+        repeat (int): Количество замеров.
+
+    Returns:
+        dict: Количество операций, операций в секунду, задержки p50, p95
+            и p99 в миллисекундах, пик памяти операции в байтах и
+            максимальный размер процесса в КБ.
+    """
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = perf_counter_ns()
+            op()
+            timings.append(perf_counter_ns() - start)
+        tracemalloc.start()
+        op()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    quantiles = statistics.quantiles(timings, n=100, method="inclusive") \
+        if len(timings) > 1 else timings * 99
+    total = sum(timings)
+    return {
+        "ops": len(timings),
+        "ops_per_sec": round(len(timings) * 1e9 / total, 2) if total else None,
+        "p50_ms": round(percentile(quantiles, 50), 4),
+        "p95_ms": round(percentile(quantiles, 95), 4),
+        "p99_ms": round(percentile(quantiles, 99), 4),
+        "peak_memory_bytes": peak,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+class Bench:
+    """Синтетическая таблица и сценарии замеров над ней.
+
+    Сценарии вызывают функции core и utils так же, как это делает
+    engine, включая сохранение изменений на диск.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.columns = dict(col.split(":") for col in args.schema)
+        self.int_column = next((name for name, typ in self.columns.items()
+                                if typ == "int"), "ID")
+
+    def setup(self) -> None:
+        """Создаёт таблицу, заполняет её и переносит в нужное хранилище.
+
+        Raises:
+            RuntimeError: Если таблицу не удалось подготовить.
+        """
+        with contextlib.redirect_stdout(io.StringIO()):
+            metadata = create_table({}, BENCH_TABLE, self.columns)
+            table = ColumnTable(make_rows(self.rng, self.columns, self.args.rows,
+                                          self.args.rows))
+            table_state(metadata, BENCH_TABLE)["next_id"] = len(table) + 1
+            set_row_count(metadata, BENCH_TABLE, table)
+            save_table_data(BENCH_TABLE, table)
+            if self.args.storage != STORAGES["log"].name:
+                migrate_table(BENCH_TABLE, self.args.storage)
+            if self.args.index:
+                for column in self.columns:
+                    metadata = create_index(metadata, BENCH_TABLE, column)
+            save_metadata(META_LOCATION, metadata)
+        if len(load_table_data(BENCH_TABLE)) != self.args.rows:
+            raise RuntimeError("Не удалось подготовить таблицу для замеров.")
+
+    @property
+    def metadata(self) -> dict:
+        return load_metadata(META_LOCATION)
+
+    @property
+    def indexes(self) -> dict:
+        return table_indexes(self.metadata, BENCH_TABLE)
+
+    def random_id(self) -> int:
+        ids = load_table_data(BENCH_TABLE).ids
+        return ids[self.rng.randrange(len(ids))]
+
+    def insert(self) -> None:
+        metadata = self.metadata
+        values = [str(make_value(self.rng, typ, self.args.rows)).lower()
+                  for typ in self.columns.values()]
+        table = insert(metadata, BENCH_TABLE, [values])
+        save_metadata(META_LOCATION, metadata)
+        save_table_data(BENCH_TABLE, table)
+
+    def bulk_insert(self) -> None:
+        metadata = self.metadata
+        table = load_file(metadata, BENCH_TABLE, self.batch_path, "csv")
+        save_metadata(META_LOCATION, metadata)
+        save_table_data(BENCH_TABLE, table)
+
+    def point_select(self) -> list:
+        where = parse_where(f"ID = {self.random_id()}")
+        return list(iter_select(load_table_data(BENCH_TABLE), where, self.indexes))
+
+    def full_scan(self) -> int:
+        bound = self.rng.randrange(self.args.rows)
+        where = parse_where(f"{self.int_column} >= {bound}")
+        return sum(1 for _ in iter_select(load_table_data(BENCH_TABLE), where))
+
+    def update(self) -> None:
+        name, typ = next(iter(self.columns.items()))
+        where = parse_where(f"ID = {self.random_id()}")
+        table = update(load_table_data(BENCH_TABLE),
+                       {name: make_value(self.rng, typ, self.args.rows)},
+                       where, self.indexes)
+        save_table_data(BENCH_TABLE, table)
+
+    def delete(self) -> None:
+        metadata = self.metadata
+        where = parse_where(f"ID = {self.random_id()}")
+        table = delete(load_table_data(BENCH_TABLE), where, self.indexes)
+        set_row_count(metadata, BENCH_TABLE, table)
+        save_metadata(META_LOCATION, metadata)
+        save_table_data(BENCH_TABLE, table)
+
+    def cached_select(self) -> None:
+        show_select(BENCH_TABLE, self.cached_where, self.metadata, 10, 0, "jsonl")
+
+    def cold_start(self) -> list:
+        invalidate_cache()
+        return self.point_select()
+
+    def parse(self) -> None:
+        parse_statement.cache_clear()
+        for text in self.statements:
+            parse_statement(text)
+
+    def serialize(self, repeat: int) -> dict:
+        """Сравнивает сохранение и загрузку json хранилища с форматом indent=4.
+
+        Args:
+            repeat (int): Количество замеров каждой операции.
+
+        Returns:
+            dict: Библиотека json и для каждого формата — размер файла
+                в байтах и замеры сохранения и загрузки (см. measure).
+        """
+        table = ColumnTable(list(load_table_data(BENCH_TABLE)))
+        storage = STORAGES["json"]
+        name = f"{BENCH_TABLE}_json"
+        path = storage.path(name)
+
+        def save_indented():
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(list(table), f, indent=4)
+
+        def load_indented():
+            with open(path, 'r', encoding='utf-8') as f:
+                return ColumnTable(json.load(f))
+
+        results = {"codec": CODEC}
+        for fmt, save, load in (
+                ("compact", lambda: storage.save(name, table),
+                 lambda: storage.load(name)),
+                ("indent4", save_indented, load_indented)):
+            saved = measure(save, repeat)
+            results[fmt] = {"file_bytes": os.path.getsize(path), "save": saved,
+                            "load": measure(load, repeat)}
+        storage.remove(name)
+        return results
+
+    def startup(self) -> None:
+        subprocess.run(self.startup_command, env=self.startup_env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def import_breakdown(self) -> dict:
+        """Замеряет импорт модулей при запуске (python -X importtime).
+
+        Returns:
+            dict: Общее время импорта в миллисекундах и PROFILE_TOP
+                модулей с наибольшим временем импорта вместе с вложенными.
+        """
+        result = subprocess.run([sys.executable, "-X", "importtime",
+                                 *self.startup_command[1:]],
+                                env=self.startup_env, check=True, text=True,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        imports = []
+        total = 0
+        for line in result.stderr.splitlines():
+            fields = line.removeprefix("import time:").split("|")
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue
+            # Вложенные импорты выводятся с дополнительным отступом.
+            if not fields[2].startswith("  "):
+                total += int(fields[1])
+            imports.append((int(fields[1]), fields[2].strip()))
+        top = sorted(imports, reverse=True)[:PROFILE_TOP]
+        return {"import_ms": round(total / 1000, 3),
+                "imports": [{"module": name, "cumulative_ms": round(us / 1000, 3)}
+                            for us, name in top]}
+
+    def run(self, scenario: str) -> dict:
+        """Выполняет сценарий и возвращает его замеры (см. measure)."""
+        repeat = self.args.repeat
+        if scenario == "serialize":
+            return self.serialize(max(repeat // 20, 1))
+        if scenario == "startup":
+            root = os.path.dirname(os.path.dirname(os.path.dirname(
+                os.path.abspath(__file__))))
+            self.startup_env = {**os.environ, "PYTHONPATH": os.pathsep.join(
+                filter(None, (root, os.environ.get("PYTHONPATH"))))}
+            self.startup_command = [sys.executable, "-m", "src.primitive_db.main",
+                                    "-e", f"info {BENCH_TABLE}"]
+            return {**measure(self.startup, max(repeat // 10, 1)),
+                    **self.import_breakdown()}
+        if scenario == "bulk_insert":
+            self.batch_path = os.path.abspath("batch.csv")
+            with open(self.batch_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.columns))
+                writer.writeheader()
+                for row in make_rows(self.rng, self.columns, self.args.batch,
+                                     self.args.rows):
+                    writer.writerow({k: v for k, v in row.items() if k != "ID"})
+            repeat = max(repeat // 20, 1)
+        elif scenario == "full_scan":
+            repeat = max(repeat // 10, 1)
+        elif scenario == "cold_start":
+            repeat = max(repeat // 10, 1)
+        elif scenario == "parse":
+            self.statements = make_statements(self.rng, self.columns,
+                                              self.args.batch, self.args.rows)
+            repeat = max(repeat // 20, 1)
+        elif scenario == "cached_select":
+            self.cached_where = parse_where(
+                f"{self.int_column} < {self.args.rows // 2}")
+            cache_result.clear()  # type: ignore
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.cached_select()
+        return measure(getattr(self, scenario), repeat)
+
+
+def run_bench(args: argparse.Namespace) -> dict:
+    """Выполняет сценарии во временном каталоге базы данных.
+
+    Args:
+        args (argparse.Namespace): Параметры замеров.
+
+    Returns:
+        dict: Параметры, окружение и результаты сценариев.
+    """
+    try:
+        version = package_metadata.version("project2-perceva-m25-555")
+    except package_metadata.PackageNotFoundError:
+        version = "unknown"
+    set_assume_yes(True)
+    cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="primitive_db_bench_") as workdir:
+        os.chdir(workdir)
+        try:
+            bench = Bench(args)
+            bench.setup()
+            for scenario in args.scenarios:
+                results[scenario] = bench.run(scenario)
+        finally:
+            wait_compactions()
+            os.chdir(cwd)
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"rows": args.rows, "schema": args.schema, "repeat": args.repeat,
+                   "batch": args.batch, "storage": args.storage,
+                   "index": args.index, "seed": args.seed},
+        "scenarios": results,
+    }
+
+
+def main():
+    args = parse_args()
+    report = json.dumps(run_bench(args), indent=4, ensure_ascii=False)
+    if args.output is None:
+        print(report)
+        return
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(report + "\n")
+    print(f"Результаты записаны в {args.output}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+def file_stamp(path: str) -> tuple[int, int] | None:
+    """Возвращает отметку актуальности файла: время изменения и размер.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        tuple[int, int] | None: Пара (mtime_ns, size) или None,
+            если файла нет.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class TableCache:
+    """LRU-кэш разобранных файлов с проверкой актуальности по отметке файла.
+
+    Запись считается актуальной, пока отметка файла (см. file_stamp)
+    совпадает с сохранённой. При превышении бюджета памяти вытесняются
+    давно не использованные записи. Размер записи оценивается по размеру
+    файла на диске. Методы кэша можно вызывать из нескольких потоков.
+    """
+
+    def __init__(self, budget: int | None = None):
+        """
+        Args:
+            budget (int | None): Бюджет памяти в байтах. None — без ограничений.
+        """
+        self.budget = budget
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._used = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0,
+                          "invalidations": 0}
+        self._lock = threading.RLock()
+
+    def get(self, key: str, stamp):
+        """Возвращает закэшированное значение, если отметка файла не изменилась.
+
+        Args:
+            key (str): Ключ записи.
+            stamp: Текущая отметка файла.
+
+        Returns:
+            Значение или None, если записи нет или она устарела.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            if entry[0] != stamp:
+                self.invalidate(key)
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, stamp, value, size: int = 0) -> None:
+        """Сохраняет значение и вытесняет старые записи сверх бюджета.
+
+        Значения больше всего бюджета не кэшируются.
+
+        Args:
+            key (str): Ключ записи.
+            stamp: Отметка файла, соответствующая значению.
+            value: Кэшируемое значение.
+            size (int): Оценка размера значения в байтах.
+        """
+        with self._lock:
+            self._drop(key)
+            if self.budget is not None and size > self.budget:
+                return
+            self._entries[key] = (stamp, value, size)
+            self._used += size
+            while self.budget is not None and self._used > self.budget:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._used -= evicted
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key: str | None = None) -> None:
+        """Удаляет запись из кэша.
+
+        Args:
+            key (str | None): Ключ записи. Если не указан, кэш очищается целиком.
+        """
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for name in keys:
+                if self._drop(name):
+                    self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        """Возвращает счётчики кэша.
+
+        Returns:
+            dict: Количество записей, объём и счётчики попаданий, промахов,
+                вытеснений и сбросов.
+        """
+        with self._lock:
+            return {**self._counters, "entries": len(self._entries),
+                    "bytes": self._used}
+
+    def _drop(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._used -= entry[2]
+        return True
@@ -0,0 +1,98 @@
+import json
+import socket
+
+import prompt
+
+from .consts import SERVER_HOST, SERVER_SOCKET
+from .parser import parse_command
+
+PROMPT = ">>>Введите команду: "
+# Команды, которые без флага --yes подтверждаются на стороне клиента.
+CONFIRMED_COMMANDS = {"drop_table": "удаление таблицы",
+                      "delete": "удаление записей"}
+
+
+def connect(socket_path: str = SERVER_SOCKET,
+            port: int | None = None) -> socket.socket:
+    """Подключается к серверу базы данных.
+
+    Args:
+        socket_path (str): Путь к Unix-сокету сервера.
+        port (int | None): Порт TCP на localhost; если задан, вместо
+            сокета используется он.
+
+    Returns:
+        socket.socket: Соединение с сервером.
+    """
+    if port is None:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(socket_path)
+    else:
+        conn = socket.create_connection((SERVER_HOST, port))
+    return conn
+
+
+def confirmed(statement: str) -> bool:
+    """Запрашивает подтверждение удаления у пользователя.
+
+    Args:
+        statement (str): Команда.
+
+    Returns:
+        bool: False, если команда удаления не подтверждена.
+    """
+    try:
+        cmd, _ = parse_command(statement)
+    except ValueError:
+        return True
+    action = CONFIRMED_COMMANDS.get(cmd.lower())
+    if action is None:
+        return True
+    answer = input(f'Вы уверены, что хотите выполнить "{action}"? [y/n]: ')
+    if answer.strip().lower() != "y":
+        print("Операция отменена.")
+        return False
+    return True
+
+
+def run_client(statements: list[str] | None = None,
+               socket_path: str = SERVER_SOCKET, port: int | None = None,
+               assume_yes: bool = False) -> None:
+    """Отправляет команды серверу и выводит ответы.
+
+    Без statements команды читаются интерактивно до exit. Каждая команда
+    выполняется и фиксируется сервером отдельно.
+
+    Args:
+        statements (list[str] | None): Команды скрипта.
+        socket_path (str): Путь к Unix-сокету сервера.
+        port (int | None): Порт TCP на localhost.
+        assume_yes (bool): Подтверждать удаление без вопроса.
+
+    Raises:
+        OSError: Если к серверу не удалось подключиться.
+    """
+    with connect(socket_path, port) as conn, \
+            conn.makefile('r', encoding='utf-8') as responses:
+        lines = iter(statements) if statements is not None else None
+        while True:
+            if lines is None:
+                try:
+                    statement = prompt.string(PROMPT).strip()  # type: ignore
+                except (KeyboardInterrupt, EOFError):
+                    statement = "exit"
+            else:
+                statement = next(lines, None)
+                if statement is None:
+                    break
+            if not statement or not (assume_yes or confirmed(statement)):
+                continue
+            conn.sendall(statement.replace("\n", " ").encode('utf-8') + b"\n")
+            line = responses.readline()
+            if not line:
+                print("Сервер закрыл соединение.")
+                break
+            response = json.loads(line)
+            print(response["output"], end="")
+            if response["exit"]:
+                break
@@ -0,0 +1,86 @@
+import json
+import os
+from collections.abc import Iterable
+from itertools import batched
+
+from .consts import JSON_WRITE_BATCH
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CODEC = "json" if orjson is None else "orjson"
+
+
+def dumps(value) -> bytes:
+    """Сериализует значение в компактный json в кодировке utf-8.
+
+    Если установлен orjson, используется он; значения, которые orjson
+    не поддерживает (например, целые длиннее 64 бит или ключи не
+    строки), сериализуются стандартным json.
+
+    Args:
+        value: Сериализуемое значение.
+
+    Returns:
+        bytes: json без отступов и пробелов.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            pass
+    return json.dumps(value, ensure_ascii=False,
+                      separators=(",", ":")).encode('utf-8')
+
+
+def loads(data: bytes | str):
+    """Разбирает json, используя orjson, если он установлен.
+
+    Args:
+        data (bytes | str): Текст json.
+
+    Returns:
+        Разобранное значение.
+
+    Raises:
+        json.JSONDecodeError: Если текст не является корректным json.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson не разбирает целые длиннее 64 бит, а стандартный json
+            # их разбирает; действительно ошибочный текст вызовет ошибку
+            # и здесь.
+            pass
+    return json.loads(data)
+
+
+def write_json_array(path: str, rows: Iterable) -> int:
+    """Записывает элементы в файл как компактный json-массив.
+
+    Массив сериализуется пачками по JSON_WRITE_BATCH элементов, поэтому
+    большая таблица не собирается в памяти одной строкой. Запись идёт во
+    временный файл, который затем подменяет path, так что файл никогда
+    не бывает прочитан записанным наполовину.
+
+    Args:
+        path (str): Путь к файлу.
+        rows (Iterable): Элементы массива.
+
+    Returns:
+        int: Размер записанного файла в байтах.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        separator = b"["
+        for batch in batched(rows, JSON_WRITE_BATCH):
+            f.write(separator)
+            f.write(dumps(batch)[1:-1])
+            separator = b","
+        f.write(b"[]" if separator == b"[" else b"]")
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
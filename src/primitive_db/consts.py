@@ -1,2 +1,41 @@
 META_LOCATION = "db_meta.json"
 DATA_FOLDER = "data/"
+TABLE_STATE_KEY = "__state__"
+WAL_LOCATION = "db_wal.log"
+WAL_CHECKPOINT_BYTES = 16 * 1024 * 1024
+LOCK_SUFFIX = ".lock"
+COMMIT_RETRIES = 5
+COMMIT_RETRY_DELAY = 0.05
+
+DEFAULT_STORAGE = "log"
+BINARY_MAGIC = b"PDBBIN1\n"
+COMPRESSION_BLOCK_BYTES = 1024 * 1024
+COMPRESSION_LEVELS = {"zlib": 6, "lzma": 0}
+COMPACTION_MIN_RECORDS = 1000
+COMPACTION_RATIO = 2
+PARALLEL_LOAD_MIN_BYTES = 8 * 1024 * 1024
+
+INDEX_SCAN_MAX_SHARE = 0.25
+INDEX_MERGE_MIN_ENTRIES = 64
+
+TABLE_CACHE_BUDGET = 256 * 1024 * 1024
+
+SELECT_PAGE_SIZE = 100
+SELECT_CACHE_MAX_ROWS = 10000
+SELECT_CACHE_MAX_ENTRIES = 256
+SELECT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500,
+                      1000, 2500, 5000, 10000, 30000)
+PROFILE_TOP = 15
+
+SERVER_SOCKET = "db.sock"
+SERVER_HOST = "127.0.0.1"
+SERVER_MAX_LINE = 16 * 1024 * 1024
+
+STATEMENT_CACHE_SIZE = 4096
+
+SORT_RUN_ROWS = 1_000_000
+SORT_SPILL_BLOCK = 10_000
+
+JSON_WRITE_BATCH = 10_000
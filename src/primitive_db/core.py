@@ -1,38 +1,118 @@
-from src.decorators import confirm_action, handle_db_errors, log_time
-
-from .utils import load_table_data
+import heapq
+from collections.abc import Callable, Iterable
+from itertools import chain, islice
+from operator import itemgetter
+from time import monotonic
+
+from src.decorators import confirm_action, handle_db_errors
+
+from .consts import INDEX_SCAN_MAX_SHARE, TABLE_STATE_KEY
+from .index import (
+    ORDERED_TYPES,
+    PY_TYPES,
+    build_index,
+    index_add,
+    index_add_many,
+    index_remove,
+    index_scan,
+)
+from .loader import detect_format, read_rows
+from .locks import write_locked
+from .metrics import add_count, phase, timed
+from .schema import ALLOWED_TYPES, convert_row, convert_value
+from .sort import ordered_positions
+from .storage import PARTITIONED, migrate_table
+from .utils import (
+    begin_transaction,
+    commit_transaction,
+    flush_writes,
+    in_transaction,
+    index_columns,
+    load_indexes,
+    load_table_data,
+    peek_next_id,
+    reserve_ids,
+    rollback_transaction,
+    row_count,
+    scan_partitions,
+    set_row_count,
+    table_exists,
+    table_indexes,
+    table_names,
+    table_state,
+    table_storage,
+)
+
+NUMERIC_AGGREGATES = {"sum", "avg"}
+SELECTIVITY_RANK = {"=": 0, "in": 1, "<": 2, "<=": 2, ">": 2, ">=": 2, "!=": 3}
 
 
 @handle_db_errors
-def create_table(metadata: dict, table_name: str, columns: dict) -> dict:
+def create_table(metadata: dict, table_name: str, columns: dict,
+                 partitions: dict | None = None) -> dict:
     """Создает новую таблицу в метаданных.
 
     Args:
         metadata (dict): Метаданные всех таблиц.
         table_name (str): Имя создаваемой таблицы.
         columns (dict): Словарь с именами и типами столбцов.
+        partitions (dict, optional): Схема секционирования таблицы
+            (см. parse_partition).
 
     Raises:
+        ValueError: Если имя таблицы зарезервировано.
         ValueError: Если столбец с именем 'ID' присутствует в columns.
         ValueError: Если таблица с таким именем уже существует.
         ValueError: Если тип столбца недопустим.
+        ValueError: Если схема секционирования некорректна.
 
     Returns:
         dict: Обновленные метаданные с добавленной таблицей.
     """
+    if table_name == TABLE_STATE_KEY:
+        raise ValueError(f'Имя таблицы "{table_name}" зарезервировано.')
     if 'id' in {x.lower() for x in columns}:
         raise ValueError("Столбец с именем 'ID' зарезервирован и " \
         "добавляется автоматически.")
-    if table_name in metadata:
+    if table_exists(metadata, table_name):
         raise ValueError(f'Таблица "{table_name}" уже существует.')
-    if not all(col_type in {'int', 'str', 'bool'} for col_type in columns.values()):
+    if not all(col_type in ALLOWED_TYPES for col_type in columns.values()):
         raise ValueError("Недопустимый тип столбца. Допустимые типы: int, str, bool.")
-    metadata_tmp = {**metadata, table_name: {"ID": "int", **columns}}
+    state = {"next_id": 1, "rows": 0}
+    if partitions:
+        _check_partitions({"ID": "int", **columns}, partitions)
+        state["partitions"] = partitions
+    metadata_tmp = {
+        **metadata,
+        table_name: {"ID": "int", **columns},
+        TABLE_STATE_KEY: {**metadata.get(TABLE_STATE_KEY, {}), table_name: state},
+    }
     cols_str = ", ".join(f"{name}:{typ}" for name, typ in 
                          metadata_tmp[table_name].items())
     print(f'Таблица "{table_name}" успешно создана со столбцами: {cols_str}.')
     return metadata_tmp
 
+def _check_partitions(schema: dict, partitions: dict) -> None:
+    """Проверяет схему секционирования по столбцам таблицы.
+
+    Raises:
+        KeyError: Если ключевого столбца нет в таблице.
+        ValueError: Если сегментов меньше двух или границы диапазонов не
+            возрастают либо не совпадают по типу со столбцом.
+    """
+    col_type = schema[partitions["column"]]
+    if partitions["kind"] == "hash":
+        if partitions["segments"] < 2:
+            raise ValueError("Количество сегментов должно быть не меньше 2.")
+        return
+    bounds = partitions["bounds"]
+    if col_type not in ORDERED_TYPES \
+            or any(type(bound) is not PY_TYPES[col_type] for bound in bounds):
+        raise ValueError(f"Границы диапазонов должны быть значениями {col_type}, "
+                         "а столбец — типа int или str.")
+    if any(left >= right for left, right in zip(bounds, bounds[1:])):
+        raise ValueError("Границы диапазонов должны возрастать.")
+
 @handle_db_errors
 @confirm_action("удаление таблицы")
 def drop_table(metadata: dict, table_name: str) -> dict:
@@ -47,10 +127,14 @@ def drop_table(metadata: dict, table_name: str) -> dict:
     Returns:
         dict: Обновленные метаданные без удаленной таблицы.
     """
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         raise KeyError(table_name)
     print(f'Таблица "{table_name}" успешно удалена.')
-    return {k: v for k, v in metadata.items() if k != table_name}
+    new_meta = {k: v for k, v in metadata.items() if k != table_name}
+    if TABLE_STATE_KEY in new_meta:
+        new_meta[TABLE_STATE_KEY] = {k: v for k, v in new_meta[TABLE_STATE_KEY].items()
+                                     if k != table_name}
+    return new_meta
     
 def list_tables(metadata: dict) -> None:
     """Выводит список всех таблиц в метаданных.
@@ -58,21 +142,26 @@ def list_tables(metadata: dict) -> None:
     Args:
         metadata (dict): Метаданные всех таблиц.
     """
-    if metadata:
-        for table_name in metadata.keys():
+    names = table_names(metadata)
+    if names:
+        for table_name in names:
             print(f"- {table_name}")
     else:
         print("Таблиц нет.")
 
 @handle_db_errors
-@log_time
-def insert(metadata, table_name, values):
-    """Вставляет новую запись в таблицу.
+def insert(metadata, table_name, rows):
+    """Вставляет новые записи в таблицу.
+
+    Все записи проверяются по схеме до изменения таблицы, поэтому при
+    ошибке в любой из них не вставляется ни одна. Затем записи
+    добавляются в таблицу и индексы разом.
 
     Args:
         metadata (dict): Метаданные всех таблиц.
         table_name (str): Имя таблицы для вставки данных.
-        values (list): Список значений для вставки.
+        rows (list): Значения записей: для каждой — список значений по
+            порядку столбцов без ID (см. parse_statement).
 
     Raises:
         KeyError: Если таблица не существует.
@@ -80,141 +169,666 @@ def insert(metadata, table_name, values):
         ValueError: Если тип значения не соответствует типу столбца.
 
     Returns:
-        list: Обновленные данные таблицы с добавленной записью.
+        ColumnTable: Обновленные данные таблицы с добавленными записями.
     """
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         raise KeyError(table_name)
-    
-    cleaned = []
-    for x in values:
-        x = x.replace("(", "").replace(")", "").replace(",", "").strip()
-        cleaned.append(x)
-    values = cleaned
 
     schema = metadata[table_name]
 
     columns = [(col, typ) for col, typ in schema.items() if col != "ID"]
 
-    if len(values) != len(columns):
-        raise ValueError("Количество значений не соответствует количеству столбцов.")
+    records = []
+    for number, values in enumerate(rows, 1):
+        try:
+            if len(values) != len(columns):
+                raise ValueError("Количество значений не соответствует количеству"
+                                 " столбцов.")
+            records.append({col_name: convert_value(col_type, raw)
+                            for (col_name, col_type), raw in zip(columns, values)})
+        except ValueError as e:
+            if len(rows) == 1:
+                raise
+            raise ValueError(f"запись {number}: {e}") from e
 
     table_data = load_table_data(table_name)
-    if table_data:
-        new_id = max(int(row.get("ID", 0)) for row in table_data) + 1
+    indexes = table_indexes(metadata, table_name)
+    ids = reserve_ids(metadata, table_name, table_data, len(records))
+    records = [{"ID": row_id, **record} for row_id, record in zip(ids, records)]
+    table_data.extend(records)
+    index_add_many(indexes, records)
+    set_row_count(metadata, table_name, table_data)
+    if len(records) == 1:
+        print(f'Запись с ID={ids[0]} успешно добавлена в таблицу "{table_name}".')
     else:
-        new_id = 1
-
-    record = {"ID": new_id}
-
-    for (col_name, col_type), raw in zip(columns, values):
-        if col_type == "int":
-            try:
-                record[col_name] = int(raw)
-            except ValueError:
-                raise ValueError(f"Некорректное значение: {raw}. Ожидалось int.")
-        elif col_type == "bool":
-            low = raw.strip().lower()
-            if low == "true":
-                record[col_name] = True
-            elif low == "false":
-                record[col_name] = False
-            else:
-                raise ValueError(
-                    f"Некорректное значение: {raw}. Ожидалось bool (true/false)."
-                )
-        elif col_type == "str":
-            record[col_name] = raw.replace('"', '').replace("'", "")
-        else:
-            raise ValueError(f"Недопустимый тип столбца: {col_type}.")
+        print(f"{len(records)} записей с ID: {ids[0]}-{ids[-1]} успешно добавлено"
+              f' в таблицу "{table_name}".')
+    return table_data
+
+@handle_db_errors
+def load_file(metadata, table_name, path, fmt=None):
+    """Загружает записи в таблицу из csv или json lines файла.
 
-    table_data.append(record)
-    print(f'Запись с ID={record["ID"]} успешно добавлена в таблицу "{table_name}".')
+    Файл читается потоково, записи проверяются по схеме таблицы,
+    некорректные пропускаются и подсчитываются. Таблица, счётчик ID и
+    индексы изменяются один раз после чтения всего файла, поэтому ошибка
+    чтения не оставляет таблицу загруженной наполовину.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        path (str): Путь к файлу. csv файл должен начинаться со строки
+            заголовка с именами столбцов.
+        fmt (str, optional): Формат файла (csv или jsonl). По умолчанию
+            определяется по расширению.
+
+    Raises:
+        KeyError: Если таблица не существует.
+        ValueError: Если формат файла не поддерживается.
+        FileNotFoundError: Если файл не найден.
+
+    Returns:
+        ColumnTable: Обновленные данные таблицы с загруженными записями.
+    """
+    if not table_exists(metadata, table_name):
+        raise KeyError(table_name)
+    fmt = detect_format(path, fmt)
+    columns = [(col, typ) for col, typ in metadata[table_name].items() if col != "ID"]
+    table_data = load_table_data(table_name)
+    indexes = table_indexes(metadata, table_name)
+
+    start_time = monotonic()
+    next_id = peek_next_id(metadata, table_name, table_data)
+    records, rejected, errors = [], 0, []
+    for line_no, raw in read_rows(path, fmt):
+        try:
+            if isinstance(raw, str):
+                raise ValueError(raw)
+            records.append({"ID": next_id + len(records),
+                            **convert_row(columns, raw)})
+        except ValueError as e:
+            rejected += 1
+            if len(errors) < 5:
+                errors.append(f"строка {line_no}: {e}")
+    reserve_ids(metadata, table_name, table_data, len(records))
+    table_data.extend(records)
+    index_add_many(indexes, records)
+    set_row_count(metadata, table_name, table_data)
+    loaded = len(records)
+    elapsed_time = monotonic() - start_time
+
+    for error in errors:
+        print(f"Отклонена {error}")
+    rate = loaded / elapsed_time if elapsed_time else loaded
+    print(f'В таблицу "{table_name}" загружено {loaded} записей, отклонено '
+          f"{rejected} за {elapsed_time:.3f} секунд ({rate:.0f} записей/с).")
     return table_data
 
     
 
+def _index_candidates(predicate, indexes) -> tuple[int, Iterable[int]] | None:
+    """Выбирает самый дешёвый поиск по индексам для предиката.
+
+    Для сравнения используется индекс его столбца, для and — самый
+    избирательный из применимых поисков его условий, для or —
+    объединение поисков, если индекс применим ко всем его условиям.
+
+    Args:
+        predicate (tuple): Предикат условия (см. parse_where).
+        indexes (dict): Индексы таблицы (столбец: индекс).
+
+    Returns:
+        tuple | None: Пара (оценка числа ID, ID) или None, если
+            индексы неприменимы.
+    """
+    op, *operands = predicate
+    if op == "and":
+        scans = [_index_candidates(p, indexes) for p in operands[0]]
+        return min(filter(None, scans), key=itemgetter(0), default=None)
+    if op == "or":
+        scans = [_index_candidates(p, indexes) for p in operands[0]]
+        if not all(scans):
+            return None
+        return (sum(count for count, _ in scans),
+                chain.from_iterable(ids for _, ids in scans))
+    column, value = operands
+    index = indexes.get(column)
+    return index_scan(index, op, value) if index else None
+
+def _candidate_positions(table_data, predicate, indexes=None):
+    """Возвращает позиции записей, которые нужно проверить на условие.
+
+    Поиск по индексу выбирается, только если по оценке он вернёт не
+    больше INDEX_SCAN_MAX_SHARE записей таблицы: иначе проверить весь
+    столбец дешевле, чем искать позицию каждой найденной записи.
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        predicate (tuple): Предикат условия (см. parse_where).
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+
+    Returns:
+        list[int] | None: Позиции записей по возрастанию или None, если
+            проверять нужно всю таблицу.
+    """
+    scan = _index_candidates(predicate, indexes) if indexes else None
+    if scan is None or scan[0] > len(table_data) * INDEX_SCAN_MAX_SHARE:
+        return None
+    positions = set(map(table_data.position, scan[1]))
+    positions.discard(None)
+    return sorted(positions)
+
+def compile_where(table_data, predicate) -> Callable[..., list[int]]:
+    """Компилирует предикат в функцию отбора позиций таблицы.
+
+    Столбцы находятся один раз при компиляции, а не для каждой записи.
+    Условия and переупорядочиваются так, чтобы сначала проверялись
+    обычно самые избирательные (равенство, in, диапазоны), и каждое
+    следующее проверяется только для позиций, прошедших предыдущие;
+    результаты условий or объединяются.
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        predicate (tuple): Предикат условия (см. parse_where).
+
+    Returns:
+        Callable: Функция от списка проверяемых позиций по возрастанию
+            (None — вся таблица), возвращающая позиции подходящих записей
+            по возрастанию.
+    """
+    op, *operands = predicate
+    if op not in ("and", "or"):
+        return table_data.matcher(operands[0], op, operands[1])
+    terms = sorted(operands[0], key=lambda term: SELECTIVITY_RANK.get(term[0], 4))
+    checks = [compile_where(table_data, term) for term in terms]
+    if op == "and":
+        def match_all(positions=None):
+            for check in checks:
+                positions = check(positions)
+                if not positions:
+                    return []
+            return positions
+        return match_all
+
+    def match_any(positions=None):
+        matched = set()
+        for check in checks:
+            matched.update(check(positions))
+        return sorted(matched)
+    return match_any
+
+def _match_positions(table_data, predicate, indexes=None) -> list[int]:
+    """Находит позиции записей, удовлетворяющих условию.
+
+    Кандидаты берутся из индекса, если он выгоднее полного просмотра,
+    затем скомпилированное условие проверяется по столбцам таблицы.
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        predicate (tuple | None): Предикат условия (см. parse_where).
+            Без условия подходят все записи.
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+
+    Returns:
+        list[int]: Позиции подходящих записей по возрастанию.
+    """
+    with phase("filter"):
+        if not predicate:
+            add_count("rows_scanned", len(table_data))
+            return list(range(len(table_data)))
+        candidates = _candidate_positions(table_data, predicate, indexes)
+        add_count("rows_scanned",
+                  len(table_data) if candidates is None else len(candidates))
+        return compile_where(table_data, predicate)(candidates)
+
 def select(table_data, where_clause=None):
     """Выбирает записи из таблицы по условию.
 
     Args:
-        table_data (list): Данные таблицы.
-        where_clause (dict, optional): Условия фильтрации (столбец: значение).
+        table_data (ColumnTable): Данные таблицы.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
 
     Returns:
         list: Список записей, соответствующих условию.
     """
-    results = []
-    for row in table_data:
-        if not where_clause or all(row.get(col) == val for col, val in 
-                                       where_clause.items()):
-            results.append(row)
-    return results
+    if not where_clause:
+        return list(table_data)
+    return [table_data[pos] for pos in compile_where(table_data, where_clause)()]
+
+def iter_select(table_data, where_clause=None, indexes=None, limit=None, offset=0,
+                order_by=None):
+    """Лениво перебирает записи таблицы, удовлетворяющие условию.
+
+    Записи собираются из столбцов по мере перебора: условие проверяется
+    по столбцам сразу для всей таблицы, а в запись превращаются только
+    выводимые строки.
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+        limit (int, optional): Максимальное количество записей.
+        offset (int): Количество пропускаемых подходящих записей.
+        order_by (tuple, optional): Столбец сортировки и признак
+            сортировки по убыванию (см. ordered_positions).
+
+    Returns:
+        Iterator[dict]: Подходящие записи в порядке возрастания ID или
+            в порядке сортировки.
+    """
+    stop = None if limit is None else offset + limit
+    if order_by is not None:
+        column, descending = order_by
+        positions = _match_positions(table_data, where_clause, indexes) \
+            if where_clause else None
+        ordered = ordered_positions(table_data, column, descending, positions, stop,
+                                    (indexes or {}).get(column))
+        return map(table_data.__getitem__, islice(ordered, offset, stop))
+    if not where_clause:
+        add_count("rows_scanned", len(table_data) if stop is None
+                  else min(stop, len(table_data)))
+        return islice(table_data, offset, stop)
+    positions = _match_positions(table_data, where_clause, indexes)
+    return map(table_data.__getitem__, islice(positions, offset, stop))
+
+def query_rows(table_name, where_clause=None, indexes=None, limit=None, offset=0,
+               order_by=None):
+    """Перебирает записи таблицы, удовлетворяющие условию (см. iter_select).
+
+    Условие и сортировка по большой секционированной таблице без
+    применимого индекса выполняются по сегментам параллельно в пуле
+    процессов (см. scan_partitions): каждый процесс отбирает и
+    упорядочивает первые подходящие записи своего сегмента, и в исходном
+    процессе они сливаются кучей. Остальные запросы выполняются по
+    загруженной таблице.
+
+    Args:
+        table_name (str): Имя таблицы.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+        limit (int, optional): Максимальное количество записей.
+        offset (int): Количество пропускаемых подходящих записей.
+        order_by (tuple, optional): Столбец сортировки и признак
+            сортировки по убыванию (см. ordered_positions).
+
+    Returns:
+        Iterator[dict]: Подходящие записи в порядке возрастания ID или
+            в порядке сортировки.
+    """
+    stop = None if limit is None else offset + limit
+    if (where_clause or order_by is not None and order_by[0] != "ID") \
+            and not _index_applies(where_clause, order_by, indexes):
+        with phase("filter"):
+            scanned = scan_partitions(table_name, _segment_rows, where_clause,
+                                      order_by, stop)
+        if scanned is not None:
+            add_count("rows_scanned", sum(count for count, _ in scanned))
+            return islice(_merge_rows([rows for _, rows in scanned], order_by),
+                          offset, stop)
+    return iter_select(load_table_data(table_name), where_clause, indexes, limit,
+                       offset, order_by)
+
+def _index_applies(where_clause, order_by, indexes) -> bool:
+    """Проверяет, что для запроса есть применимый индекс (см. query_rows)."""
+    if not indexes:
+        return False
+    if where_clause:
+        return _index_candidates(where_clause, indexes) is not None
+    return "sorted" in indexes.get(order_by[0], {})
+
+def _segment_rows(table, where_clause=None, order_by=None,
+                  stop=None) -> tuple[int, list[dict]]:
+    """Отбирает записи сегмента секционированной таблицы по условию.
+
+    Выполняется в процессе пула (см. query_rows).
+
+    Args:
+        table (ColumnTable): Данные сегмента.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        order_by (tuple, optional): Столбец сортировки и признак
+            сортировки по убыванию.
+        stop (int, optional): Сколько первых подходящих записей вернуть.
+
+    Returns:
+        tuple: Количество записей сегмента и подходящие записи в порядке
+            возрастания ID или в порядке сортировки.
+    """
+    positions = compile_where(table, where_clause)() if where_clause else None
+    if order_by is not None:
+        positions = ordered_positions(table, *order_by, positions, stop)
+    elif positions is None:
+        positions = range(len(table))
+    return len(table), [table[pos] for pos in islice(positions, stop)]
+
+def _merge_rows(segments: list[list[dict]], order_by=None) -> Iterable[dict]:
+    """Сливает упорядоченные записи сегментов (см. _segment_rows).
+
+    Записи с равными значениями столбца сортировки упорядочиваются по ID
+    в том же направлении, как и в ordered_positions.
+    """
+    if order_by is None:
+        return heapq.merge(*segments, key=itemgetter("ID"))
+    column, descending = order_by
+    key = itemgetter("ID") if column == "ID" else itemgetter(column, "ID")
+    return heapq.merge(*segments, key=key, reverse=descending)
 
 @handle_db_errors
-@log_time
-def select_query(table_name, where_clause):
-    table_data = load_table_data(table_name)
-    where_clause = where_clause or {}
-    return [row for row in table_data if all(row.get(k) == v for k, v in 
-                                             where_clause.items())]
+def select_query(table_name, where_clause, indexes=None, limit=None, offset=0,
+                 order_by=None):
+    """Выбирает записи таблицы по условию, используя индексы, если они есть.
+
+    Args:
+        table_name (str): Имя таблицы.
+        where_clause (tuple): Предикат условия (см. parse_where).
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+        limit (int, optional): Максимальное количество записей.
+        offset (int): Количество пропускаемых подходящих записей.
+        order_by (tuple, optional): Столбец сортировки и признак
+            сортировки по убыванию.
+
+    Returns:
+        list: Список записей, соответствующих условию.
+    """
+    return list(query_rows(table_name, where_clause, indexes, limit, offset,
+                           order_by))
+
+def aggregate_name(func: str, column: str) -> str:
+    """Возвращает имя столбца результата для агрегата (например, 'sum(age)')."""
+    return f"{func}({column})"
+
+def _aggregate_values(func: str, values) -> int | float | str | bool | None:
+    """Вычисляет один агрегат по значениям столбца.
+
+    Пустые значения (None) не учитываются; для пустого набора sum, min,
+    max и avg возвращают None.
+    """
+    values = [value for value in values if value is not None]
+    if func == "count":
+        return len(values)
+    if not values:
+        return None
+    if func == "sum":
+        return sum(values)
+    if func == "avg":
+        return sum(values) / len(values)
+    return min(values) if func == "min" else max(values)
+
+def _partial_aggregate(func: str, values):
+    """Вычисляет частичный агрегат по части записей (см. _merge_partials).
+
+    Пустые значения (None) не учитываются; для sum и avg частичный
+    агрегат — пара [сумма, количество].
+    """
+    values = [value for value in values if value is not None]
+    if func == "count":
+        return len(values)
+    if func in NUMERIC_AGGREGATES:
+        return [sum(values), len(values)]
+    return (min if func == "min" else max)(values, default=None)
+
+def _merge_partials(func: str, partials: list) -> int | float | str | bool | None:
+    """Объединяет частичные агрегаты в значение агрегата (см. _aggregate_values)."""
+    if func == "count":
+        return sum(partials)
+    if func in NUMERIC_AGGREGATES:
+        total = sum(partial[0] for partial in partials)
+        count = sum(partial[1] for partial in partials)
+        if not count:
+            return None
+        return total if func == "sum" else total / count
+    values = [partial for partial in partials if partial is not None]
+    return (min if func == "min" else max)(values, default=None)
+
+def _group_positions(table_data, positions, group_by=None) -> dict:
+    """Раскладывает позиции записей по группам с одинаковым значением
+    столбца group_by в порядке первой записи группы.
+
+    Без группировки возвращается одна группа с ключом None.
+    """
+    if group_by is None:
+        return {None: positions}
+    groups: dict = {}
+    scanned = range(len(table_data)) if positions is None else positions
+    for pos, key in zip(scanned, table_data.values(group_by, positions)):
+        groups.setdefault(key, []).append(pos)
+    return groups
+
+def _segment_aggregates(table, aggregates, where_clause=None,
+                        group_by=None) -> tuple[int, list]:
+    """Вычисляет частичные агрегаты по сегменту секционированной таблицы.
+
+    Выполняется в процессе пула (см. aggregate_query).
+
+    Args:
+        table (ColumnTable): Данные сегмента.
+        aggregates (list[tuple[str, str]]): Пары (функция, столбец).
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        group_by (str, optional): Столбец группировки.
+
+    Returns:
+        tuple: Количество записей сегмента и для каждой группы тройка
+            (ключ, ID первой записи, частичные агрегаты).
+    """
+    positions = compile_where(table, where_clause)() if where_clause else None
+    result = []
+    for key, group in _group_positions(table, positions, group_by).items():
+        scanned = range(len(table)) if group is None else group
+        first_id = table.ids[scanned[0]] if scanned else None
+        partials = [_partial_aggregate(func, table.values(
+                        "ID" if column == "*" else column, group))
+                    for func, column in aggregates]
+        result.append((key, first_id, partials))
+    return len(table), result
+
+def _merge_aggregates(segments: list, aggregates, group_by=None) -> list[dict]:
+    """Объединяет частичные агрегаты сегментов (см. _segment_aggregates).
+
+    Группы упорядочиваются по ID первой записи, то есть так же, как
+    при вычислении по всей таблице (см. aggregate).
+    """
+    merged: dict = {}
+    for _, groups in segments:
+        for key, first_id, partials in groups:
+            if key not in merged:
+                merged[key] = [first_id, []]
+            elif first_id is not None and (merged[key][0] is None
+                                           or first_id < merged[key][0]):
+                merged[key][0] = first_id
+            merged[key][1].append(partials)
+    items = merged.items() if group_by is None \
+        else sorted(merged.items(), key=lambda item: item[1][0])
+    result = []
+    for key, (_, partials) in items:
+        row = {} if group_by is None else {group_by: key}
+        for number, (func, column) in enumerate(aggregates):
+            row[aggregate_name(func, column)] = _merge_partials(
+                func, [partial[number] for partial in partials])
+        result.append(row)
+    return result
+
+@timed("aggregate")
+def aggregate(table_data, aggregates, where_clause=None, group_by=None,
+              indexes=None) -> list[dict]:
+    """Вычисляет агрегаты по записям таблицы.
+
+    Подходящие записи отбираются так же, как в select. При группировке
+    позиции записей раскладываются по хеш-таблице групп за один проход
+    по столбцу группировки, после чего агрегаты каждой группы
+    вычисляются по столбцам целиком.
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        aggregates (list[tuple[str, str]]): Пары (функция, столбец), для
+            count(*) столбец — '*'.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        group_by (str, optional): Столбец группировки.
+        indexes (dict, optional): Индексы таблицы (столбец: индекс).
+
+    Returns:
+        list[dict]: Строка результата для каждой группы в порядке первой
+            записи группы; без группировки — одна строка.
+    """
+    positions = _match_positions(table_data, where_clause, indexes) \
+        if where_clause else None
+    result = []
+    for key, group in _group_positions(table_data, positions, group_by).items():
+        row = {} if group_by is None else {group_by: key}
+        for func, column in aggregates:
+            values = table_data.values("ID" if column == "*" else column, group)
+            row[aggregate_name(func, column)] = _aggregate_values(func, values)
+        result.append(row)
+    return result
+
+def _aggregate_from_state(state, indexes, aggregates,
+                          where_clause=None) -> dict | None:
+    """Вычисляет агрегаты без чтения таблицы, если хватает метаданных и
+    индексов.
+
+    count(*) без условия берётся из счётчика записей, а с условием из
+    одного сравнения — из числа записей, найденных по индексу. min и max
+    без условия берутся из краёв отсортированного индекса.
+
+    Args:
+        state (dict): Служебное состояние таблицы.
+        indexes (dict): Индексы таблицы (столбец: индекс).
+        aggregates (list[tuple[str, str]]): Пары (функция, столбец).
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+
+    Returns:
+        dict | None: Строка результата или None, если какой-то агрегат
+            нельзя вычислить по метаданным и индексам.
+    """
+    row = {}
+    for func, column in aggregates:
+        if func == "count" and column == "*" and not where_clause:
+            if "rows" not in state:
+                return None
+            value = state["rows"]
+        elif func == "count" and column == "*" \
+                and where_clause[0] not in ("and", "or"):
+            scan = _index_candidates(where_clause, indexes)
+            if scan is None:
+                return None
+            value = scan[0]
+        elif func in ("min", "max") and not where_clause \
+                and "sorted" in indexes.get(column, {}):
+            entries = indexes[column]["sorted"]
+            value = entries[0 if func == "min" else -1][0] if entries else None
+        else:
+            return None
+        row[aggregate_name(func, column)] = value
+    return row
+
+def aggregate_query(metadata, table_name, aggregates, where_clause=None,
+                    group_by=None) -> list[dict]:
+    """Вычисляет агрегаты по таблице, по возможности не читая её данных.
+
+    Агрегаты, которые нельзя взять из метаданных и индексов, по большой
+    секционированной таблице вычисляются по сегментам параллельно в пуле
+    процессов, если к условию не применим индекс: каждый процесс
+    проверяет условие и считает частичные агрегаты своего сегмента, а
+    они объединяются в исходном процессе (см. scan_partitions).
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        aggregates (list[tuple[str, str]]): Пары (функция, столбец), для
+            count(*) столбец — '*'.
+        where_clause (tuple, optional): Предикат условия (см. parse_where).
+        group_by (str, optional): Столбец группировки.
+
+    Raises:
+        KeyError: Если столбец не существует.
+        ValueError: Если sum или avg применены не к столбцу int.
+
+    Returns:
+        list[dict]: Строки результата (см. aggregate).
+    """
+    schema = metadata[table_name]
+    for func, column in aggregates:
+        if column != "*" and column not in schema:
+            raise KeyError(column)
+        if func in NUMERIC_AGGREGATES and schema[column] != "int":
+            raise ValueError(f"Функция {func} применима только к столбцам int.")
+    if group_by is not None and group_by not in schema:
+        raise KeyError(group_by)
+    indexes = table_indexes(metadata, table_name)
+    if group_by is None:
+        row = _aggregate_from_state(table_state(metadata, table_name), indexes,
+                                    aggregates, where_clause)
+        if row is not None:
+            return [row]
+    segments = None
+    if not (where_clause and _index_applies(where_clause, None, indexes)):
+        with phase("aggregate"):
+            segments = scan_partitions(table_name, _segment_aggregates, aggregates,
+                                       where_clause, group_by)
+    if segments is not None:
+        add_count("rows_scanned", sum(count for count, _ in segments))
+        return _merge_aggregates(segments, aggregates, group_by)
+    return aggregate(load_table_data(table_name), aggregates, where_clause,
+                     group_by, indexes)
 
 @handle_db_errors
-def update(table_data, set_clause, where_clause):
+def update(table_data, set_clause, where_clause, indexes=None):
     """Обновляет записи в таблице по условию.
 
     Args:
-        table_data (list): Данные таблицы.
+        table_data (ColumnTable): Данные таблицы.
         set_clause (dict): Словарь с обновляемыми столбцами и значениями.
-        where_clause (dict): Условия для выбора записей для обновления.
+        where_clause (tuple): Предикат условия для выбора записей.
+        indexes (dict, optional): Индексы таблицы. Используются для поиска
+            записей и обновляются вместе с ними.
 
     Raises:
         ValueError: Если не указано условие set.
 
     Returns:
-        list: Обновленные данные таблицы.
+        ColumnTable: Обновленные данные таблицы.
     """
     updated_ids = []
     if not set_clause:
         raise ValueError("Условие set обязательно для update.")
-    for row in table_data:
-        if not where_clause or all(row.get(col) == val for col, val in 
-                                       where_clause.items()):
-            for col, val in set_clause.items():
-                row[col] = val
-            updated_ids.append(row.get("ID"))
+    touched = {col: index for col, index in (indexes or {}).items()
+               if col in set_clause}
+    for pos in _match_positions(table_data, where_clause, indexes):
+        index_remove(touched, table_data[pos])
+        table_data.update(pos, set_clause)
+        index_add(touched, table_data[pos])
+        updated_ids.append(table_data.ids[pos])
     print(f"{len(updated_ids)} записей с ID: {', '.join(map(str, updated_ids))} успешно"
            " обновлено.")
     return table_data
 
 @handle_db_errors
 @confirm_action("удаление записей")
-def delete(table_data, where_clause):
+def delete(table_data, where_clause, indexes=None):
     """Удаляет записи из таблицы по условию.
 
     Args:
-        table_data (list): Данные таблицы.
-        where_clause (dict): Условия для выбора записей для удаления.
+        table_data (ColumnTable): Данные таблицы.
+        where_clause (tuple): Предикат условия для выбора записей.
+        indexes (dict, optional): Индексы таблицы. Используются для поиска
+            записей и обновляются вместе с ними.
 
     Raises:
         ValueError: Если не указано условие where.
 
     Returns:
-        list: Данные таблицы без удаленных записей.
+        ColumnTable: Данные таблицы без удаленных записей.
     """
     if not where_clause:
         raise ValueError("Условие where обязательно для delete.")
 
-    new_data: list[dict] = []
-    deleted_ids = []
-
-    for row in table_data:
-        if all(row.get(col) == val for col, val in where_clause.items()):
-            deleted_ids.append(row.get("ID"))
-        else:
-            new_data.append(row)
+    positions = _match_positions(table_data, where_clause, indexes)
+    deleted_ids = [table_data.ids[pos] for pos in positions]
+    if indexes:
+        for pos in positions:
+            index_remove(indexes, table_data[pos])
+    table_data.delete(positions)
     print(f"{len(deleted_ids)} записей с ID: {', '.join(map(str, deleted_ids))}"
           " успешно удалено.")
-    return new_data
+    return table_data
 
 @handle_db_errors
 def info(metadata, table_name):
@@ -227,9 +841,158 @@ def info(metadata, table_name):
     Raises:
         KeyError: Если таблица не существует.
     """
-    if table_name not in metadata:
+    if not table_exists(metadata, table_name):
         raise KeyError(table_name)
     print(f'Таблица: {table_name}')
     print(f"Столбцы: {', '.join(f'{col}:{typ}' for col, typ in 
                                 metadata[table_name].items())}")
-    print(f"Количество записей: {len(load_table_data(table_name))}")
+    state = table_state(metadata, table_name)
+    if "rows" in state:
+        next_id = state.get("next_id", 1)
+    else:
+        next_id = peek_next_id(metadata, table_name, load_table_data(table_name))
+    print(f"Количество записей: {row_count(metadata, table_name)}")
+    print(f"Следующий ID: {next_id}")
+    storage = table_storage(table_name)
+    print(f"Хранилище: {storage.name}")
+    partitions = state.get("partitions")
+    if partitions and storage is PARTITIONED:
+        spec = f"{partitions['kind']}({partitions['column']})"
+        if partitions["kind"] == "hash":
+            print(f"Секционирование: {spec}, сегментов: {partitions['segments']}")
+        else:
+            bounds = ", ".join(map(str, partitions["bounds"]))
+            print(f"Секционирование: {spec}, границы: {bounds}")
+    indexes = table_indexes(metadata, table_name)
+    if indexes:
+        print("Индексы:")
+        for column, index in indexes.items():
+            sizes = f"hash: {len(index['hash'])} значений"
+            if "sorted" in index:
+                sizes += f", sorted: {len(index['sorted'])} записей"
+            print(f"- {column} ({sizes})")
+
+@handle_db_errors
+def migrate(metadata, table_name, target):
+    """Переносит данные таблицы в другое хранилище.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        target (str): Имя целевого хранилища (json, log, bin, zlib или lzma).
+
+    Raises:
+        KeyError: Если таблица не существует.
+        ValueError: Если хранилище неизвестно или уже используется таблицей.
+        ValueError: Если начата транзакция.
+
+    Returns:
+        str: Имя нового хранилища таблицы.
+    """
+    if not table_exists(metadata, table_name):
+        raise KeyError(table_name)
+    if in_transaction():
+        raise ValueError("Команду migrate нельзя выполнять внутри транзакции.")
+    flush_writes()
+    with write_locked((table_name,)):
+        migrate_table(table_name, target)
+    print(f'Данные таблицы "{table_name}" перенесены в хранилище "{target}".')
+    return target
+
+@handle_db_errors
+def create_index(metadata, table_name, column):
+    """Строит индекс по столбцу таблицы.
+
+    Для всех столбцов строится хеш-индекс, для столбцов int и str —
+    дополнительно отсортированный индекс. Индекс записывается в файл
+    индексов таблицы, а в метаданных отмечается только его столбец.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        column (str): Имя индексируемого столбца.
+
+    Raises:
+        KeyError: Если таблица или столбец не существует.
+        ValueError: Если индекс по столбцу уже существует.
+
+    Returns:
+        dict: Обновленные метаданные с индексом.
+    """
+    if not table_exists(metadata, table_name):
+        raise KeyError(table_name)
+    col_type = metadata[table_name][column]
+    columns = index_columns(metadata, table_name)
+    if column in columns:
+        raise ValueError(f'Индекс по столбцу "{column}" уже существует.')
+    load_indexes(table_name).add(
+        column, build_index(load_table_data(table_name), column, col_type))
+    table_state(metadata, table_name)["indexes"] = [*columns, column]
+    kinds = "hash, sorted" if col_type in ORDERED_TYPES else "hash"
+    print(f'Индекс ({kinds}) по столбцу "{column}" таблицы "{table_name}" '
+          "успешно создан.")
+    return metadata
+
+@handle_db_errors
+def drop_index(metadata, table_name, column):
+    """Удаляет индекс по столбцу таблицы.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        column (str): Имя проиндексированного столбца.
+
+    Raises:
+        KeyError: Если таблица не существует.
+        ValueError: Если индекса по столбцу нет.
+
+    Returns:
+        dict: Обновленные метаданные без индекса.
+    """
+    if not table_exists(metadata, table_name):
+        raise KeyError(table_name)
+    columns = index_columns(metadata, table_name)
+    if column not in columns:
+        raise ValueError(f'Индекса по столбцу "{column}" таблицы "{table_name}" '
+                         "нет.")
+    load_indexes(table_name).drop(column)
+    table_state(metadata, table_name)["indexes"] = [
+        name for name in columns if name != column]
+    print(f'Индекс по столбцу "{column}" таблицы "{table_name}" успешно удален.')
+    return metadata
+
+@handle_db_errors
+def begin():
+    """Начинает транзакцию.
+
+    Raises:
+        ValueError: Если транзакция уже начата.
+    """
+    begin_transaction()
+    print("Транзакция начата.")
+
+@handle_db_errors
+def commit():
+    """Фиксирует транзакцию, начатую командой begin.
+
+    Raises:
+        ValueError: Если транзакция не начата.
+        ConflictError: Если изменённую таблицу после начала транзакции
+            изменил другой процесс; транзакция при этом отменяется.
+    """
+    if not in_transaction():
+        raise ValueError("Транзакция не начата.")
+    commit_transaction()
+    print("Транзакция зафиксирована.")
+
+@handle_db_errors
+def rollback():
+    """Отменяет транзакцию, начатую командой begin.
+
+    Raises:
+        ValueError: Если транзакция не начата.
+    """
+    if not in_transaction():
+        raise ValueError("Транзакция не начата.")
+    rollback_transaction()
+    print("Транзакция отменена.")
@@ -1,28 +1,100 @@
-import prompt
-from prettytable import PrettyTable
+import json
+import os
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from itertools import batched, islice
+from types import MappingProxyType
 
-from src.decorators import create_cacher, handle_db_errors
+from src.decorators import create_cacher, handle_db_errors, set_assume_yes
 
-from .consts import META_LOCATION
+from .consts import (
+    COMMIT_RETRIES,
+    COMMIT_RETRY_DELAY,
+    META_LOCATION,
+    SELECT_CACHE_MAX_BYTES,
+    SELECT_CACHE_MAX_ENTRIES,
+    SELECT_CACHE_MAX_ROWS,
+    SELECT_PAGE_SIZE,
+)
 from .core import (
+    aggregate_name,
+    aggregate_query,
+    begin,
+    commit,
+    create_index,
     create_table,
     delete,
+    drop_index,
     drop_table,
     info,
     insert,
     list_tables,
-    select_query,
+    load_file,
+    migrate,
+    query_rows,
+    rollback,
     update,
 )
-from .parser import parse_clause, parse_command, parse_pairs
-from .utils import load_metadata, load_table_data, save_metadata, save_table_data
+from .locks import catalog_lock
+from .metrics import (
+    add_count,
+    command,
+    counter_stats,
+    latency_stats,
+    phase,
+    reset,
+    set_profiler,
+    timed,
+)
+from .parser import (
+    Statement,
+    parse_pairs,
+    parse_partition,
+    parse_statement,
+)
+from .sort import top_rows
+from .storage import wait_compactions
+from .utils import (
+    ConflictError,
+    checkpoint,
+    delete_table_data,
+    flush_writes,
+    group_commit,
+    group_committed,
+    in_transaction,
+    invalidate_cache,
+    load_metadata,
+    load_table_data,
+    recover,
+    rollback_transaction,
+    save_metadata,
+    save_table_data,
+    set_row_count,
+    table_cache_stats,
+    table_exists,
+    table_indexes,
+    table_version,
+    transaction,
+)
 
-cache_result = create_cacher()
-def make_select_cache_key(table_name, where_clause):
+cache_result = create_cacher(SELECT_CACHE_MAX_ENTRIES, SELECT_CACHE_MAX_BYTES)
+def make_select_cache_key(table_name, where_clause, limit=None, offset=0,
+                          order_by=None, version=None):
+    # Отметка версии таблицы в ключе отделяет результаты, посчитанные до
+    # изменения таблицы другим процессом.
+    page = f"|{version}" if version is not None else ""
+    page += f"|{limit}|{offset}" if limit is not None or offset else ""
+    if order_by is not None:
+        page += f"|{order_by!r}"
     if not where_clause:
-        return f"{table_name}|ALL"
-    items = tuple(sorted(where_clause.items(), key=lambda x: x[0]))
-    return f"{table_name}|{items}"
+        return table_name, f"ALL{page}"
+    return table_name, f"{where_clause!r}{page}"
+
+def row_size(row) -> int:
+    """Приблизительно оценивает объём памяти, занимаемый записью."""
+    return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
 
 def print_help():
     """Prints the help message for the current mode."""
@@ -30,60 +102,292 @@ def print_help():
     print("\n***Процесс работы с таблицей***")
     print("Функции:")
     print("<command> create_table <имя_таблицы> <столбец1:тип> .. - создать таблицу")
+    print("<command> create_table ... partition by hash(<столбец>) <N>|range(<столбец>)"
+          " <граница1>, ... - создать секционированную таблицу")
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
     print("<command> insert into <имя_таблицы> values (<значение1>, <значение2>, ...)"
-          " - создать запись.")
+          ", (...), ... - создать одну или несколько записей.")
+    print("<command> load <имя_таблицы> from <файл> [format csv|jsonl]"
+          " - загрузить записи из файла.")
     print("<command> select from <имя_таблицы> where <столбец> = <значение>"
           " - прочитать записи по условию.")
+    print("  в условии where: =, !=, <, <=, >, >=, <столбец> in (<значение1>, ...),"
+          " and, or и скобки.")
     print("<command> select from <имя_таблицы> - прочитать все записи.")
+    print("<command> select count(*)|sum|min|max|avg(<столбец>), ... from"
+          " <имя_таблицы> [where ...] [group by <столбец>] - агрегаты.")
+    print("<command> select ... [order by <столбец> [asc|desc]] - сортировка.")
+    print("<command> select ... [limit <N>] [offset <M>] [format table|tsv|jsonl]"
+          " - постраничный или потоковый вывод.")
     print("<command> update <имя_таблицы> set <столбец1> = <новое_значение1>"
           " where <столбец_условия> = <значение_условия> - обновить запись.")
     print("<command> delete from <имя_таблицы> where <столбец> = <значение>"
           " - удалить запись.")
     print("<command> info <имя_таблицы> - вывести информацию о таблице.")
+    print("<command> create_index <имя_таблицы> <столбец> - создать индекс"
+          " по столбцу.")
+    print("<command> drop_index <имя_таблицы> <столбец> - удалить индекс.")
+    print("<command> migrate <имя_таблицы> <json|log|bin|zlib|lzma> - перенести"
+          " данные таблицы в другое хранилище.")
+    print("<command> cache_stats - статистика кэшей.")
+    print("<command> stats [reset] - задержки команд по фазам, счётчики строк"
+          " и байт.")
+    print("<command> profile cprofile|tracemalloc|off - профилировать каждую"
+          " команду.")
+    print("<command> begin - начать транзакцию.")
+    print("<command> commit - зафиксировать транзакцию.")
+    print("<command> rollback - отменить транзакцию.")
 
     
     print("\nОбщие команды:")
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация\n")
 
-def print_rows_pretty(table_name: str, rows: list[dict], metadata: dict) -> None:
+def print_rows_pretty(columns: list[str], rows: list[dict]) -> None:
     """Выводит записи таблицы в форматированном виде.
 
     Args:
-        table_name (str): Имя таблицы.
+        columns (list[str]): Выводимые столбцы.
         rows (list[dict]): Список записей для вывода.
-        metadata (dict): Метаданные всех таблиц.
     """
-    schema = metadata.get(table_name, {})
-    columns = ["ID"] + [c for c in schema.keys() if c != "ID"]
-    if columns == ["ID"] and "ID" not in rows[0]:
-        columns = list(rows[0].keys() if rows else [])
+    # prettytable импортируется при первом выводе таблицы: скриптам с
+    # форматами tsv и jsonl он не нужен, а его импорт удлиняет запуск.
+    from prettytable import PrettyTable
+
     t = PrettyTable()
     t.field_names = columns
     for r in rows:
         t.add_row([r.get(c, "") for c in columns])
     print(t)
 
+def print_rows(table_name: str, rows: Iterable[dict], metadata: dict,
+               fmt: str = "table", columns: list[str] | None = None) -> int:
+    """Потоково выводит записи таблицы.
+
+    Записи берутся из итератора по мере вывода: в формате table они
+    печатаются страницами по SELECT_PAGE_SIZE строк, в форматах tsv и
+    jsonl — построчно, что удобно для передачи в другие программы.
+
+    Args:
+        table_name (str): Имя таблицы.
+        rows (Iterable[dict]): Записи для вывода.
+        metadata (dict): Метаданные всех таблиц.
+        fmt (str): Формат вывода: table, tsv или jsonl.
+        columns (list[str] | None): Выводимые столбцы. По умолчанию —
+            все столбцы таблицы.
+
+    Returns:
+        int: Количество выведенных записей.
+    """
+    if columns is None:
+        schema = metadata.get(table_name, {})
+        columns = ["ID"] + [c for c in schema.keys() if c != "ID"]
+    count = 0
+    with phase("render"):
+        if fmt == "table":
+            for page in batched(rows, SELECT_PAGE_SIZE):
+                print_rows_pretty(columns, page)
+                count += len(page)
+        elif fmt == "tsv":
+            for r in rows:
+                if not count:
+                    print("\t".join(columns))
+                print("\t".join(str(r.get(c, "")) for c in columns))
+                count += 1
+        else:
+            for r in rows:
+                print(json.dumps({c: r.get(c) for c in columns}, ensure_ascii=False))
+                count += 1
+    add_count("rows_returned", count)
+    return count
+
+def cache_rows(key: tuple, rows: Iterable[dict]) -> Iterator[dict]:
+    """Передаёт записи дальше и кэширует результат запроса, если он небольшой.
+
+    В кэш попадают неизменяемые копии записей, поэтому последующие
+    изменения таблицы не портят сохранённый результат. Результаты больше
+    SELECT_CACHE_MAX_ROWS записей не кэшируются, чтобы потоковый вывод не
+    требовал памяти на всю выборку.
+
+    Args:
+        key (tuple): Ключ кэша запроса.
+        rows (Iterable[dict]): Записи результата.
+
+    Yields:
+        dict: Те же записи.
+    """
+    collected: list | None = []
+    size = 0
+    for row in rows:
+        if collected is not None:
+            snapshot = MappingProxyType(dict(row))
+            collected.append(snapshot)
+            size += row_size(snapshot)
+            if len(collected) > SELECT_CACHE_MAX_ROWS:
+                collected = None
+        yield row
+    if collected is not None:
+        cache_result.put(key, tuple(collected), size) # type: ignore
+
+def print_cache_stats() -> None:
+    """Выводит счётчики кэша запросов select и кэша таблиц."""
+    for title, stats in (("Кэш запросов select", cache_result.stats()), # type: ignore
+                         ("Кэш таблиц", table_cache_stats())):
+        print(f"{title}:")
+        print(f"  записей: {stats['entries']}, объём: {stats['bytes']} байт")
+        print(f"  попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+              f"вытеснений: {stats['evictions']}, "
+              f"сбросов: {stats['invalidations']}")
+    stats = parse_statement.cache_info()
+    print("Кэш разобранных команд:")
+    print(f"  записей: {stats.currsize}, попаданий: {stats.hits}, "
+          f"промахов: {stats.misses}")
+
+def print_stats() -> None:
+    """Выводит задержки команд по фазам и счётчики строк и байт.
+
+    Задержки собираются в гистограммы по команде, таблице и фазе:
+    parse — разбор схемы секционирования, load — чтение метаданных и
+    таблиц, filter — отбор записей по условию, aggregate — вычисление
+    агрегатов, sort — сортировка order by, render — сборка и вывод
+    записей, save — запись на диск, other — остальное время команды,
+    total — команда целиком. Сама команда разбирается до выполнения
+    (см. parse_statement).
+    """
+    latencies = latency_stats()
+    if not latencies:
+        print("Нет замеров.")
+        return
+    from prettytable import PrettyTable
+
+    t = PrettyTable()
+    t.field_names = ["Команда", "Таблица", "Фаза", "Вызовов", "Среднее, мс",
+                     "p50, мс", "p95, мс", "p99, мс", "Макс., мс"]
+    t.align = "r"
+    for row in latencies:
+        t.add_row([row["command"], row["table"], row["phase"], row["count"],
+                   *(f"{row[key]:.3f}" for key in
+                     ("avg_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"))])
+    print(t)
+    t = PrettyTable()
+    t.field_names = ["Команда", "Таблица", "Вызовов", "Просмотрено строк",
+                     "Возвращено строк", "Прочитано байт", "Записано байт"]
+    t.align = "r"
+    for row in counter_stats():
+        t.add_row([row["command"], row["table"], row["calls"], row["rows_scanned"],
+                   row["rows_returned"], row["bytes_read"], row["bytes_written"]])
+    print(t)
+
 @handle_db_errors
-def parse_clause_safe(clause_str: str) -> dict:
-    """Безопасно парсит строку условия с обработкой ошибок.
+def show_select(table_name: str, where_clause: tuple | None, metadata: dict,
+                limit: int | None = None, offset: int = 0,
+                fmt: str = "table", order_by: tuple | None = None) -> None:
+    """Выполняет select и потоково выводит результат.
 
     Args:
-        clause_str (str): Строка с условием для парсинга.
+        table_name (str): Имя таблицы.
+        where_clause (tuple | None): Предикат условия (см. parse_where).
+        metadata (dict): Метаданные всех таблиц.
+        limit (int | None): Максимальное количество записей.
+        offset (int): Количество пропускаемых записей.
+        fmt (str): Формат вывода: table, tsv или jsonl.
+        order_by (tuple | None): Столбец сортировки и признак сортировки
+            по убыванию.
+
+    Raises:
+        KeyError: Если столбца сортировки нет в таблице.
+    """
+    if order_by is not None and order_by[0] not in metadata[table_name]:
+        raise KeyError(order_by[0])
+    key = make_select_cache_key(table_name, where_clause, limit, offset, order_by,
+                                table_version(metadata, table_name))
+    rows = cache_result.get(key) # type: ignore
+    if rows is None:
+        indexes = table_indexes(metadata, table_name)
+        rows = cache_rows(key, query_rows(table_name, where_clause, indexes, limit,
+                                          offset, order_by))
+    if not print_rows(table_name, rows, metadata, fmt):
+        print("Нет записей.")
+
+@handle_db_errors
+def show_aggregate(table_name: str, aggregates: list[tuple[str, str]],
+                   where_clause: tuple | None, group_by: str | None,
+                   metadata: dict, limit: int | None = None, offset: int = 0,
+                   fmt: str = "table", order_by: tuple | None = None) -> None:
+    """Вычисляет агрегаты и выводит результат.
+
+    Args:
+        table_name (str): Имя таблицы.
+        aggregates (list[tuple[str, str]]): Пары (функция, столбец).
+        where_clause (tuple | None): Предикат условия (см. parse_where).
+        group_by (str | None): Столбец группировки.
+        metadata (dict): Метаданные всех таблиц.
+        limit (int | None): Максимальное количество групп.
+        offset (int): Количество пропускаемых групп.
+        fmt (str): Формат вывода: table, tsv или jsonl.
+        order_by (tuple | None): Столбец группировки или агрегат, по
+            которому сортируются группы, и признак сортировки по убыванию.
+
+    Raises:
+        KeyError: Если столбца сортировки нет среди выводимых.
+    """
+    rows = aggregate_query(metadata, table_name, aggregates, where_clause, group_by)
+    columns = [] if group_by is None else [group_by]
+    columns.extend(aggregate_name(func, column) for func, column in aggregates)
+    stop = None if limit is None else offset + limit
+    if order_by is not None:
+        if order_by[0] not in columns:
+            raise KeyError(order_by[0])
+        rows = top_rows(rows, *order_by, stop)
+    if not print_rows(table_name, islice(rows, offset, stop), metadata, fmt,
+                      columns):
+        print("Нет записей.")
+
+@handle_db_errors
+def set_profiler_safe(profiler: str | None) -> None:
+    """Включает или выключает профилирование команд с обработкой ошибок.
+
+    Args:
+        profiler (str | None): cprofile, tracemalloc или None.
+    """
+    set_profiler(profiler)
+    print("Профилирование команд " + (f"включено ({profiler})." if profiler
+                                      else "выключено."))
+
+@timed("parse")
+@handle_db_errors
+def parse_partition_safe(spec_str: str) -> dict:
+    """Безопасно парсит схему секционирования с обработкой ошибок.
+
+    Args:
+        spec_str (str): Схема секционирования после 'partition by'.
+
+    Returns:
+        dict: Схема секционирования.
+    """
+    return parse_partition(spec_str)
+
+def prepare_statement(text: str) -> Statement | None:
+    """Разбирает команду, выводя сообщение при ошибке синтаксиса.
+
+    Args:
+        text (str): Текст команды.
 
     Returns:
-        dict: Словарь с разобранным условием.
+        Statement | None: Разобранная команда или None при ошибке.
     """
-    return parse_clause(clause_str)
+    try:
+        return parse_statement(text)
+    except ValueError as e:
+        print(f'Некорректная команда "{text}": {e} Попробуйте снова.')
+        return None
 
-def handle_command(cmd: str, args: list[str], metadata: dict):
+def handle_command(statement: Statement, metadata: dict):
     """Обрабатывает команду пользователя.
 
     Args:
-        cmd (str): Название команды.
-        args (list[str]): Аргументы команды.
+        statement (Statement): Разобранная команда (см. parse_statement).
         metadata (dict): Метаданные всех таблиц.
 
     Returns:
@@ -94,20 +398,35 @@ def handle_command(cmd: str, args: list[str], metadata: dict):
     """
     app_over = False
     is_successful = False
+    cmd, args = statement.command, statement.args
     match cmd:
         case "create_table":
             if len(args) < 2:
                 print("Недостаточно аргументов для создания таблицы. "
                     "Требуется имя таблицы и хотя бы один столбец. Попробуйте снова.")
                 return app_over, metadata, is_successful
-            invalid = parse_pairs(args[1:])
-            if invalid:
-                print(f"Некорректное значение: {invalid}. Попробуйте снова.")
+            columns, partitions = args[1:], None
+            lowered = [arg.lower() for arg in columns]
+            if "partition" in lowered:
+                pos = lowered.index("partition")
+                if lowered[pos + 1:pos + 2] != ["by"]:
+                    print("Некорректный синтаксис команды create_table. "
+                          "Попробуйте снова.")
+                    return app_over, metadata, is_successful
+                partitions = parse_partition_safe(" ".join(columns[pos + 2:]))
+                if partitions is None:
+                    return app_over, metadata, is_successful
+                columns = columns[:pos]
+            invalid = parse_pairs(columns)
+            if invalid or not columns:
+                print(f"Некорректное значение: {invalid or 'нет столбцов'}. "
+                      "Попробуйте снова.")
                 return app_over, metadata, is_successful
             new_meta = create_table(
                 metadata,
                 args[0],
-                dict(arg.split(":") for arg in args[1:]),
+                dict(arg.split(":") for arg in columns),
+                partitions,
             )
             if new_meta is not None:
                 metadata = new_meta
@@ -127,62 +446,53 @@ def handle_command(cmd: str, args: list[str], metadata: dict):
             if new_meta is not None:
                 metadata = new_meta
                 is_successful = True
-                cache_result.clear() # type: ignore
+                delete_table_data(args[0])
+                cache_result.clear(args[0]) # type: ignore
         case "insert":
-            if len(args) < 4 or args[0].lower() != "into" or \
-             args[2].lower() != "values":
-                print("Некорректный синтаксис команды insert. Попробуйте снова.")
+            table_name = statement.table
+            new_data = insert(metadata, table_name, statement.rows)
+            if new_data is not None:
+                # Счётчик ID сохраняется раньше данных: при сбое между двумя
+                # записями ID будет пропущен, но не выдан повторно.
+                save_metadata(META_LOCATION, metadata, table_name)
+                save_table_data(table_name, new_data)
+                cache_result.clear(table_name) # type: ignore
+            else:
+                invalidate_cache(table_name)
+        case "load":
+            if len(args) not in (3, 5) or args[1].lower() != "from" or \
+             (len(args) == 5 and args[3].lower() != "format"):
+                print("Некорректный синтаксис команды load. Попробуйте снова.")
                 return app_over, metadata, is_successful
-            table_name = args[1]
-            new_data = insert(metadata, table_name, args[3:])
+            table_name = args[0]
+            fmt = args[4].lower() if len(args) == 5 else None
+            new_data = load_file(metadata, table_name, args[2], fmt)
             if new_data is not None:
+                save_metadata(META_LOCATION, metadata, table_name)
                 save_table_data(table_name, new_data)
-                cache_result.clear() # type: ignore
+                cache_result.clear(table_name) # type: ignore
+            else:
+                invalidate_cache(table_name)
         case "select":
-            if len(args) < 2 or args[0].lower() != "from":
-                print("Некорректный синтаксис команды select. Попробуйте снова.")
-                return app_over, metadata, is_successful
-            table_name = args[1]
-            if table_name not in metadata:
+            table_name = statement.table
+            if not table_exists(metadata, table_name):
                 print(f'Таблица "{table_name}" не существует.')
                 return app_over, metadata, is_successful
-            if len(args) == 2:
-                key = make_select_cache_key(table_name, {})
-                rows = cache_result(key, lambda: select_query(table_name, {}))
-                if not rows:
-                    print("Нет записей.")
-                else:
-                    print_rows_pretty(table_name, rows, metadata)
-                return app_over, metadata, is_successful
-            if len(args) < 4 or args[2].lower() != "where" or args.count("where") != 1:
-                print("Некорректный синтаксис команды select. Попробуйте снова.")
-                return app_over, metadata, is_successful
-            clause = parse_clause_safe(" ".join(args[3:]))
-            if clause is None:
-                return app_over, metadata, is_successful
-            key = make_select_cache_key(table_name, clause)
-            rows = cache_result(key, lambda: select_query(table_name, clause))
-            if not rows:
-                print("Нет записей.")
+            clause = statement.where or False
+            select_options = statement.limit, statement.offset, statement.fmt
+            if statement.aggregates:
+                show_aggregate(table_name, list(statement.aggregates), clause,
+                               statement.group_by, metadata, *select_options,
+                               statement.order_by)
             else:
-                print_rows_pretty(table_name, rows, metadata)
+                show_select(table_name, clause, metadata, *select_options,
+                            statement.order_by)
         case "update":
-            if len(args) < 5:
-                print("Недостаточно аргументов для обновления записи."
-                      " Попробуйте снова.")
-                return app_over, metadata, is_successful
-            table_name = args[0]
-            if table_name not in metadata:
+            table_name = statement.table
+            if not table_exists(metadata, table_name):
                 print(f'Таблица "{table_name}" не существует.')
                 return app_over, metadata, is_successful
-            if args[1].lower() != "set" or args.count("where") != 1:
-                print("Некорректный синтаксис команды update. Попробуйте снова.")
-                return app_over, metadata, is_successful
-            seters, wheres = " ".join(args[2:]).split("where", 1)
-            set_clause = parse_clause_safe(seters)
-            where_clause = parse_clause_safe(wheres)
-            if set_clause is None or where_clause is None:
-                return app_over, metadata, is_successful
+            set_clause = dict(statement.assignments)
             schema = metadata[table_name]  # dict: {col: "int"/"str"/"bool"}
             for col, val in set_clause.items():
                 if col not in schema:
@@ -206,29 +516,28 @@ def handle_command(cmd: str, args: list[str], metadata: dict):
                     )
                     return app_over, metadata, is_successful
             table_data = load_table_data(table_name)
-            new_data = update(table_data, set_clause, where_clause)
+            indexes = table_indexes(metadata, table_name)
+            new_data = update(table_data, set_clause, statement.where, indexes)
             if new_data is not None:
                 save_table_data(table_name, new_data)
-                cache_result.clear() # type: ignore
+                cache_result.clear(table_name) # type: ignore
+            else:
+                invalidate_cache(table_name)
         case "delete":
-            if (
-                len(args) < 4
-                or args[0].lower() != "from"
-                or args[2].lower() != "where"
-                or args.count("where") != 1
-            ):
-                print("Некорректный синтаксис команды delete. Попробуйте снова.")
-                return app_over, metadata, is_successful
-            table_name = args[1]
-            if table_name not in metadata:
+            table_name = statement.table
+            if not table_exists(metadata, table_name):
                 print(f'Таблица "{table_name}" не существует.')
                 return app_over, metadata, is_successful
-            where_clause = parse_clause_safe(" ".join(args[3:]))
             table_data = load_table_data(table_name)
-            new_data = delete(table_data, where_clause)
+            indexes = table_indexes(metadata, table_name)
+            new_data = delete(table_data, statement.where, indexes)
             if new_data is not None:
                 save_table_data(table_name, new_data)
-                cache_result.clear() # type: ignore
+                cache_result.clear(table_name) # type: ignore
+                set_row_count(metadata, table_name, new_data)
+                is_successful = True
+            else:
+                invalidate_cache(table_name)
         case "info":
             if len(args) != 1:
                 print(
@@ -238,6 +547,52 @@ def handle_command(cmd: str, args: list[str], metadata: dict):
                 return app_over, metadata, is_successful
             table_name = args[0]
             info(metadata, table_name)
+        case "create_index" | "drop_index":
+            if len(args) != 2:
+                print("Некорректное значение. Требуется указать имя таблицы и "
+                      "столбец. Попробуйте снова.")
+                return app_over, metadata, is_successful
+            action = create_index if cmd == "create_index" else drop_index
+            new_meta = action(metadata, args[0], args[1])
+            if new_meta is not None:
+                metadata = new_meta
+                is_successful = True
+        case "migrate":
+            if len(args) != 2:
+                print("Некорректное значение. Требуется указать имя таблицы и "
+                      "хранилище (json, log, bin, zlib или lzma). Попробуйте "
+                      "снова.")
+                return app_over, metadata, is_successful
+            migrate(metadata, args[0], args[1].lower())
+        case "cache_stats":
+            print_cache_stats()
+        case "stats":
+            if args and [arg.lower() for arg in args] != ["reset"]:
+                print(f"Некорректное значение: {' '.join(args)}. Попробуйте снова.")
+                return app_over, metadata, is_successful
+            if args:
+                reset()
+                print("Статистика команд сброшена.")
+            else:
+                print_stats()
+        case "profile":
+            if len(args) != 1:
+                print("Некорректное значение. Требуется указать cprofile, "
+                      "tracemalloc или off. Попробуйте снова.")
+                return app_over, metadata, is_successful
+            profiler = args[0].lower()
+            set_profiler_safe(None if profiler == "off" else profiler)
+        case "begin" | "commit" | "rollback":
+            if args:
+                print(f"Некорректное значение: {' '.join(args)}. Попробуйте снова.")
+                return app_over, metadata, is_successful
+            if cmd == "begin":
+                begin()
+            else:
+                (commit if cmd == "commit" else rollback)()
+                # В кэш запросов select могли попасть результаты отменённой
+                # транзакции.
+                cache_result.clear() # type: ignore
         case "exit":
             app_over = True
         case "help":
@@ -246,33 +601,163 @@ def handle_command(cmd: str, args: list[str], metadata: dict):
             print(f"Функции {cmd} нет. Попробуйте снова.")
     return app_over, metadata, is_successful
 
-def get_input(prompt_msg=">>>Введите команду: "):
+def get_input(prompt_msg=">>>Введите команду: ") -> Statement | None:
     """Получает и парсит ввод пользователя.
 
     Args:
         prompt_msg (str): Сообщение для приглашения к вводу.
 
     Returns:
-        tuple: Кортеж из команды и списка аргументов.
+        Statement | None: Разобранная команда или None при ошибке
+            синтаксиса.
     """
+    import prompt
+
     try:
         input_str = prompt.string(prompt_msg).strip() # type: ignore
-        cmd, args = parse_command(input_str)
     except (KeyboardInterrupt, EOFError):
-        cmd, args = "exit", []
-    return cmd.lower(), args
+        input_str = "exit"
+    return prepare_statement(input_str)
+
+def execute(statement: Statement) -> bool:
+    """Выполняет одну команду и сохраняет изменившиеся метаданные.
+
+    Вне транзакции, начатой командой begin, команда выполняется в
+    собственной транзакции и фиксируется сразу. Если таблицу команды за
+    это время изменил другой процесс, команда выполняется повторно, всего
+    до COMMIT_RETRIES раз (см. attempt_locks).
+
+    Args:
+        statement (Statement): Разобранная команда (см. parse_statement).
+
+    Returns:
+        bool: Флаг завершения работы приложения.
+    """
+    for attempt in range(1, COMMIT_RETRIES + 1):
+        try:
+            with attempt_locks(attempt), command(statement.command), \
+                    transaction():
+                metadata = load_metadata(META_LOCATION)
+                app_over, metadata, sucess_ = handle_command(statement, metadata)
+                if sucess_:
+                    save_metadata(META_LOCATION, metadata, statement.table)
+            return app_over
+        except ConflictError as e:
+            cache_result.clear(statement.table) # type: ignore
+            if attempt == COMMIT_RETRIES:
+                print(f"Ошибка: {e} Команда не выполнена.")
+                return False
+            print(f"{e} Команда выполняется повторно.")
+            retry_pause(attempt)
+    return False
+
+def attempt_locks(attempt: int):
+    """Возвращает блокировки, под которыми выполняется попытка команды.
+
+    Попытки выполняются без блокировок, и конфликт обнаруживается только
+    при фиксации. Последняя попытка выполняется под монопольной
+    блокировкой каталога: другие процессы в это время не могут
+    зафиксировать изменения, поэтому она не конфликтует.
+
+    Args:
+        attempt (int): Номер попытки, начиная с 1.
+    """
+    if attempt < COMMIT_RETRIES:
+        return nullcontext()
+    return catalog_lock().locked(True)
+
+def retry_pause(attempt: int) -> None:
+    """Ждёт перед повторной попыткой после конфликта с другим процессом.
+
+    Пауза растёт с номером попытки и выбирается случайно, чтобы
+    столкнувшиеся процессы не повторяли команды одновременно.
 
-def run():
-    """Запускает основной цикл работы базы данных."""
-    print("***База данных***\n")
-    print_help()
+    Args:
+        attempt (int): Номер неудавшейся попытки, начиная с 1.
+    """
+    import random
+
+    time.sleep(random.uniform(0, COMMIT_RETRY_DELAY * attempt))
+
+def open_database() -> None:
+    """Восстанавливает транзакции из журнала и создаёт файл метаданных.
+
+    Файл метаданных записывается, только если его ещё нет.
+    """
+    recovered = recover()
+    if recovered:
+        print(f"Восстановлено транзакций из журнала: {recovered}.")
+    with catalog_lock().locked(True):
+        if not os.path.exists(META_LOCATION):
+            save_metadata(META_LOCATION, {})
+
+def abort_transaction() -> None:
+    """Отменяет транзакцию, не завершённую до выхода из программы."""
+    if in_transaction():
+        rollback_transaction()
+        print("Незавершённая транзакция отменена.")
+
+def run(quiet: bool = False):
+    """Запускает основной цикл работы базы данных.
+
+    Args:
+        quiet (bool): Не выводить баннер и справку при запуске.
+    """
+    if not quiet:
+        print("***База данных***\n")
+        print_help()
     app_over = False
-    if not load_metadata(META_LOCATION):
-        save_metadata(META_LOCATION, {})
+    open_database()
     while not app_over:
-        metadata = load_metadata(META_LOCATION)
-        cmd, args = get_input()
-        app_over, metadata, sucess_ = handle_command(cmd, args, metadata)
-        if sucess_:
-            save_metadata(META_LOCATION, metadata)
+        statement = get_input()
+        if statement is not None:
+            app_over = execute(statement)
+    abort_transaction()
+    checkpoint()
+    wait_compactions()
+
+def run_script(statements: list[str], assume_yes: bool = False) -> None:
+    """Выполняет команды скрипта без интерактивного ввода.
+
+    Баннер и справка не выводятся. Изменения метаданных и таблиц
+    накапливаются в памяти и фиксируются одной записью журнала после
+    выполнения всего скрипта или команды exit. Транзакции, начатые
+    командой begin, фиксируются отдельно. Если изменённые скриптом
+    таблицы за это время изменил другой процесс, скрипт выполняется
+    повторно, всего до COMMIT_RETRIES раз. Скрипт, который уже
+    зафиксировал часть изменений (явной транзакцией или перед ней, см.
+    group_committed), повторно не выполняется: его оставшиеся изменения
+    отменяются.
+
+    Args:
+        statements (list[str]): Команды скрипта.
+        assume_yes (bool): Подтверждать удаление без вопроса.
+    """
+    set_assume_yes(assume_yes)
+    open_database()
+    for attempt in range(1, COMMIT_RETRIES + 1):
+        try:
+            with attempt_locks(attempt), group_commit():
+                for text in statements:
+                    statement = prepare_statement(text)
+                    if statement is not None and execute(statement):
+                        break
+                abort_transaction()
+                with command("group_commit"):
+                    flush_writes()
+            break
+        except ConflictError as e:
+            cache_result.clear() # type: ignore
+            if group_committed():
+                print(f"Ошибка: {e} Изменения скрипта после последней фиксации "
+                      "не сохранены и не повторяются: скрипт уже зафиксировал "
+                      "часть изменений.")
+                break
+            if attempt == COMMIT_RETRIES:
+                print(f"Ошибка: {e} Изменения скрипта не сохранены.")
+                break
+            print(f"{e} Скрипт выполняется повторно.")
+            retry_pause(attempt)
+    checkpoint()
+    wait_compactions()
         
@@ -0,0 +1,457 @@
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable
+from itertools import chain, groupby, islice
+from operator import itemgetter
+
+from .codec import dumps, loads
+from .consts import (
+    COMPACTION_MIN_RECORDS,
+    COMPACTION_RATIO,
+    DATA_FOLDER,
+    INDEX_MERGE_MIN_ENTRIES,
+)
+from .metrics import add_count, file_size
+
+ORDERED_TYPES = {"int", "str"}
+RANGE_OPERATORS = {"<", "<=", ">", ">="}
+VALUE = itemgetter(0)
+ENTRY_ID = itemgetter(1)
+CHANGE_OP = itemgetter(0)
+PY_TYPES = {"int": int, "str": str, "bool": bool}
+
+
+def index_key(value) -> str:
+    """Преобразует значение столбца в ключ хеш-индекса.
+
+    Ключ хранится в json, поэтому значение сериализуется целиком:
+    так 1, "1" и true не смешиваются между собой.
+
+    Args:
+        value: Значение столбца.
+
+    Returns:
+        str: Ключ хеш-индекса.
+    """
+    return json.dumps(value)
+
+
+def build_index(table_data: list, column: str, col_type: str) -> dict:
+    """Строит индекс по столбцу таблицы.
+
+    Хеш-индекс (значение -> список ID) строится всегда, отсортированный
+    список пар [значение, ID] — только для упорядочиваемых типов.
+    Построенный индекс ещё не записан в файл индексов (см. IndexLog).
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        column (str): Имя столбца.
+        col_type (str): Тип столбца.
+
+    Returns:
+        dict: Индекс вида {"type": ..., "hash": {...}, "sorted": [...],
+            "changes": [...], "saved": False}.
+    """
+    hash_index: dict[str, list] = {}
+    for value, row_id in zip(table_data.values(column), table_data.ids):
+        hash_index.setdefault(index_key(value), []).append(row_id)
+    index = {"type": col_type, "hash": hash_index, "changes": [], "saved": False}
+    if col_type in ORDERED_TYPES:
+        index["sorted"] = sorted(map(list, zip(table_data.values(column),
+                                               table_data.ids)))
+    return index
+
+
+def index_from_entries(col_type: str, entries: list) -> dict:
+    """Восстанавливает индекс по его парам [значение, ID].
+
+    Args:
+        col_type (str): Тип столбца.
+        entries (list): Пары [значение, ID] по возрастанию.
+
+    Returns:
+        dict: Индекс, уже записанный в файл индексов (см. build_index).
+    """
+    hash_index: dict[str, list] = {}
+    for value, row_id in entries:
+        hash_index.setdefault(index_key(value), []).append(row_id)
+    index = {"type": col_type, "hash": hash_index, "changes": [], "saved": True}
+    if col_type in ORDERED_TYPES:
+        index["sorted"] = entries
+    return index
+
+
+def index_entries(index: dict) -> list:
+    """Возвращает пары [значение, ID] индекса по возрастанию.
+
+    Args:
+        index (dict): Индекс столбца.
+
+    Returns:
+        list: Пары [значение, ID].
+    """
+    if "sorted" in index:
+        return index["sorted"]
+    return sorted([json.loads(key), row_id]
+                  for key, ids in index["hash"].items() for row_id in ids)
+
+
+def index_add(indexes: dict, row: dict) -> None:
+    """Добавляет запись во все индексы таблицы.
+
+    Args:
+        indexes (dict): Индексы таблицы (столбец: индекс).
+        row (dict): Добавляемая запись.
+    """
+    for column, index in indexes.items():
+        ids = index["hash"].setdefault(index_key(row[column]), [])
+        insort(ids, row["ID"])
+        if "sorted" in index:
+            insort(index["sorted"], [row[column], row["ID"]])
+        index["changes"].append(("add", row[column], row["ID"]))
+
+
+def index_add_many(indexes: dict, rows: list) -> None:
+    """Добавляет пачку записей во все индексы таблицы.
+
+    В отличие от поштучного index_add, в отсортированный индекс большая
+    пачка (от INDEX_MERGE_MIN_ENTRIES записей) добавляется целиком и
+    досортировывается один раз.
+
+    Args:
+        indexes (dict): Индексы таблицы (столбец: индекс).
+        rows (list): Добавляемые записи.
+    """
+    for column, index in indexes.items():
+        for row in rows:
+            insort(index["hash"].setdefault(index_key(row[column]), []), row["ID"])
+        if "sorted" in index and len(rows) < INDEX_MERGE_MIN_ENTRIES:
+            for row in rows:
+                insort(index["sorted"], [row[column], row["ID"]])
+        elif "sorted" in index:
+            index["sorted"].extend([row[column], row["ID"]] for row in rows)
+            index["sorted"].sort()
+        index["changes"].extend(("add", row[column], row["ID"]) for row in rows)
+
+
+def index_remove(indexes: dict, row: dict) -> None:
+    """Удаляет запись из всех индексов таблицы.
+
+    Args:
+        indexes (dict): Индексы таблицы (столбец: индекс).
+        row (dict): Удаляемая запись в том виде, в каком она была
+            проиндексирована.
+    """
+    for column, index in indexes.items():
+        key = index_key(row[column])
+        ids = index["hash"].get(key, [])
+        pos = bisect_left(ids, row["ID"])
+        if pos < len(ids) and ids[pos] == row["ID"]:
+            ids.pop(pos)
+        if not ids:
+            index["hash"].pop(key, None)
+        if "sorted" in index:
+            entries = index["sorted"]
+            pos = bisect_left(entries, [row[column], row["ID"]])
+            if pos < len(entries) and entries[pos] == [row[column], row["ID"]]:
+                entries.pop(pos)
+        index["changes"].append(("remove", row[column], row["ID"]))
+
+
+def index_scan(index: dict, op: str, value) -> tuple[int, Iterable[int]] | None:
+    """Находит по индексу ID записей, подходящих под сравнение.
+
+    Равенство и in ищутся по хеш-индексу, сравнения <, <=, > и >= —
+    двоичным поиском по отсортированному индексу. Число найденных ID
+    известно до их перебора, поэтому по нему можно оценить стоимость
+    поиска.
+
+    Args:
+        index (dict): Индекс столбца.
+        op (str): Оператор сравнения или "in".
+        value: Значение для сравнения, для "in" — множество значений.
+
+    Returns:
+        tuple | None: Пара (количество ID, ID) или None, если индекс
+            неприменим: оператор != или тип значения не совпадает с
+            типом столбца.
+    """
+    py_type = PY_TYPES[index["type"]]
+    if op in ("=", "in"):
+        values = value if op == "in" else (value,)
+        if any(type(v) is not py_type for v in values):
+            return None
+        buckets = [index["hash"].get(index_key(v), []) for v in values]
+        return sum(map(len, buckets)), chain.from_iterable(buckets)
+    if op not in RANGE_OPERATORS or "sorted" not in index \
+            or type(value) is not py_type:
+        return None
+    entries = index["sorted"]
+    lo, hi = 0, len(entries)
+    if op in (">", ">="):
+        lo = (bisect_right if op == ">" else bisect_left)(entries, value, key=VALUE)
+    else:
+        hi = (bisect_left if op == "<" else bisect_right)(entries, value, key=VALUE)
+    return max(hi - lo, 0), map(ENTRY_ID, islice(entries, lo, hi))
+
+
+class TableIndexes(dict):
+    """Индексы таблицы по столбцам вместе с изменениями, ещё не записанными
+    в файл индексов.
+
+    Attributes:
+        dropped (set[str]): Столбцы, индексы которых удалены после
+            последней записи.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dropped: set[str] = set()
+
+    def add(self, column: str, index: dict) -> None:
+        """Добавляет индекс столбца.
+
+        Args:
+            column (str): Имя столбца.
+            index (dict): Индекс (см. build_index).
+        """
+        self[column] = index
+        self.dropped.discard(column)
+
+    def drop(self, column: str) -> None:
+        """Удаляет индекс столбца.
+
+        Args:
+            column (str): Имя столбца.
+        """
+        self.pop(column, None)
+        self.dropped.add(column)
+
+    def drain(self) -> list[dict]:
+        """Забирает изменения индексов в виде записей файла индексов.
+
+        Новые индексы записываются целиком (build), у остальных —
+        только добавленные и удалённые пары (add, remove) в порядке
+        изменений.
+
+        Returns:
+            list[dict]: Записи файла индексов; пустой список, если
+                изменений нет.
+        """
+        records = [{"op": "drop", "column": column}
+                   for column in sorted(self.dropped) if column not in self]
+        self.dropped = set()
+        for column, index in self.items():
+            if not index["saved"]:
+                records.append({"op": "build", "column": column,
+                                "type": index["type"],
+                                "entries": index_entries(index)})
+            else:
+                for op, changes in groupby(index["changes"], key=CHANGE_OP):
+                    records.append({"op": op, "column": column,
+                                    "entries": [[value, row_id]
+                                                for _, value, row_id in changes]})
+            index["changes"] = []
+            index["saved"] = True
+        return records
+
+
+def apply_index_record(indexes: TableIndexes, record: dict) -> None:
+    """Применяет к индексам запись файла индексов.
+
+    Повторное применение записи ничего не меняет: пары добавляются, только
+    если их ещё нет, и удаляются, только если они есть.
+
+    Args:
+        indexes (TableIndexes): Индексы таблицы.
+        record (dict): Запись файла индексов (см. TableIndexes.drain).
+    """
+    column = record["column"]
+    if record["op"] == "drop":
+        indexes.pop(column, None)
+    elif record["op"] == "build":
+        indexes[column] = index_from_entries(record["type"], record["entries"])
+    elif column in indexes:
+        apply = _add_entries if record["op"] == "add" else _remove_entries
+        apply(indexes[column], record["entries"])
+
+
+def _add_entries(index: dict, entries: list) -> None:
+    for value, row_id in entries:
+        ids = index["hash"].setdefault(index_key(value), [])
+        pos = bisect_left(ids, row_id)
+        if pos == len(ids) or ids[pos] != row_id:
+            ids.insert(pos, row_id)
+    if "sorted" not in index:
+        return
+    pairs = index["sorted"]
+    if len(entries) < INDEX_MERGE_MIN_ENTRIES:
+        for entry in entries:
+            pos = bisect_left(pairs, entry)
+            if pos == len(pairs) or pairs[pos] != entry:
+                pairs.insert(pos, entry)
+    else:
+        pairs.extend(entries)
+        pairs.sort()
+        pairs[:] = [pair for pair, _ in groupby(pairs)]
+
+
+def _remove_entries(index: dict, entries: list) -> None:
+    for value, row_id in entries:
+        key = index_key(value)
+        ids = index["hash"].get(key, [])
+        pos = bisect_left(ids, row_id)
+        if pos < len(ids) and ids[pos] == row_id:
+            ids.pop(pos)
+        if not ids:
+            index["hash"].pop(key, None)
+    if "sorted" not in index:
+        return
+    pairs = index["sorted"]
+    if len(entries) < INDEX_MERGE_MIN_ENTRIES:
+        for entry in entries:
+            pos = bisect_left(pairs, entry)
+            if pos < len(pairs) and pairs[pos] == entry:
+                pairs.pop(pos)
+    else:
+        removed = set(map(tuple, entries))
+        pairs[:] = [pair for pair in pairs if tuple(pair) not in removed]
+
+
+def _index_size(index: dict) -> int:
+    if "sorted" in index:
+        return len(index["sorted"])
+    return sum(map(len, index["hash"].values()))
+
+
+class IndexLog:
+    """Файлы индексов таблиц: data/<имя_таблицы>.idx.
+
+    Файл — журнал записей json по одной на строку (см.
+    TableIndexes.drain): при фиксации в его конец дописываются только
+    изменения индексов. Когда пар в журнале становится в
+    COMPACTION_RATIO раз больше, чем в самих индексах, он переписывается
+    записями build.
+    """
+
+    extension = ".idx"
+
+    def __init__(self):
+        self._records: dict[str, int] = {}
+        self._broken: set[str] = set()
+        self._lock = threading.Lock()
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(DATA_FOLDER, f"{table_name}{self.extension}")
+
+    def load(self, table_name: str) -> TableIndexes:
+        """Восстанавливает индексы таблицы, проигрывая журнал.
+
+        Оборванная последняя запись отбрасывается, а следующее сохранение
+        перепишет журнал целиком.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            TableIndexes: Индексы таблицы; пустые, если файла нет.
+        """
+        path = self.path(table_name)
+        add_count("bytes_read", file_size(path))
+        indexes, records, broken = TableIndexes(), 0, False
+        try:
+            with open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = loads(line)
+                    except json.JSONDecodeError:
+                        broken = True
+                        break
+                    apply_index_record(indexes, record)
+                    records += len(record.get("entries", ()))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._records[table_name] = records
+            if broken:
+                self._broken.add(table_name)
+            else:
+                self._broken.discard(table_name)
+        return indexes
+
+    def save(self, table_name: str, records: list[dict],
+             indexes: TableIndexes | None = None) -> TableIndexes | None:
+        """Записывает изменения индексов таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+            records (list[dict]): Записи изменений (см. TableIndexes.drain).
+            indexes (TableIndexes | None): Индексы с уже применёнными
+                изменениями. Если не указаны, они читаются из файла и
+                изменения применяются к ним (восстановление по журналу
+                транзакций).
+
+        Returns:
+            TableIndexes | None: Индексы после изменений или None, если
+                изменений нет.
+        """
+        if not records:
+            return indexes
+        if indexes is None:
+            indexes = self.load(table_name)
+            for record in records:
+                apply_index_record(indexes, record)
+        live = sum(map(_index_size, indexes.values()))
+        added = sum(len(record.get("entries", ())) for record in records)
+        with self._lock:
+            total = self._records.get(table_name, 0) + added
+            rewrite = table_name in self._broken or (
+                total > COMPACTION_MIN_RECORDS and total > COMPACTION_RATIO * live)
+        if rewrite:
+            self.write(table_name, indexes)
+        else:
+            self._append(table_name, records, total)
+        return indexes
+
+    def write(self, table_name: str, indexes: TableIndexes) -> None:
+        """Переписывает журнал индексов записями build.
+
+        Args:
+            table_name (str): Имя таблицы.
+            indexes (TableIndexes): Индексы таблицы.
+        """
+        lines = [dumps({"op": "build", "column": column, "type": index["type"],
+                        "entries": index_entries(index)}) + b"\n"
+                 for column, index in indexes.items()]
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        path = self.path(table_name)
+        with open(path + ".tmp", 'wb') as f:
+            f.writelines(lines)
+        os.replace(path + ".tmp", path)
+        add_count("bytes_written", sum(map(len, lines)))
+        with self._lock:
+            self._records[table_name] = sum(map(_index_size, indexes.values()))
+            self._broken.discard(table_name)
+
+    def _append(self, table_name: str, records: list[dict], total: int) -> None:
+        lines = [dumps(record) + b"\n" for record in records]
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        with open(self.path(table_name), 'ab') as f:
+            f.writelines(lines)
+        add_count("bytes_written", sum(map(len, lines)))
+        with self._lock:
+            self._records[table_name] = total
+
+    def remove(self, table_name: str) -> None:
+        with self._lock:
+            self._records.pop(table_name, None)
+            self._broken.discard(table_name)
+        try:
+            os.remove(self.path(table_name))
+        except FileNotFoundError:
+            pass
+
+
+INDEX_LOG = IndexLog()
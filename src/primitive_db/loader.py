@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+from collections.abc import Iterator
+
+LOAD_FORMATS = {"csv", "jsonl"}
+
+
+def detect_format(path: str, fmt: str | None = None) -> str:
+    """Определяет формат файла для загрузки.
+
+    Args:
+        path (str): Путь к файлу.
+        fmt (str | None): Явно указанный формат.
+
+    Raises:
+        ValueError: Если формат не поддерживается или не определяется
+            по расширению файла.
+
+    Returns:
+        str: Формат файла: csv или jsonl.
+    """
+    if fmt is None:
+        fmt = os.path.splitext(path)[1].lstrip(".").lower()
+        if fmt == "json":
+            fmt = "jsonl"
+    if fmt not in LOAD_FORMATS:
+        raise ValueError(f"Неизвестный формат файла: {fmt or path}. Допустимые: "
+                         f"{', '.join(sorted(LOAD_FORMATS))}.")
+    return fmt
+
+
+def read_rows(path: str, fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """Построчно читает записи из csv (с заголовком) или json lines файла.
+
+    Args:
+        path (str): Путь к файлу.
+        fmt (str): Формат файла: csv или jsonl.
+
+    Yields:
+        tuple[int, dict | str]: Номер строки и запись (столбец: значение)
+            или текст ошибки, если строку не удалось разобрать.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, "Лишние значения в строке."
+                else:
+                    yield reader.line_num, row
+            return
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, f"Некорректный json: {e.msg}."
+                continue
+            if isinstance(row, dict):
+                yield line_no, row
+            else:
+                yield line_no, "Ожидался json объект."
@@ -0,0 +1,206 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from .consts import DATA_FOLDER, LOCK_SUFFIX, META_LOCATION
+
+try:
+    import fcntl
+except ImportError:
+    # Без fcntl (например, в Windows) файловые блокировки ничего не делают:
+    # базу тогда может менять только один процесс.
+    fcntl = None
+
+
+class ReadWriteLock:
+    """Блокировка с общим доступом для чтения и монопольным для записи.
+
+    Ожидающий писатель не пропускает вперёд новых читателей, поэтому
+    поток запросов на чтение не может задержать запись надолго.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire(self, exclusive: bool) -> None:
+        """Захватывает блокировку.
+
+        Args:
+            exclusive (bool): True — для записи, False — для чтения.
+        """
+        with self._cond:
+            if not exclusive:
+                while self._writer or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+                return
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    def release(self, exclusive: bool) -> None:
+        """Освобождает блокировку, захваченную с тем же exclusive."""
+        with self._cond:
+            if exclusive:
+                self._writer = False
+            else:
+                self._readers -= 1
+            self._cond.notify_all()
+
+
+class LockManager:
+    """Блокировки каталога и таблиц для одновременно работающих клиентов.
+
+    Каталог (набор таблиц и их схемы) блокируется целиком: команды,
+    меняющие его, захватывают каталог монопольно, остальные — для
+    чтения. Затем захватываются блокировки затронутых таблиц в порядке
+    имён, поэтому команды не могут ждать друг друга по кругу.
+    """
+
+    def __init__(self):
+        self.catalog = ReadWriteLock()
+        self._tables: dict[str, ReadWriteLock] = {}
+        self._mutex = threading.Lock()
+
+    def table(self, table_name: str) -> ReadWriteLock:
+        """Возвращает блокировку таблицы, создавая её при первом обращении."""
+        with self._mutex:
+            if table_name not in self._tables:
+                self._tables[table_name] = ReadWriteLock()
+            return self._tables[table_name]
+
+    @contextmanager
+    def locked(self, catalog_exclusive: bool = False,
+               tables: dict[str, bool] | None = None):
+        """Выполняет блок под блокировками каталога и таблиц.
+
+        Args:
+            catalog_exclusive (bool): Захватить каталог монопольно.
+            tables (dict[str, bool] | None): Таблицы и признак
+                монопольного захвата каждой.
+        """
+        held = [(self.catalog, catalog_exclusive)]
+        self.catalog.acquire(catalog_exclusive)
+        try:
+            if not catalog_exclusive:
+                for table_name, exclusive in sorted((tables or {}).items()):
+                    lock = self.table(table_name)
+                    lock.acquire(exclusive)
+                    held.append((lock, exclusive))
+            yield
+        finally:
+            for lock, exclusive in reversed(held):
+                lock.release(exclusive)
+
+
+class FileLock:
+    """Рекомендательная блокировка файла (flock) между процессами.
+
+    Блокировка принадлежит процессу целиком: потоки одного процесса
+    делят её и не исключают друг друга — между ними работают блокировки
+    потоков (см. LockManager). Пока блокировку держит хотя бы один поток,
+    файл остаётся заблокированным; запрос монопольного захвата при общем
+    повышает блокировку до монопольной, и она остаётся такой до
+    освобождения последним потоком.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mutex = threading.Lock()
+        self._fd: int | None = None
+        self._holders = 0
+        self._exclusive = False
+
+    def acquire(self, exclusive: bool) -> None:
+        """Захватывает блокировку, дожидаясь её освобождения другими процессами.
+
+        Args:
+            exclusive (bool): True — для записи, False — для чтения.
+        """
+        with self._mutex:
+            if fcntl is not None and (
+                    not self._holders or exclusive and not self._exclusive):
+                if self._fd is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._exclusive = exclusive
+            self._holders += 1
+
+    def release(self, exclusive: bool = False) -> None:
+        """Освобождает блокировку, захваченную ранее этим процессом."""
+        with self._mutex:
+            self._holders -= 1
+            if not self._holders and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)  # type: ignore
+                self._exclusive = False
+
+    @contextmanager
+    def locked(self, exclusive: bool = False):
+        """Выполняет блок под блокировкой."""
+        self.acquire(exclusive)
+        try:
+            yield
+        finally:
+            self.release(exclusive)
+
+
+_file_locks: dict[str, FileLock] = {}
+_file_locks_mutex = threading.Lock()
+# Блокировки таблиц по имени: load_table_data берёт блокировку при каждом
+# чтении, и путь к файлу блокировки не собирается каждый раз заново.
+_table_locks: dict[str, FileLock] = {}
+
+
+def file_lock(path: str) -> FileLock:
+    """Возвращает блокировку файла path, создавая её при первом обращении."""
+    lock = _file_locks.get(path)
+    if lock is None:
+        with _file_locks_mutex:
+            lock = _file_locks.setdefault(path, FileLock(path))
+    return lock
+
+
+def catalog_lock() -> FileLock:
+    """Возвращает межпроцессную блокировку метаданных и журнала транзакций."""
+    return file_lock(META_LOCATION + LOCK_SUFFIX)
+
+
+def table_lock(table_name: str) -> FileLock:
+    """Возвращает межпроцессную блокировку данных таблицы."""
+    lock = _table_locks.get(table_name)
+    if lock is None:
+        lock = file_lock(os.path.join(DATA_FOLDER, table_name + LOCK_SUFFIX))
+        _table_locks[table_name] = lock
+    return lock
+
+
+@contextmanager
+def write_locked(table_names):
+    """Выполняет блок под монопольными блокировками каталога и таблиц.
+
+    Каталог захватывается первым, таблицы — в порядке имён; читатели
+    держат не больше одной блокировки таблицы, поэтому процессы не могут
+    ждать друг друга по кругу.
+
+    Args:
+        table_names: Имена изменяемых таблиц.
+    """
+    held = [catalog_lock()]
+    held[0].acquire(True)
+    try:
+        for table_name in sorted(set(table_names)):
+            lock = table_lock(table_name)
+            lock.acquire(True)
+            held.append(lock)
+        yield
+    finally:
+        for lock in reversed(held):
+            lock.release(True)
@@ -1,9 +1,96 @@
 #!/usr/bin/env python3
-from .engine import run
+import argparse
+import sys
+
+from .consts import SERVER_SOCKET
+from .engine import run, run_script
+from .metrics import PROFILERS, configure
+from .parser import split_statements
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки.
+
+    Args:
+        argv (list[str], optional): Аргументы. По умолчанию sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: Разобранные аргументы.
+    """
+    parser = argparse.ArgumentParser(prog="database",
+                                     description="Простая консольная база данных.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("-e", "--exec", dest="commands", metavar="КОМАНДЫ",
+                        help='выполнить команды, разделённые ";", и выйти')
+    source.add_argument("-f", "--file", metavar="ФАЙЛ",
+                        help='выполнить команды из файла ("-" — стандартный ввод)'
+                             " и выйти")
+    source.add_argument("--serve", action="store_true",
+                        help="запустить сервер, выполняющий команды клиентов")
+    parser.add_argument("-c", "--connect", action="store_true",
+                        help="выполнять команды на запущенном сервере")
+    parser.add_argument("--socket", default=SERVER_SOCKET, metavar="ПУТЬ",
+                        help=f"Unix-сокет сервера (по умолчанию {SERVER_SOCKET})")
+    parser.add_argument("--port", type=int, metavar="ПОРТ",
+                        help="порт TCP сервера на localhost вместо Unix-сокета")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="подтверждать удаление без вопроса")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="не выводить баннер и справку при запуске")
+    parser.add_argument("--metrics", metavar="ФАЙЛ",
+                        help="дописывать замеры каждой команды в файл jsonl")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="профилировать каждую команду и выводить отчёт"
+                             " в stderr")
+    return parser.parse_args(argv)
 
 
 def main():
-    run()
+    args = parse_args()
+    configure(args.metrics, args.profile)
+    if args.serve:
+        # Сервер и клиент импортируются только в своих режимах: asyncio и
+        # socket не нужны обычному запуску.
+        from .server import serve
+
+        serve(args.socket, args.port)
+        return
+    if args.commands is None and args.file is None:
+        if args.connect:
+            connect_client(None, args)
+        else:
+            run(args.quiet)
+        return
+    if args.commands is not None:
+        text = args.commands
+    elif args.file == "-":
+        text = sys.stdin.read()
+    else:
+        try:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            sys.exit(f"Не удалось прочитать файл {args.file}: {e.strerror}.")
+    if args.connect:
+        connect_client(split_statements(text), args)
+    else:
+        run_script(split_statements(text), assume_yes=args.yes)
+
+
+def connect_client(statements: list[str] | None, args: argparse.Namespace) -> None:
+    """Выполняет команды на сервере, завершая программу при ошибке соединения.
+
+    Args:
+        statements (list[str] | None): Команды скрипта или None для
+            интерактивного ввода.
+        args (argparse.Namespace): Аргументы командной строки.
+    """
+    from .client import run_client
+
+    try:
+        run_client(statements, args.socket, args.port, args.yes)
+    except OSError as e:
+        sys.exit(f"Не удалось подключиться к серверу: {e.strerror or e}.")
 
 
 if __name__ == "__main__":
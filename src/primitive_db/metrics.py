@@ -0,0 +1,333 @@
+import json
+import os
+import sys
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from time import perf_counter
+
+from .consts import LATENCY_BUCKETS_MS, PROFILE_TOP
+
+# Модули профилировщиков импортируются, только когда профилирование
+# включено, чтобы не замедлять запуск.
+PROFILERS = ("cprofile", "tracemalloc")
+COUNTERS = ("rows_scanned", "rows_returned", "bytes_read", "bytes_written")
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными границами корзин.
+
+    Границы корзин задаются LATENCY_BUCKETS_MS; значения больше последней
+    границы попадают в отдельную корзину. Перцентили оцениваются верхней
+    границей корзины, но не больше наибольшего значения.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        """Оценивает перцентиль задержки.
+
+        Args:
+            q (float): Доля от 0 до 1.
+
+        Returns:
+            float: Задержка в миллисекундах.
+        """
+        rank = q * self.count
+        seen = 0
+        for bound, hits in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += hits
+            if hits and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max,
+        }
+
+
+class _CommandRecord:
+    """Замеры выполняемой команды.
+
+    Attributes:
+        name (str): Название команды.
+        table (str | None): Таблица команды; '*' — если их несколько.
+        phases (dict[str, float]): Собственное время фаз в секундах без
+            времени вложенных фаз.
+        counters (dict[str, int]): Счётчики строк и байт.
+        stack (list[list]): Открытые фазы: [начало, время вложенных фаз].
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.table: str | None = None
+        self.phases: dict[str, float] = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.stack: list[list[float]] = []
+
+
+class _Metrics:
+    """Накопленные метрики команд и настройки их сбора.
+
+    Attributes:
+        histograms (dict): Гистограммы задержек по ключу (команда,
+            таблица, фаза); фаза total — время команды целиком, other —
+            время вне перечисленных фаз.
+        counters (dict): Счётчики по ключу (команда, таблица).
+        path (str | None): Файл jsonl, в который дописываются замеры
+            каждой команды.
+        profiler (str | None): Профилировщик команд (см. PROFILERS).
+    """
+
+    def __init__(self):
+        self.histograms: dict[tuple[str, str, str], LatencyHistogram] = {}
+        self.counters: dict[tuple[str, str], dict[str, int]] = {}
+        self.path: str | None = None
+        self.profiler: str | None = None
+        self.lock = threading.Lock()
+
+
+class _Current(threading.local):
+    """Команда, выполняемая в текущем потоке."""
+
+    record: _CommandRecord | None = None
+
+
+_metrics = _Metrics()
+_current = _Current()
+
+
+def configure(path: str | None = None, profiler: str | None = None) -> None:
+    """Задаёт файл метрик и профилировщик команд.
+
+    Args:
+        path (str | None): Файл jsonl для замеров команд. None — не писать.
+        profiler (str | None): cprofile, tracemalloc или None.
+
+    Raises:
+        ValueError: Если профилировщик неизвестен.
+    """
+    set_profiler(profiler)
+    _metrics.path = path
+
+
+def set_profiler(profiler: str | None) -> None:
+    """Включает профилирование каждой команды или выключает его.
+
+    Отчёт профилировщика выводится в stderr после команды.
+
+    Args:
+        profiler (str | None): cprofile, tracemalloc или None.
+
+    Raises:
+        ValueError: Если профилировщик неизвестен.
+    """
+    if profiler is not None and profiler not in PROFILERS:
+        raise ValueError(f"Неизвестный профилировщик: {profiler}. Допустимые: "
+                         f"{', '.join(PROFILERS)}.")
+    _metrics.profiler = profiler
+
+
+def file_size(path: str) -> int:
+    """Возвращает размер файла или 0, если файла нет."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def add_count(name: str, amount: int = 1) -> None:
+    """Увеличивает счётчик выполняемой команды.
+
+    Args:
+        name (str): Имя счётчика (см. COUNTERS).
+        amount (int): Приращение.
+    """
+    if _current.record is not None:
+        _current.record.counters[name] += amount
+
+
+def touch_table(table_name: str) -> None:
+    """Отмечает таблицу, с которой работает выполняемая команда."""
+    record = _current.record
+    if record is None or record.table == table_name:
+        return
+    record.table = table_name if record.table is None else "*"
+
+
+@contextmanager
+def phase(name: str):
+    """Замеряет фазу выполняемой команды.
+
+    Время вложенных фаз не входит во время внешней. Вне команды блок
+    просто выполняется.
+
+    Args:
+        name (str): Имя фазы: parse, load, filter, aggregate, sort, render
+            или save.
+    """
+    record = _current.record
+    if record is None:
+        yield
+        return
+    frame = [perf_counter(), 0.0]
+    record.stack.append(frame)
+    try:
+        yield
+    finally:
+        record.stack.pop()
+        elapsed = perf_counter() - frame[0]
+        record.phases[name] = record.phases.get(name, 0.0) + elapsed - frame[1]
+        if record.stack:
+            record.stack[-1][1] += elapsed
+
+
+def timed(name: str):
+    """Декоратор, замеряющий вызов функции как фазу команды (см. phase).
+
+    Args:
+        name (str): Имя фазы.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def command(name: str):
+    """Замеряет команду целиком и по фазам.
+
+    После выполнения задержки добавляются в гистограммы, а замер
+    дописывается в файл метрик, если он задан. Вложенный вызов просто
+    выполняет блок в рамках внешней команды.
+
+    Args:
+        name (str): Название команды.
+    """
+    if _current.record is not None:
+        yield
+        return
+    record = _current.record = _CommandRecord(name)
+    profiler = _metrics.profiler
+    if profiler == "cprofile":
+        import cProfile
+
+        profile = cProfile.Profile()
+        profile.enable()
+    elif profiler == "tracemalloc":
+        import tracemalloc
+
+        tracemalloc.start()
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        total = perf_counter() - start
+        _current.record = None
+        if profiler == "cprofile":
+            profile.disable()
+            import pstats
+
+            print(f"Профиль команды {name}:", file=sys.stderr)
+            pstats.Stats(profile, stream=sys.stderr).sort_stats(
+                "cumulative").print_stats(PROFILE_TOP)
+        elif profiler == "tracemalloc":
+            report_memory(name)
+        _record(record, total)
+
+
+def report_memory(name: str) -> None:
+    """Выводит в stderr пик памяти и места наибольших выделений."""
+    import tracemalloc
+
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Память команды {name}: пик {peak} байт", file=sys.stderr)
+    for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+        print(f"  {stat}", file=sys.stderr)
+
+
+def _record(record: _CommandRecord, total: float) -> None:
+    """Добавляет замеры команды в гистограммы, счётчики и файл метрик."""
+    table = record.table or "-"
+    phases = {**record.phases,
+              "other": max(total - sum(record.phases.values()), 0.0),
+              "total": total}
+    with _metrics.lock:
+        for name, seconds in phases.items():
+            key = (record.name, table, name)
+            if key not in _metrics.histograms:
+                _metrics.histograms[key] = LatencyHistogram()
+            _metrics.histograms[key].add(seconds * 1000)
+        counters = _metrics.counters.setdefault(
+            (record.name, table), dict.fromkeys(("calls", *COUNTERS), 0))
+        counters["calls"] += 1
+        for name, amount in record.counters.items():
+            counters[name] += amount
+    if _metrics.path is None:
+        return
+    line = {
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "command": record.name,
+        "table": table,
+        "phases_ms": {name: round(seconds * 1000, 3)
+                      for name, seconds in phases.items()},
+        **record.counters,
+    }
+    try:
+        with _metrics.lock, open(_metrics.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Не удалось записать метрики в {_metrics.path}: {e.strerror}.",
+              file=sys.stderr)
+
+
+def latency_stats() -> list[dict]:
+    """Возвращает сводку гистограмм задержек.
+
+    Returns:
+        list[dict]: Для каждой тройки (команда, таблица, фаза) — её имена
+            и сводка гистограммы (см. LatencyHistogram.summary).
+    """
+    with _metrics.lock:
+        return [{"command": name, "table": table, "phase": phase_name,
+                 **histogram.summary()}
+                for (name, table, phase_name), histogram
+                in sorted(_metrics.histograms.items())]
+
+
+def counter_stats() -> list[dict]:
+    """Возвращает счётчики вызовов, строк и байт по командам и таблицам."""
+    with _metrics.lock:
+        return [{"command": name, "table": table, **counters}
+                for (name, table), counters in sorted(_metrics.counters.items())]
+
+
+def reset() -> None:
+    """Сбрасывает накопленные гистограммы и счётчики."""
+    with _metrics.lock:
+        _metrics.histograms.clear()
+        _metrics.counters.clear()
@@ -1,6 +1,100 @@
 import re
-import shlex
+from functools import lru_cache
+from typing import NamedTuple
 
+from .consts import STATEMENT_CACHE_SIZE
+
+WHERE_OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+# Строки в кавычках, операторы сравнения, скобки и запятые, слова.
+# Одиночная кавычка без пары попадает в последнюю альтернативу.
+STATEMENT_TOKEN = re.compile(r"\"[^\"]*\"|'[^']*'|<=|>=|!=|[=<>(),]"
+                             r"|(?:[^\s\"'(),<>=!]|!(?!=))+|\S")
+SELECT_OPTIONS = {"limit", "offset", "format"}
+OUTPUT_FORMATS = ("table", "tsv", "jsonl")
+PUNCTUATION = frozenset(("=", "!=", "<", "<=", ">", ">=", "(", ")", ","))
+# Позиция имени таблицы в аргументах команд, работающих с одной таблицей.
+TABLE_ARGUMENT = {"insert": 1, "load": 0, "update": 0, "delete": 1,
+                  "create_index": 0, "drop_index": 0, "info": 0,
+                  "create_table": 0, "drop_table": 0, "migrate": 0}
+AGGREGATE_FUNCTIONS = ("count", "sum", "min", "max", "avg")
+AGGREGATE_CALL = re.compile(r"(\w+)\s*\(\s*(\*|[^\s()*]+)\s*\)")
+PARTITION_SPEC = re.compile(r"(hash|range)\s*\(\s*([^\s()]+)\s*\)\s*(\S.*)",
+                            re.IGNORECASE)
+
+
+class Quoted(str):
+    """Значение, записанное в команде в кавычках.
+
+    Такое значение всегда строка: оно не приводится к числу или bool и
+    не считается ключевым словом.
+    """
+
+    __slots__ = ()
+
+
+class Statement(NamedTuple):
+    """Разобранная команда.
+
+    Для insert, select, update и delete синтаксис проверяется при
+    разборе, а значения и условия приводятся к типам, поэтому при
+    выполнении команда заново не разбирается. Команда неизменяема и
+    может выполняться повторно из кэша parse_statement.
+
+    Attributes:
+        command (str): Название команды в нижнем регистре.
+        args (tuple[str, ...]): Аргументы команды; значения в кавычках —
+            экземпляры Quoted.
+        table (str | None): Таблица команды, работающей с одной таблицей.
+        rows (tuple[tuple[str, ...], ...] | None): Значения записей insert.
+        assignments (tuple | None): Пары (столбец, значение) update.
+        where (tuple | None): Предикат условия (см. parse_where).
+        aggregates (tuple | None): Пары (функция, столбец) select.
+        group_by (str | None): Столбец группировки select.
+        order_by (tuple[str, bool] | None): Столбец сортировки select и
+            признак сортировки по убыванию.
+        limit (int | None): Максимальное количество записей select.
+        offset (int): Количество пропускаемых записей select.
+        fmt (str): Формат вывода select.
+    """
+
+    command: str
+    args: tuple[str, ...] = ()
+    table: str | None = None
+    rows: tuple[tuple[str, ...], ...] | None = None
+    assignments: tuple[tuple[str, str | int | bool], ...] | None = None
+    where: tuple | None = None
+    aggregates: tuple[tuple[str, str], ...] | None = None
+    group_by: str | None = None
+    order_by: tuple[str, bool] | None = None
+    limit: int | None = None
+    offset: int = 0
+    fmt: str = "table"
+
+
+def tokenize(text: str) -> list[str]:
+    """Разбивает команду на токены за один проход.
+
+    Токены — слова, значения в кавычках (Quoted, без кавычек), операторы
+    сравнения, скобки и запятые. Внутри кавычек пробелы, запятые и '='
+    сохраняются.
+
+    Args:
+        text (str): Текст команды.
+
+    Raises:
+        ValueError: Если кавычка не закрыта.
+
+    Returns:
+        list[str]: Токены команды.
+    """
+    tokens = STATEMENT_TOKEN.findall(text)
+    if '"' in text or "'" in text:
+        for pos, token in enumerate(tokens):
+            if token[0] in "\"'":
+                if len(token) < 2:
+                    raise ValueError("Нет закрывающей кавычки.")
+                tokens[pos] = Quoted(token[1:-1])
+    return tokens
 
 def parse_command(command_str):
     """Парсит строку команды на команду и аргументы.
@@ -8,14 +102,148 @@ def parse_command(command_str):
     Args:
         command_str (str): Строка с командой.
 
+    Raises:
+        ValueError: Если кавычка не закрыта.
+
     Returns:
         tuple: Кортеж из команды и списка аргументов.
     """
-    args = shlex.split(command_str)
+    args = tokenize(command_str)
     if not args:
         return "", []
     return args[0], args[1:]
 
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def parse_statement(text: str) -> Statement:
+    """Разбирает команду в Statement.
+
+    Результат кэшируется по тексту команды, поэтому повторяющиеся
+    команды скрипта разбираются один раз.
+
+    Args:
+        text (str): Текст команды.
+
+    Raises:
+        ValueError: Если синтаксис команды некорректен.
+
+    Returns:
+        Statement: Разобранная команда.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return Statement("")
+    cmd, args = tokens[0].lower(), tokens[1:]
+    match cmd:
+        case "insert":
+            return _parse_insert(args, _keywords(args))
+        case "select":
+            return _parse_select(args, _keywords(args))
+        case "update":
+            return _parse_update(args, _keywords(args))
+        case "delete":
+            return _parse_delete(args, _keywords(args))
+    position = TABLE_ARGUMENT.get(cmd)
+    table = args[position] if position is not None and position < len(args) \
+        else None
+    return Statement(cmd, tuple(args), table)
+
+def _keywords(tokens: list[str]) -> list[str | None]:
+    # Токены в нижнем регистре для поиска ключевых слов; значения в
+    # кавычках ключевыми словами не бывают.
+    return [None if type(token) is Quoted else token.lower() for token in tokens]
+
+def _is_word(token: str, word: str) -> bool:
+    return token.lower() == word and type(token) is not Quoted
+
+def _syntax_error(cmd: str) -> ValueError:
+    return ValueError(f"Некорректный синтаксис команды {cmd}.")
+
+def _parse_insert(args: list[str], words: list[str | None]) -> Statement:
+    # insert into <таблица> values (<значение>, ...), (<значение>, ...), ...
+    # Скобки единственной записи необязательны.
+    if len(args) < 4 or words[0] != "into" or words[2] != "values":
+        raise _syntax_error("insert")
+    tokens, words = args[3:], words[3:]
+    if words[0] != "(":
+        return Statement("insert", tuple(args), args[1],
+                         rows=(_parse_row(tokens, words),))
+    rows = []
+    start = 0
+    while start < len(tokens):
+        end = _find(words, ")", start)
+        if words[start] != "(" or end < 0:
+            raise ValueError("Некорректное значение: ожидалось "
+                             "'(значение1, значение2, ...), (...)'.")
+        rows.append(_parse_row(tokens[start + 1:end], words[start + 1:end]))
+        start = end + 1
+        if start < len(tokens):
+            if words[start] != ",":
+                raise ValueError(f"Некорректное значение: {tokens[start]}. "
+                                 "Ожидалась ',' между записями.")
+            start += 1
+            if start == len(tokens):
+                raise ValueError("Некорректное значение: нет записи после ','.")
+    return Statement("insert", tuple(args), args[1], rows=tuple(rows))
+
+def _find(words: list[str | None], word: str, start: int) -> int:
+    try:
+        return words.index(word, start)
+    except ValueError:
+        return -1
+
+def _parse_row(tokens: list[str], words: list[str | None]) -> tuple[str, ...]:
+    # Значения записи insert через запятую.
+    values = tokens[::2]
+    separators = words[1::2]
+    if not values or len(tokens) % 2 == 0 \
+            or separators != [","] * len(separators):
+        raise ValueError("Некорректное значение: ожидалось "
+                         "'(значение1, значение2, ...)'.")
+    for value, word in zip(values, words[::2]):
+        if word in PUNCTUATION:
+            raise ValueError(f"Некорректное значение: {value}.")
+    return tuple(map(str, values))
+
+def _parse_select(args: list[str], words: list[str | None]) -> Statement:
+    # select [агрегаты] from <таблица> [where ...] [group by ...]
+    # [order by ...] [опции]
+    from_pos = words.index("from") if "from" in words else -1
+    if from_pos < 0 or len(args) < from_pos + 2:
+        raise _syntax_error("select")
+    aggregates = None
+    if from_pos:
+        aggregates = tuple(parse_aggregates(" ".join(args[:from_pos])))
+    rest, options = split_options(args[from_pos + 2:], SELECT_OPTIONS)
+    rest, order_by = split_order_by(rest)
+    rest, group_by = split_group_by(rest)
+    if (group_by and not aggregates) or rest and (
+            len(rest) < 2 or words[from_pos + 2] != "where"
+            or words.count("where") != 1):
+        raise _syntax_error("select")
+    limit, offset, fmt = parse_select_options(options)
+    return Statement("select", tuple(args), args[from_pos + 1],
+                     where=_parse_where_tokens(rest[1:]), aggregates=aggregates,
+                     group_by=group_by, order_by=order_by, limit=limit,
+                     offset=offset, fmt=fmt)
+
+def _parse_update(args: list[str], words: list[str | None]) -> Statement:
+    # update <таблица> set <столбец> = <значение> ... where ...
+    if len(args) < 5 or words[1] != "set" or words.count("where") != 1 \
+            or words[-1] == "where":
+        raise _syntax_error("update")
+    pos = words.index("where")
+    return Statement("update", tuple(args), args[0],
+                     assignments=_parse_assignments(args[2:pos]),
+                     where=_parse_where_tokens(args[pos + 1:]))
+
+def _parse_delete(args: list[str], words: list[str | None]) -> Statement:
+    # delete from <таблица> where ...
+    if len(args) < 4 or words[0] != "from" or words[2] != "where" \
+            or words.count("where") != 1:
+        raise _syntax_error("delete")
+    return Statement("delete", tuple(args), args[1],
+                     where=_parse_where_tokens(args[3:]))
+
 def parse_pairs(pairs):
     """Проверяет корректность пар 'ключ:значение'.
 
@@ -33,6 +261,51 @@ def parse_pairs(pairs):
         
     return invalid
 
+def split_options(args: list[str], names: set[str]) -> tuple[list[str], dict]:
+    """Отделяет от конца списка аргументов пары 'опция значение'.
+
+    Например, для ['where', 'age', '=', '28', 'limit', '10'] и {'limit'}
+    вернёт (['where', 'age', '=', '28'], {'limit': '10'}).
+
+    Args:
+        args (list[str]): Аргументы команды.
+        names (set[str]): Допустимые имена опций.
+
+    Returns:
+        tuple: Аргументы без опций и словарь опций (имя: значение).
+    """
+    rest = list(args)
+    options = {}
+    while len(rest) >= 2 and rest[-2].lower() in names \
+            and rest[-2].lower() not in options \
+            and type(rest[-2]) is not Quoted:
+        options[rest[-2].lower()] = rest[-1]
+        rest = rest[:-2]
+    return rest, options
+
+def parse_value(val: str) -> str | int | bool:
+    """Приводит строковое значение условия к типу.
+
+    Args:
+        val (str): Значение из условия.
+
+    Returns:
+        str | int | bool: bool для true/false, int для целых чисел,
+            иначе строка. Значение в кавычках (Quoted) всегда строка.
+    """
+    if type(val) is Quoted:
+        return str(val)
+    if '""' in val or "''" in val:
+        return val.replace('""', '').replace("''", "")
+    if val.lower() == "true":
+        return True
+    if val.lower() == "false":
+        return False
+    try:
+        return int(val)
+    except ValueError:
+        return val
+
 def parse_clause(clause_str: str) -> dict[str, str | int | bool]:
     """Парсит строку условия (например, 'name=John age=25').
 
@@ -46,27 +319,266 @@ def parse_clause(clause_str: str) -> dict[str, str | int | bool]:
         dict: Словарь с разобранными условиями,
             где значения приведены к соответствующим типам.
     """
-    result = {}
-    if not clause_str:
-        return result
-    clause_str = clause_str.strip()
-    clause_str = re.sub(r"\s*=\s*", "=", clause_str)
-    for i in clause_str.split(" "):
+    return dict(_parse_assignments(tokenize(clause_str)))
 
-        if "=" not in i:
-            raise ValueError(f"Некорректное значение: {i}. Ожидалось"
+def _parse_assignments(tokens: list[str]) -> tuple:
+    # Пары 'столбец = значение' через пробел или запятую.
+    tokens = tokens[::-1]
+    pairs = []
+    while tokens:
+        column = _pop_word(tokens, "столбец")
+        if not tokens or not _is_word(tokens[-1], "="):
+            raise ValueError(f"Некорректное значение: {column}. Ожидалось"
                              " 'столбец=значение'.")
-        col, val = i.split("=", 1)
-        if '""' in val or "''" in val:
-            val = val.replace('""', '').replace("''", "")
-            result[col] = val
-        elif val.lower() == "true":
-            result[col] = True
-        elif val.lower() == "false":
-            result[col] = False
-        else:
-            try:
-                result[col] = int(val)
-            except ValueError:
-                result[col] = val
-    return result
+        tokens.pop()
+        pairs.append((column, parse_value(_pop_value(tokens))))
+        if tokens and _is_word(tokens[-1], ","):
+            tokens.pop()
+    return tuple(pairs)
+
+def parse_where(clause_str: str) -> tuple | None:
+    """Парсит условие where в предикат.
+
+    Поддерживаются сравнения 'столбец <оператор> значение' с операторами
+    =, !=, <, <=, >, >=, списки 'столбец in (значение1, значение2, ...)',
+    связки and и or и скобки. and связывает сильнее or, а условия,
+    записанные подряд без связки (например, 'name=John age=25'),
+    объединяются через and.
+
+    Args:
+        clause_str (str): Строка с условием.
+
+    Raises:
+        ValueError: Если формат условия некорректен.
+
+    Returns:
+        tuple | None: Предикат или None для пустого условия. Сравнение
+            записывается как (оператор, столбец, значение), список — как
+            ("in", столбец, frozenset значений), связки — как
+            ("and", (предикат, ...)) и ("or", (предикат, ...)).
+    """
+    return _parse_where_tokens(tokenize(clause_str))
+
+def _parse_where_tokens(tokens: list[str]) -> tuple | None:
+    if not tokens:
+        return None
+    tokens = tokens[::-1]
+    predicate = _parse_or(tokens)
+    if tokens:
+        raise ValueError(f"Некорректное значение: {tokens[-1]}. Ожидалось"
+                         " and, or или конец условия.")
+    return predicate
+
+def _parse_or(tokens: list[str]) -> tuple:
+    terms = [_parse_and(tokens)]
+    while tokens and _is_word(tokens[-1], "or"):
+        tokens.pop()
+        terms.append(_parse_and(tokens))
+    return terms[0] if len(terms) == 1 else ("or", tuple(terms))
+
+def _parse_and(tokens: list[str]) -> tuple:
+    terms = [_parse_term(tokens)]
+    while tokens and not _is_word(tokens[-1], "or") \
+            and not _is_word(tokens[-1], ")"):
+        if _is_word(tokens[-1], "and"):
+            tokens.pop()
+        terms.append(_parse_term(tokens))
+    return terms[0] if len(terms) == 1 else ("and", tuple(terms))
+
+def _parse_term(tokens: list[str]) -> tuple:
+    if tokens and _is_word(tokens[-1], "("):
+        tokens.pop()
+        predicate = _parse_or(tokens)
+        _expect(tokens, ")")
+        return predicate
+    column = _pop_word(tokens, "столбец")
+    op = "" if not tokens or type(tokens[-1]) is Quoted \
+        else tokens.pop().lower()
+    if op == "in":
+        _expect(tokens, "(")
+        values = [parse_value(_pop_value(tokens))]
+        while tokens and _is_word(tokens[-1], ","):
+            tokens.pop()
+            values.append(parse_value(_pop_value(tokens)))
+        _expect(tokens, ")")
+        return ("in", column, frozenset(values))
+    if op not in WHERE_OPERATORS:
+        raise ValueError(f"Некорректный оператор: {op or 'нет'} после {column}. "
+                         f"Допустимые: {', '.join(WHERE_OPERATORS)}, in.")
+    return (op, column, parse_value(_pop_value(tokens)))
+
+def _pop_value(tokens: list[str]) -> str:
+    if tokens and type(tokens[-1]) is Quoted:
+        return tokens.pop()
+    return _pop_word(tokens, "значение")
+
+def _pop_word(tokens: list[str], expected: str) -> str:
+    if not tokens or type(tokens[-1]) is Quoted or tokens[-1] in PUNCTUATION:
+        found = tokens[-1] if tokens else "конец условия"
+        raise ValueError(f"Некорректное значение: {found}. Ожидалось: {expected}.")
+    return tokens.pop()
+
+def _expect(tokens: list[str], token: str) -> None:
+    if not tokens or not _is_word(tokens[-1], token):
+        found = tokens[-1] if tokens else "конец условия"
+        raise ValueError(f"Некорректное значение: {found}. Ожидалось '{token}'.")
+    tokens.pop()
+
+def split_group_by(args: list[str]) -> tuple[list[str], str | None]:
+    """Отделяет от конца списка аргументов 'group by <столбец>'.
+
+    Args:
+        args (list[str]): Аргументы команды без опций.
+
+    Returns:
+        tuple: Аргументы без группировки и столбец группировки или None.
+    """
+    if len(args) >= 3 and _is_word(args[-3], "group") and _is_word(args[-2], "by"):
+        return args[:-3], args[-1]
+    return args, None
+
+def split_order_by(args: list[str]) -> tuple[list[str], tuple[str, bool] | None]:
+    """Отделяет от конца списка аргументов 'order by <столбец> [asc|desc]'.
+
+    Столбцом может быть и агрегат, например 'order by count(*) desc'.
+
+    Args:
+        args (list[str]): Аргументы команды без опций.
+
+    Raises:
+        ValueError: Если после 'order by' нет столбца.
+
+    Returns:
+        tuple: Аргументы без сортировки и пара (столбец, признак
+            сортировки по убыванию) или None.
+    """
+    words = _keywords(args)
+    pos = len(words) - 1
+    while pos > 0 and not (words[pos - 1] == "order" and words[pos] == "by"):
+        pos -= 1
+    if pos <= 0:
+        return args, None
+    column = args[pos + 1:]
+    descending = False
+    if column and _keywords(column[-1:])[0] in ("asc", "desc"):
+        descending = column.pop().lower() == "desc"
+    name = "".join(column)
+    if len(column) != 1 and not AGGREGATE_CALL.fullmatch(name):
+        raise ValueError(f"Некорректное значение: {' '.join(column) or 'нет'}. "
+                         "Ожидалось 'order by столбец [asc|desc]'.")
+    return args[:pos - 1], (name, descending)
+
+def parse_select_options(options: dict) -> tuple:
+    """Проверяет опции limit, offset и format команды select.
+
+    Args:
+        options (dict): Опции команды (имя: значение).
+
+    Raises:
+        ValueError: Если значение опции некорректно.
+
+    Returns:
+        tuple: Кортеж (limit, offset, fmt).
+    """
+    values = {}
+    for name in ("limit", "offset"):
+        raw = options.get(name)
+        if raw is None:
+            continue
+        if not raw.isdigit():
+            raise ValueError(f"Некорректное значение {name}: {raw}. Ожидалось "
+                             "неотрицательное целое число.")
+        values[name] = int(raw)
+    fmt = options.get("format", "table").lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Неизвестный формат вывода: {fmt}. Допустимые: "
+                         f"{', '.join(OUTPUT_FORMATS)}.")
+    return values.get("limit"), values.get("offset", 0), fmt
+
+def parse_aggregates(select_str: str) -> list[tuple[str, str]]:
+    """Парсит список агрегатов (например, 'count(*), avg(age)').
+
+    Args:
+        select_str (str): Список агрегатов через запятую.
+
+    Raises:
+        ValueError: Если агрегат записан некорректно или неизвестен.
+
+    Returns:
+        list[tuple[str, str]]: Пары (функция, столбец); для count(*)
+            столбец — '*'.
+    """
+    aggregates = []
+    for item in select_str.split(","):
+        match = AGGREGATE_CALL.fullmatch(item.strip())
+        if match is None:
+            raise ValueError(f"Некорректное значение: {item.strip()}. Ожидалось"
+                             " 'функция(столбец)'.")
+        func, column = match.group(1).lower(), match.group(2)
+        if func not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Неизвестная функция: {func}. Допустимые: "
+                             f"{', '.join(AGGREGATE_FUNCTIONS)}.")
+        if column == "*" and func != "count":
+            raise ValueError(f"Функция {func} не применима к '*'.")
+        aggregates.append((func, column))
+    return aggregates
+
+def parse_partition(spec_str: str) -> dict:
+    """Парсит схему секционирования таблицы.
+
+    Допустимы 'hash(<столбец>) <N>' — N сегментов по хешу значения и
+    'range(<столбец>) <граница1>, <граница2>, ...' — сегменты по
+    диапазонам значений между границами.
+
+    Args:
+        spec_str (str): Схема секционирования после 'partition by'.
+
+    Raises:
+        ValueError: Если схема записана некорректно.
+
+    Returns:
+        dict: {"kind": "hash", "column": ..., "segments": N} или
+            {"kind": "range", "column": ..., "bounds": [...]}.
+    """
+    match = PARTITION_SPEC.fullmatch(spec_str.strip())
+    if match is None:
+        raise ValueError(f"Некорректная схема секционирования: {spec_str}. "
+                         "Ожидалось 'hash(столбец) N' или "
+                         "'range(столбец) граница1, граница2, ...'.")
+    kind, column, rest = match.group(1).lower(), match.group(2), match.group(3)
+    if kind == "hash":
+        if not rest.isdigit():
+            raise ValueError(f"Некорректное количество сегментов: {rest}.")
+        return {"kind": kind, "column": column, "segments": int(rest)}
+    bounds = [parse_value(bound.strip()) for bound in rest.split(",")]
+    return {"kind": kind, "column": column, "bounds": bounds}
+
+def split_statements(text: str) -> list[str]:
+    """Разбивает текст скрипта на отдельные команды.
+
+    Команды разделяются точкой с запятой или переводом строки вне кавычек.
+    Пустые команды и строки-комментарии (начинающиеся с '#' или '--')
+    пропускаются.
+
+    Args:
+        text (str): Текст скрипта.
+
+    Returns:
+        list[str]: Список команд.
+    """
+    statements = []
+    current = []
+    quote = ""
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = ""
+        elif char in "\"'":
+            quote = char
+        elif char in ";\n":
+            statements.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    statements.append("".join(current).strip())
+    return [s for s in statements if s and not s.startswith(("#", "--"))]
@@ -0,0 +1,63 @@
+ALLOWED_TYPES = {"int", "str", "bool"}
+
+
+def convert_value(col_type: str, raw):
+    """Приводит значение к типу столбца.
+
+    Принимает как строки (из команд и csv), так и уже типизированные
+    значения (из json).
+
+    Args:
+        col_type (str): Тип столбца: int, str или bool.
+        raw: Исходное значение.
+
+    Raises:
+        ValueError: Если значение не приводится к типу столбца.
+        ValueError: Если тип столбца недопустим.
+
+    Returns:
+        int | str | bool: Значение нужного типа.
+    """
+    if col_type == "int":
+        if isinstance(raw, int) and not isinstance(raw, bool):
+            return raw
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            raise ValueError(f"Некорректное значение: {raw}. Ожидалось int.")
+    elif col_type == "bool":
+        if isinstance(raw, bool):
+            return raw
+        low = str(raw).strip().lower()
+        if low == "true":
+            return True
+        if low == "false":
+            return False
+        raise ValueError(
+            f"Некорректное значение: {raw}. Ожидалось bool (true/false)."
+        )
+    elif col_type == "str":
+        if not isinstance(raw, str):
+            raise ValueError(f"Некорректное значение: {raw}. Ожидалось str.")
+        return raw
+    raise ValueError(f"Недопустимый тип столбца: {col_type}.")
+
+
+def convert_row(columns: list[tuple[str, str]], raw_row: dict) -> dict:
+    """Проверяет запись по схеме и приводит её значения к типам столбцов.
+
+    Args:
+        columns (list[tuple[str, str]]): Столбцы таблицы без ID (имя, тип).
+        raw_row (dict): Исходная запись (столбец: значение). Лишние
+            поля, в том числе ID, игнорируются.
+
+    Raises:
+        ValueError: Если для столбца нет значения или оно некорректно.
+
+    Returns:
+        dict: Запись без ID со значениями нужных типов.
+    """
+    missing = [col for col, _ in columns if col not in raw_row]
+    if missing:
+        raise ValueError(f"Нет значений для столбцов: {', '.join(missing)}.")
+    return {col: convert_value(typ, raw_row[col]) for col, typ in columns}
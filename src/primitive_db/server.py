@@ -0,0 +1,226 @@
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.decorators import set_assume_yes
+
+from .consts import SERVER_HOST, SERVER_MAX_LINE, SERVER_SOCKET
+from .engine import execute, open_database, prepare_statement
+from .locks import LockManager
+from .parser import Statement
+from .storage import wait_compactions
+from .utils import checkpoint, in_transaction, rollback_transaction
+
+# Команды, меняющие набор таблиц или открывающие и закрывающие транзакцию.
+CATALOG_COMMANDS = {"create_table", "drop_table", "migrate", "begin", "commit",
+                    "rollback"}
+READ_COMMANDS = {"select", "info"}
+
+
+def statement_locks(statement: Statement) -> tuple[bool, dict[str, bool]]:
+    """Определяет блокировки, нужные команде.
+
+    Args:
+        statement (Statement): Разобранная команда.
+
+    Returns:
+        tuple: Признак монопольного захвата каталога и таблицы команды
+            с признаком монопольного захвата (см. LockManager.locked).
+    """
+    if statement.command in CATALOG_COMMANDS:
+        return True, {}
+    if statement.table is None:
+        return False, {}
+    return False, {statement.table: statement.command not in READ_COMMANDS}
+
+
+class SessionOutput(io.TextIOBase):
+    """Поток вывода, перенаправляемый в буфер клиента текущего потока.
+
+    Команды движка печатают результат в sys.stdout; на время команды
+    клиента поток сервера направляет его в буфер этого клиента, а вне
+    команд вывод идёт в исходный поток.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    @property
+    def buffer(self) -> io.StringIO | None:
+        return getattr(self._local, "buffer", None)
+
+    @buffer.setter
+    def buffer(self, value: io.StringIO | None) -> None:
+        self._local.buffer = value
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return (self.buffer or self.stream).write(text)
+
+    def flush(self) -> None:
+        if self.buffer is None:
+            self.stream.flush()
+
+
+class Session:
+    """Сеанс клиента сервера.
+
+    Команды сеанса выполняются по одной в собственном потоке, поэтому у
+    каждого клиента своя транзакция (см. utils._PendingWrites). Команда
+    выполняется под блокировками каталога и своей таблицы: чтения одной
+    таблицы идут одновременно, а изменения — по одному. Явная транзакция
+    (begin) держит каталог монопольно до commit или rollback.
+    """
+
+    def __init__(self, locks: LockManager, output: SessionOutput):
+        self.locks = locks
+        self.output = output
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.holding_catalog = False
+
+    def execute(self, statement: str) -> tuple[str, bool]:
+        """Выполняет команду клиента.
+
+        Args:
+            statement (str): Команда в обычном синтаксисе.
+
+        Returns:
+            tuple: Вывод команды и флаг завершения сеанса.
+        """
+        self.output.buffer = io.StringIO()
+        try:
+            prepared = prepare_statement(statement)
+            over = prepared is not None and self._run(prepared)
+            return self.output.buffer.getvalue(), over
+        finally:
+            self.output.buffer = None
+
+    def _run(self, statement: Statement) -> bool:
+        if statement.command == "exit":
+            return True
+        if not self.holding_catalog and statement.command == "begin":
+            self.locks.catalog.acquire(True)
+            self.holding_catalog = True
+        if self.holding_catalog:
+            try:
+                return self._execute(statement)
+            finally:
+                if not in_transaction():
+                    self.holding_catalog = False
+                    self.locks.catalog.release(True)
+        catalog, tables = statement_locks(statement)
+        with self.locks.locked(catalog, tables):
+            return self._execute(statement)
+
+    def _execute(self, statement: Statement) -> bool:
+        try:
+            return execute(statement)
+        except Exception as e:
+            print(f"Произошла непредвиденная ошибка: {e}")
+            return False
+
+    def close(self) -> None:
+        """Отменяет незавершённую транзакцию клиента и снимает блокировки."""
+        if in_transaction():
+            rollback_transaction()
+        if self.holding_catalog:
+            self.holding_catalog = False
+            self.locks.catalog.release(True)
+
+
+async def handle_client(reader: asyncio.StreamReader,
+                        writer: asyncio.StreamWriter, locks: LockManager,
+                        output: SessionOutput) -> None:
+    """Обслуживает соединение клиента.
+
+    Клиент присылает по команде в строке, сервер отвечает на каждую
+    строкой json с полями output (вывод команды) и exit (сеанс
+    завершён командой exit).
+    """
+    loop = asyncio.get_running_loop()
+    session = Session(locks, output)
+    try:
+        while line := await reader.readline():
+            statement = line.decode('utf-8').strip()
+            if not statement:
+                continue
+            text, over = await loop.run_in_executor(session.executor,
+                                                    session.execute, statement)
+            response = {"output": text, "exit": over}
+            writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8')
+                         + b"\n")
+            await writer.drain()
+            if over:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        await loop.run_in_executor(session.executor, session.close)
+        session.executor.shutdown(wait=False)
+        writer.close()
+
+
+async def _serve(socket_path: str, port: int | None,
+                 output: SessionOutput) -> None:
+    locks = LockManager()
+
+    async def handle(reader, writer):
+        await handle_client(reader, writer, locks, output)
+
+    if port is None:
+        server = await asyncio.start_unix_server(handle, socket_path,
+                                                 limit=SERVER_MAX_LINE)
+        address = socket_path
+    else:
+        server = await asyncio.start_server(handle, SERVER_HOST, port,
+                                            limit=SERVER_MAX_LINE)
+        address = f"{SERVER_HOST}:{port}"
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+
+    def shutdown():
+        if not stop.done():
+            stop.set_result(None)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, shutdown)
+    print(f"Сервер базы данных слушает {address}.", file=sys.stderr)
+    await stop
+    server.close()
+    print("Сервер остановлен.", file=sys.stderr)
+
+
+def serve(socket_path: str = SERVER_SOCKET, port: int | None = None) -> None:
+    """Запускает сервер базы данных.
+
+    Сервер держит метаданные и таблицы в общем кэше и выполняет команды
+    клиентов, подключившихся к Unix-сокету socket_path или к порту port
+    на localhost. Удаление подтверждается на стороне клиента. Сервер
+    останавливается по SIGINT или SIGTERM.
+
+    Args:
+        socket_path (str): Путь к Unix-сокету.
+        port (int | None): Порт TCP; если задан, сокет не создаётся.
+    """
+    set_assume_yes(True)
+    open_database()
+    if port is None and os.path.exists(socket_path):
+        os.remove(socket_path)
+    stdout, output = sys.stdout, SessionOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        asyncio.run(_serve(socket_path, port, output))
+    finally:
+        sys.stdout = stdout
+        checkpoint()
+        wait_compactions()
+        if port is None and os.path.exists(socket_path):
+            os.remove(socket_path)
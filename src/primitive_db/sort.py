@@ -0,0 +1,144 @@
+import heapq
+from collections.abc import Iterable, Iterator
+from itertools import batched
+from operator import itemgetter
+
+from .consts import INDEX_SCAN_MAX_SHARE, SORT_RUN_ROWS, SORT_SPILL_BLOCK
+from .index import ENTRY_ID
+from .metrics import add_count, phase
+
+POSITION = itemgetter(1)
+
+
+def ordered_positions(table_data, column: str, descending: bool = False,
+                      positions: list[int] | None = None, stop: int | None = None,
+                      index: dict | None = None) -> Iterator[int]:
+    """Упорядочивает позиции записей по значению столбца.
+
+    Записи с равными значениями упорядочиваются по ID в том же
+    направлении. Способ выбирается по стоимости:
+
+    - по ID таблица уже упорядочена;
+    - по отсортированному индексу столбца записи перебираются в порядке
+      индекса, и перебор останавливается после stop подходящих записей;
+      с условием — только если подходит больше INDEX_SCAN_MAX_SHARE
+      таблицы, иначе отобранные записи дешевле упорядочить отдельно;
+    - при известном stop первые stop записей отбираются кучей размера
+      stop за O(n log stop) без сортировки всей выборки;
+    - иначе выборка сортируется в памяти, а если она больше
+      SORT_RUN_ROWS — внешней сортировкой слиянием (см. external_sort).
+
+    Args:
+        table_data (ColumnTable): Данные таблицы.
+        column (str): Столбец сортировки.
+        descending (bool): Сортировать по убыванию.
+        positions (list[int] | None): Позиции подходящих записей по
+            возрастанию; None — вся таблица.
+        stop (int | None): Сколько первых записей понадобится; None — все.
+        index (dict | None): Индекс столбца (см. build_index).
+
+    Returns:
+        Iterator[int]: Позиции записей в порядке сортировки.
+    """
+    if column == "ID":
+        ordered = range(len(table_data)) if positions is None else positions
+        return reversed(ordered) if descending else iter(ordered)
+    if index and "sorted" in index and (
+            positions is None
+            or len(positions) > len(table_data) * INDEX_SCAN_MAX_SHARE):
+        entries = index["sorted"]
+        found = map(table_data.position, map(ENTRY_ID, reversed(entries)
+                                             if descending else entries))
+        if positions is None:
+            add_count("rows_scanned", len(table_data) if stop is None
+                      else min(stop, len(table_data)))
+            return found
+        return filter(set(positions).__contains__, found)
+    if positions is None:
+        add_count("rows_scanned", len(table_data))
+        positions = range(len(table_data))
+    keyed = zip(table_data.values(column, positions), positions)
+    with phase("sort"):
+        if stop is not None and stop < len(positions):
+            top = heapq.nlargest if descending else heapq.nsmallest
+            return map(POSITION, top(stop, keyed))
+        if len(positions) <= SORT_RUN_ROWS:
+            return map(POSITION, sorted(keyed, reverse=descending))
+        return map(POSITION, external_sort(keyed, descending, SORT_RUN_ROWS))
+
+
+def external_sort(items: Iterable[tuple], descending: bool = False,
+                  run_size: int = SORT_RUN_ROWS) -> Iterator[tuple]:
+    """Сортирует элементы, не держа в памяти больше run_size из них.
+
+    Элементы разбиваются на отрезки по run_size, каждый отрезок
+    сортируется в памяти и сбрасывается во временный файл блоками по
+    SORT_SPILL_BLOCK элементов, после чего отрезки сливаются кучей.
+    Временные файлы удаляются после перебора результата.
+
+    Args:
+        items (Iterable[tuple]): Сортируемые элементы.
+        descending (bool): Сортировать по убыванию.
+        run_size (int): Размер отрезка, сортируемого в памяти.
+
+    Returns:
+        Iterator[tuple]: Элементы в порядке сортировки.
+    """
+    import pickle
+    import tempfile
+
+    runs = []
+    try:
+        for chunk in batched(items, run_size):
+            run = tempfile.TemporaryFile(prefix="primitive_db_sort_")
+            runs.append(run)
+            for block in batched(sorted(chunk, reverse=descending),
+                                 SORT_SPILL_BLOCK):
+                pickle.dump(block, run, pickle.HIGHEST_PROTOCOL)
+            run.seek(0)
+    except BaseException:
+        for run in runs:
+            run.close()
+        raise
+    return _merge_runs(runs, descending)
+
+
+def _merge_runs(runs: list, descending: bool) -> Iterator[tuple]:
+    try:
+        yield from heapq.merge(*map(_read_run, runs), reverse=descending)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _read_run(run) -> Iterator[tuple]:
+    import pickle
+
+    while True:
+        try:
+            block = pickle.load(run)
+        except EOFError:
+            return
+        yield from block
+
+
+def top_rows(rows: Iterable[dict], column: str, descending: bool = False,
+             stop: int | None = None) -> list[dict]:
+    """Упорядочивает небольшую выборку записей (например, групп агрегатов).
+
+    Args:
+        rows (Iterable[dict]): Записи.
+        column (str): Столбец сортировки.
+        descending (bool): Сортировать по убыванию.
+        stop (int | None): Сколько первых записей понадобится; None — все.
+
+    Returns:
+        list[dict]: Первые stop записей в порядке сортировки.
+    """
+    key = itemgetter(column)
+    rows = list(rows)
+    with phase("sort"):
+        if stop is not None and stop < len(rows):
+            top = heapq.nlargest if descending else heapq.nsmallest
+            return top(stop, rows, key=key)
+        return sorted(rows, key=key, reverse=descending)[:stop]
@@ -0,0 +1,1033 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import weakref
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+from itertools import accumulate, pairwise
+
+from .cache import TableCache, file_stamp
+from .codec import loads, write_json_array
+from .consts import (
+    BINARY_MAGIC,
+    COMPACTION_MIN_RECORDS,
+    COMPACTION_RATIO,
+    COMPRESSION_BLOCK_BYTES,
+    COMPRESSION_LEVELS,
+    DATA_FOLDER,
+    DEFAULT_STORAGE,
+    PARALLEL_LOAD_MIN_BYTES,
+    TABLE_CACHE_BUDGET,
+)
+from .locks import table_lock
+from .metrics import add_count, file_size
+from .table import (
+    EXTEND_CHUNK_SIZE,
+    BoolColumn,
+    ColumnTable,
+    IntColumn,
+    ObjectColumn,
+    StrColumn,
+)
+
+
+class TrackedChanges:
+    """Отслеживание таблиц, загруженных из файла хранилища или записанных
+    в него.
+
+    Для такой таблицы в журнал транзакций достаточно записать изменения
+    с последней загрузки или записи (см. ColumnTable.changes): при
+    восстановлении они применяются к таблице из файла, после чего файл
+    переписывается целиком.
+    """
+
+    def __init__(self):
+        self._tracked: dict[str, weakref.ref] = {}
+
+    def track(self, table_name: str, data: ColumnTable) -> ColumnTable:
+        """Запоминает, что data совпадает с файлом таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Данные таблицы.
+
+        Returns:
+            ColumnTable: Те же данные таблицы.
+        """
+        self._tracked[table_name] = weakref.ref(data)
+        data.mark_saved()
+        return data
+
+    def changes(self, table_name: str, data: ColumnTable) -> dict:
+        """Описывает новое состояние таблицы для журнала транзакций.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Новое состояние таблицы.
+
+        Returns:
+            dict: {"upsert": [...], "delete": [...]} — изменённые записи и
+                ID удалённых с последней загрузки или записи или
+                {"rows": [...]}, если таблица загружена не из этого файла
+                или изменена почти целиком.
+        """
+        tracked = self._tracked.get(table_name)
+        changes = None if tracked is None or tracked() is not data \
+            else data.changes()
+        return {"rows": list(data)} if changes is None else changes
+
+    def untrack(self, table_name: str) -> None:
+        self._tracked.pop(table_name, None)
+
+
+class JsonStorage(TrackedChanges):
+    """Хранилище, записывающее таблицу целиком в один json файл.
+
+    Файл пишется компактным json (см. write_json_array); файлы, записанные
+    прежними версиями с отступами, читаются так же.
+    """
+
+    name = "json"
+    extension = ".json"
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(DATA_FOLDER, f"{table_name}{self.extension}")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(self.path(table_name))
+
+    def load(self, table_name: str) -> ColumnTable:
+        """Загружает данные таблицы из json файла.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            ColumnTable: Данные таблицы. В случае ошибки возвращается
+                пустая таблица.
+        """
+        try:
+            with open(self.path(table_name), 'rb') as f:
+                text = f.read()
+            table = ColumnTable(loads(text))
+            add_count("bytes_read", len(text))
+        except (FileNotFoundError, json.JSONDecodeError):
+            table = ColumnTable()
+        return self.track(table_name, table)
+
+    def save(self, table_name: str, data: ColumnTable) -> None:
+        """Перезаписывает json файл таблицы целиком через временный файл.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Данные таблицы.
+        """
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        add_count("bytes_written", write_json_array(self.path(table_name), data))
+        self.track(table_name, data)
+
+    def remove(self, table_name: str) -> None:
+        self.untrack(table_name)
+        try:
+            os.remove(self.path(table_name))
+        except FileNotFoundError:
+            pass
+
+
+def compression(codec: str) -> tuple:
+    """Возвращает функции сжатия и распаковки блока.
+
+    Уровень сжатия берётся из COMPRESSION_LEVELS: для lzma уже
+    минимальный уровень сжимает лучше zlib, а следующие замедляют
+    запись в разы ради немногих процентов.
+
+    Args:
+        codec (str): zlib или lzma.
+
+    Returns:
+        tuple: Функции compress и decompress модуля codec.
+    """
+    level = COMPRESSION_LEVELS[codec]
+    if codec == "lzma":
+        import lzma
+
+        return partial(lzma.compress, preset=level), lzma.decompress
+    return partial(zlib.compress, level=level), zlib.decompress
+
+
+def write_binary(path: str, data: ColumnTable, codec: str | None = None) -> None:
+    """Записывает таблицу в двоичном формате.
+
+    Файл состоит из секций, выровненных по 8 байт: значения int — по
+    8 байт, bool — по байту, str — 4-байтовые коды значений и отдельная
+    куча различных строк в utf-8 со смещениями. Столбцы со смешанными
+    типами записываются списком json. В конце файла — описание секций в
+    json и 16 байт с его смещением и длиной. Числа записываются в
+    порядке байт текущей машины, он указан в описании.
+
+    Если задан codec, каждая секция сжимается независимыми блоками по
+    COMPRESSION_BLOCK_BYTES байт и записывается сжатой, только если это
+    её уменьшает; размеры блоков указываются в описании секции.
+
+    Args:
+        path (str): Путь к файлу.
+        data (ColumnTable): Данные таблицы.
+        codec (str | None): Сжатие секций: zlib, lzma или None.
+    """
+    columns = []
+    compress = None if codec is None else compression(codec)[0]
+    with open(path, 'wb') as f:
+        f.write(BINARY_MAGIC)
+
+        def section(buffer) -> dict:
+            f.write(b"\0" * (-f.tell() % 8))
+            offset = f.tell()
+            raw = memoryview(buffer).cast('B')
+            if compress is not None:
+                blocks = [compress(raw[start:start + COMPRESSION_BLOCK_BYTES])
+                          for start in range(0, len(raw), COMPRESSION_BLOCK_BYTES)]
+                if sum(map(len, blocks)) < len(raw):
+                    f.writelines(blocks)
+                    return {"offset": offset, "size": f.tell() - offset,
+                            "codec": codec, "blocks": list(map(len, blocks))}
+            f.write(raw)
+            return {"offset": offset, "size": f.tell() - offset}
+
+        for name, column in data.typed_columns():
+            meta = {"name": name}
+            if isinstance(column, IntColumn):
+                meta.update(kind="int", values=section(column.data))
+            elif isinstance(column, BoolColumn):
+                meta.update(kind="bool", values=section(column.data))
+            elif isinstance(column, StrColumn):
+                heap = [value.encode('utf-8') for value in column.dictionary]
+                bounds = array('Q', accumulate(map(len, heap), initial=0))
+                meta.update(kind="str", values=section(column.data),
+                            heap=section(b"".join(heap)), bounds=section(bounds))
+            else:
+                values = json.dumps(list(column)).encode('utf-8')
+                meta.update(kind="json", values=section(values))
+            columns.append(meta)
+        header = json.dumps({"byteorder": sys.byteorder, "rows": len(data),
+                             "columns": columns}).encode('utf-8')
+        offset = f.tell()
+        f.write(header)
+        f.write(struct.pack("<QQ", offset, len(header)))
+        add_count("bytes_written", f.tell())
+
+
+def read_binary(path: str) -> ColumnTable:
+    """Открывает таблицу в двоичном формате через mmap.
+
+    Столбцы int, bool и коды str не копируются, а отображают файл:
+    страницы читаются с диска только при обращении к ним, а запись по
+    позиции находится смещением от начала секции. Читаются сразу только
+    описание, словари строк, столбцы json и сжатые секции, которые
+    распаковываются в память. Коды str остаются кодами и после
+    распаковки, поэтому сравнения по-прежнему проверяют коды.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        ColumnTable: Данные таблицы.
+
+    Raises:
+        ValueError: Если файл не в двоичном формате.
+    """
+    with open(path, 'rb') as f:
+        buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    if buffer[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f"Файл {path} не в двоичном формате таблиц.")
+    # Учитывается весь отображённый файл, хотя страницы столбцов читаются
+    # с диска только при обращении к ним.
+    add_count("bytes_read", len(buffer))
+    offset, size = struct.unpack("<QQ", buffer[-16:])
+    header = json.loads(bytes(buffer[offset:offset + size]))
+    swap = header["byteorder"] != sys.byteorder
+
+    def section(meta: dict, fmt: str = "B"):
+        view = buffer[meta["offset"]:meta["offset"] + meta["size"]]
+        if "codec" in meta:
+            view = memoryview(unpack_blocks(view, meta))
+        view = view.cast(fmt)
+        if swap and fmt != "B":
+            view = array(fmt, view)
+            view.byteswap()
+        return view
+
+    names, columns = [], []
+    for meta in header["columns"]:
+        names.append(meta["name"])
+        if meta["kind"] == "int":
+            column = IntColumn()
+            column.data = section(meta["values"], "q")
+        elif meta["kind"] == "bool":
+            column = BoolColumn()
+            column.data = section(meta["values"])
+        elif meta["kind"] == "str":
+            heap = bytes(section(meta["heap"]))
+            bounds = section(meta["bounds"], "Q")
+            dictionary = [heap[start:end].decode('utf-8')
+                          for start, end in pairwise(bounds)]
+            column = StrColumn.encoded(dictionary, section(meta["values"], "I"))
+        else:
+            column = ObjectColumn(json.loads(bytes(section(meta["values"]))))
+        columns.append(column)
+    return ColumnTable.mapped(names, columns)
+
+
+def unpack_blocks(view: memoryview, meta: dict) -> bytes:
+    """Распаковывает сжатую секцию двоичного файла (см. write_binary)."""
+    decompress = compression(meta["codec"])[1]
+    bounds = accumulate(meta["blocks"], initial=0)
+    return b"".join(decompress(view[start:end]) for start, end in pairwise(bounds))
+
+
+class BinaryStorage(TrackedChanges):
+    """Хранилище в двоичном формате с доступом через mmap (см. read_binary).
+
+    Таблица открывается без разбора всего файла: значения читаются с
+    диска по мере обращения к ним. При сохранении файл переписывается
+    целиком во временный файл, который затем подменяет прежний, поэтому
+    уже отображённые в память данные остаются корректными.
+    """
+
+    name = "bin"
+    extension = ".bin"
+    codec: str | None = None
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(DATA_FOLDER, f"{table_name}{self.extension}")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(self.path(table_name))
+
+    def load(self, table_name: str) -> ColumnTable:
+        """Открывает двоичный файл таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            ColumnTable: Данные таблицы. В случае ошибки возвращается
+                пустая таблица.
+        """
+        try:
+            table = read_binary(self.path(table_name))
+        except (FileNotFoundError, ValueError, struct.error):
+            table = ColumnTable()
+        return self.track(table_name, table)
+
+    def save(self, table_name: str, data: ColumnTable) -> None:
+        """Перезаписывает двоичный файл таблицы целиком.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Данные таблицы.
+        """
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        path = self.path(table_name)
+        write_binary(path + ".tmp", data, self.codec)
+        os.replace(path + ".tmp", path)
+        self.track(table_name, data)
+
+    def remove(self, table_name: str) -> None:
+        self.untrack(table_name)
+        try:
+            os.remove(self.path(table_name))
+        except FileNotFoundError:
+            pass
+
+
+class CompressedStorage(BinaryStorage):
+    """Двоичное хранилище со сжатием столбцов (см. write_binary).
+
+    Файл data/<имя_таблицы>.zlib или .lzma в несколько раз меньше
+    двоичного, но при открытии сжатые секции распаковываются целиком.
+    """
+
+    def __init__(self, codec: str):
+        super().__init__()
+        self.name = self.codec = codec
+        self.extension = f".{codec}"
+
+
+def read_log(path: str) -> tuple[ColumnTable, int, bool]:
+    """Восстанавливает таблицу, проигрывая журнал операций.
+
+    Args:
+        path (str): Путь к журналу.
+
+    Returns:
+        tuple: Данные таблицы в порядке возрастания ID, количество
+            записей журнала и признак оборванной последней записи.
+    """
+    table = ColumnTable()
+    appended: list[dict] = []
+    last_id = 0
+    records = 0
+    broken = False
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = loads(line)
+                except json.JSONDecodeError:
+                    broken = True
+                    break
+                records += 1
+                # Записи с новыми ID копятся и добавляются в таблицу пачкой.
+                if record["op"] != "delete" and record["row"]["ID"] > last_id:
+                    appended.append(record["row"])
+                    last_id = record["row"]["ID"]
+                    if len(appended) >= EXTEND_CHUNK_SIZE:
+                        table.extend(appended)
+                        appended = []
+                    continue
+                table.extend(appended)
+                appended = []
+                if record["op"] == "delete":
+                    table.delete_ids([record["ID"]])
+                else:
+                    table.upsert(record["row"])
+    except FileNotFoundError:
+        pass
+    table.extend(appended)
+    table.mark_saved()
+    return table, records, broken
+
+
+class LogStorage:
+    """Хранилище в виде журнала операций insert/update/delete (одна запись
+    json на строку).
+
+    При сохранении в конец журнала дописываются только записи, которые
+    таблица пометила изменёнными со времени последней загрузки или записи
+    (см. ColumnTable.changes). Когда мёртвых записей в журнале становится
+    слишком много, он сжимается в фоновом потоке.
+    """
+
+    name = "log"
+    extension = ".log"
+
+    def __init__(self):
+        self._tracked: dict[str, weakref.ref] = {}
+        self._records: dict[str, int] = {}
+        self._live: dict[str, int] = {}
+        self._rewrites: dict[str, int] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._compactions: dict[str, threading.Thread] = {}
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(DATA_FOLDER, f"{table_name}{self.extension}")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(self.path(table_name))
+
+    def _lock(self, table_name: str) -> threading.Lock:
+        return self._locks.setdefault(table_name, threading.Lock())
+
+    def load(self, table_name: str) -> ColumnTable:
+        """Восстанавливает данные таблицы, проигрывая журнал.
+
+        Оборванная последняя запись (например, после падения процесса)
+        отбрасывается, а следующее сохранение перепишет журнал целиком.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            ColumnTable: Данные таблицы в порядке возрастания ID.
+        """
+        add_count("bytes_read", file_size(self.path(table_name)))
+        table, records, broken = read_log(self.path(table_name))
+        self.loaded(table_name, records, len(table))
+        with self._lock(table_name):
+            if broken:
+                self._tracked.pop(table_name, None)
+            else:
+                self._tracked[table_name] = weakref.ref(table)
+        return table
+
+    def loaded(self, table_name: str, records: int, live: int) -> None:
+        """Запоминает размер журнала, прочитанного в обход load.
+
+        Args:
+            table_name (str): Имя таблицы.
+            records (int): Количество записей в журнале.
+            live (int): Количество живых строк таблицы.
+        """
+        with self._lock(table_name):
+            self._records[table_name] = records
+            self._live[table_name] = live
+
+    def save(self, table_name: str, data: ColumnTable) -> None:
+        """Дописывает в журнал изменения таблицы с последнего сохранения.
+
+        Если таблица загружена не из этого журнала или изменена почти
+        целиком, журнал переписывается.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Новое состояние таблицы.
+        """
+        changes = self._changes(table_name, data)
+        if changes is None:
+            self.write_lines(table_name, [self.line("insert", row) for row in data],
+                             len(data))
+        else:
+            lines = [self.delete_line(row_id) for row_id in changes["delete"]]
+            lines.extend(self.line("update", row) for row in changes["upsert"])
+            self.append_lines(table_name, lines, len(data))
+        with self._lock(table_name):
+            self._tracked[table_name] = weakref.ref(data)
+        data.mark_saved()
+
+    def write_lines(self, table_name: str, lines: list[str], live: int) -> None:
+        """Переписывает журнал целиком.
+
+        Args:
+            table_name (str): Имя таблицы.
+            lines (list[str]): Строки нового журнала.
+            live (int): Количество живых строк таблицы.
+        """
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        path = self.path(table_name)
+        with self._lock(table_name):
+            # Журнал подменяется целиком: сжатие в другом процессе по
+            # смене файла узнаёт, что его результат устарел.
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            os.replace(path + ".tmp", path)
+            add_count("bytes_written", sum(map(len, lines)))
+            self._records[table_name] = len(lines)
+            self._rewrites[table_name] = self._rewrites.get(table_name, 0) + 1
+            self._live[table_name] = live
+        self._maybe_compact(table_name)
+
+    def append_lines(self, table_name: str, lines: list[str], live: int) -> None:
+        """Дописывает строки в конец журнала.
+
+        Args:
+            table_name (str): Имя таблицы.
+            lines (list[str]): Дописываемые строки.
+            live (int): Количество живых строк таблицы после изменения.
+        """
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        with self._lock(table_name):
+            if lines:
+                with open(self.path(table_name), 'a', encoding='utf-8') as f:
+                    f.writelines(lines)
+                add_count("bytes_written", sum(map(len, lines)))
+                self._records[table_name] = self._records.get(table_name, 0) \
+                    + len(lines)
+            self._live[table_name] = live
+        self._maybe_compact(table_name)
+
+    def changes(self, table_name: str, data: ColumnTable) -> dict:
+        """Описывает новое состояние таблицы для журнала транзакций.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Новое состояние таблицы.
+
+        Returns:
+            dict: {"upsert": [...], "delete": [...]} — изменённые записи и
+                ID удалённых с последнего сохранения или {"rows": [...]},
+                если журнал будет переписан целиком.
+        """
+        changes = self._changes(table_name, data)
+        return {"rows": list(data)} if changes is None else changes
+
+    def _changes(self, table_name: str, data: ColumnTable) -> dict | None:
+        tracked = self._tracked.get(table_name)
+        if tracked is None or tracked() is not data:
+            return None
+        return data.changes()
+
+    def remove(self, table_name: str) -> None:
+        self.wait(table_name)
+        with self._lock(table_name):
+            self._tracked.pop(table_name, None)
+            self._records.pop(table_name, None)
+            self._live.pop(table_name, None)
+            try:
+                os.remove(self.path(table_name))
+            except FileNotFoundError:
+                pass
+
+    def wait(self, table_name: str | None = None) -> None:
+        """Дожидается завершения фонового сжатия журнала.
+
+        Args:
+            table_name (str | None): Имя таблицы. Если не указано,
+                ожидаются все запущенные сжатия.
+        """
+        names = [table_name] if table_name else list(self._compactions)
+        for name in names:
+            thread = self._compactions.get(name)
+            if thread is not None:
+                thread.join()
+
+    @staticmethod
+    def line(op: str, row: dict) -> str:
+        return json.dumps({"op": op, "row": row}) + "\n"
+
+    @staticmethod
+    def delete_line(row_id: int) -> str:
+        return json.dumps({"op": "delete", "ID": row_id}) + "\n"
+
+    def _maybe_compact(self, table_name: str) -> None:
+        records = self._records.get(table_name, 0)
+        live = self._live.get(table_name, 0)
+        if records < COMPACTION_MIN_RECORDS or records <= COMPACTION_RATIO * live:
+            return
+        running = self._compactions.get(table_name)
+        if running is not None and running.is_alive():
+            return
+        thread = threading.Thread(target=self._compact, args=(table_name,),
+                                  daemon=True)
+        self._compactions[table_name] = thread
+        thread.start()
+
+    def _compact(self, table_name: str) -> None:
+        """Переписывает журнал, оставляя по последней записи на живую строку.
+
+        Сжимается часть журнала, записанная к началу сжатия; записи,
+        дописанные во время сжатия, переносятся в новый журнал перед
+        подменой файла. Если за это время журнал был переписан целиком,
+        в том числе другим процессом, результат сжатия отбрасывается.
+        Файл подменяется под монопольной блокировкой таблицы, чтобы другой
+        процесс не дописал в журнал записи, не попавшие в новый файл.
+        """
+        path = self.path(table_name)
+        # Сегмент секционированной таблицы блокируется вместе с таблицей.
+        lock = table_lock(table_name.partition("@")[0])
+        with self._lock(table_name):
+            stat = os.stat(path)
+            size = stat.st_size
+            rewrites = self._rewrites.get(table_name, 0)
+        lines: dict[int, str] = {}
+        with open(path, 'rb') as f:
+            for line in f.read(size).decode('utf-8').splitlines(keepends=True):
+                record = loads(line)
+                if record["op"] == "delete":
+                    lines.pop(record["ID"], None)
+                else:
+                    lines[record["row"]["ID"]] = line
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines.values())
+        with lock.locked(True), self._lock(table_name):
+            try:
+                replaced = os.stat(path).st_ino != stat.st_ino
+            except FileNotFoundError:
+                replaced = True
+            if replaced or self._rewrites.get(table_name, 0) != rewrites:
+                os.remove(tmp_path)
+                return
+            with open(path, 'rb') as src:
+                src.seek(size)
+                tail = src.read()
+            with open(tmp_path, 'ab') as f:
+                f.write(tail)
+            os.replace(tmp_path, path)
+            self._records[table_name] = len(lines) + tail.count(b"\n")
+
+
+def partition_count(partitions: dict) -> int:
+    """Возвращает количество сегментов схемы секционирования."""
+    if partitions["kind"] == "hash":
+        return partitions["segments"]
+    return len(partitions["bounds"]) + 1
+
+
+def partition_of(partitions: dict, value) -> int:
+    """Определяет номер сегмента для значения ключа секционирования.
+
+    Args:
+        partitions (dict): Схема секционирования: {"kind": "hash",
+            "column": ..., "segments": N} или {"kind": "range",
+            "column": ..., "bounds": [...]}.
+        value: Значение ключевого столбца записи.
+
+    Returns:
+        int: Номер сегмента.
+    """
+    if partitions["kind"] == "hash":
+        key = json.dumps(value).encode('utf-8')
+        return zlib.crc32(key) % partitions["segments"]
+    return bisect_right(partitions["bounds"], value)
+
+
+_segment_cache = TableCache(TABLE_CACHE_BUDGET // (os.cpu_count() or 1))
+
+
+def read_segment(path: str) -> tuple[ColumnTable, int, bool]:
+    """Читает журнал сегмента в процессе пула (см. read_log).
+
+    Прочитанный сегмент остаётся в кэше процесса, пока не изменится его
+    файл, поэтому повторное чтение и просмотр сегмента его не разбирают.
+
+    Args:
+        path (str): Абсолютный путь к журналу сегмента.
+
+    Returns:
+        tuple: Результат read_log.
+    """
+    stamp = file_stamp(path)
+    result = _segment_cache.get(path, stamp)
+    if result is None:
+        result = read_log(path)
+        _segment_cache.put(path, stamp, result, stamp[1] if stamp else 0)
+    return result
+
+
+def scan_segment(path: str, func, *args):
+    """Выполняет func(данные_сегмента, *args) в процессе пула.
+
+    Args:
+        path (str): Абсолютный путь к журналу сегмента.
+        func (Callable): Функция модуля от данных сегмента.
+        *args: Остальные аргументы func.
+
+    Returns:
+        Результат func.
+    """
+    return func(read_segment(path)[0], *args)
+
+
+class SegmentWorkers:
+    """Долгоживущие процессы для чтения и просмотра сегментов.
+
+    Каждый процесс — ProcessPoolExecutor с одним рабочим процессом,
+    запускаемый при первом обращении и работающий до выхода. Сегменты
+    таблицы распределяются по процессам по номеру со сдвигом, зависящим
+    от имени таблицы, поэтому сегмент всегда обрабатывает один и тот же
+    процесс и прочитанный сегмент остаётся в его кэше (см. read_segment).
+    """
+
+    def __init__(self):
+        self._executors: list = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def count() -> int:
+        """Возвращает количество процессов — по числу процессоров."""
+        return os.cpu_count() or 1
+
+    def map(self, table_name: str, paths: list[str], func, *args) -> list:
+        """Выполняет func(путь_сегмента, *args) для каждого сегмента таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+            paths (list[str]): Пути к журналам сегментов по их номерам.
+            func (Callable): Функция модуля, выполняемая в процессе пула.
+            *args: Остальные аргументы func.
+
+        Returns:
+            list: Результаты func по сегментам в порядке их номеров.
+        """
+        offset = zlib.crc32(table_name.encode('utf-8'))
+        futures = [self._executor(offset + number).submit(
+                       func, os.path.abspath(path), *args)
+                   for number, path in enumerate(paths)]
+        return [future.result() for future in futures]
+
+    def _executor(self, number: int):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        with self._lock:
+            workers = self.count()
+            while len(self._executors) < workers:
+                context = multiprocessing.get_context("forkserver")
+                self._executors.append(ProcessPoolExecutor(1, mp_context=context))
+            return self._executors[number % workers]
+
+
+class PartitionedStorage:
+    """Хранилище, разбивающее таблицу на сегменты по значению столбца.
+
+    Схема секционирования (хеш или диапазоны значений ключевого столбца)
+    задаётся при create_table и записывается в файл описания
+    data/<таблица>.parts. Каждый сегмент — отдельный журнал операций
+    (см. LogStorage), поэтому изменения дописываются только в сегменты
+    изменённых записей. Большие таблицы читаются и просматриваются по
+    сегментам параллельно в долгоживущих процессах (см. SegmentWorkers).
+    """
+
+    name = "partitioned"
+    extension = ".parts"
+
+    def __init__(self):
+        self._segments = LogStorage()
+        self._tracked: dict[str, weakref.ref] = {}
+        self._ids: dict[str, list[array]] = {}
+        self._workers = SegmentWorkers()
+
+    def path(self, table_name: str) -> str:
+        return os.path.join(DATA_FOLDER, f"{table_name}{self.extension}")
+
+    def exists(self, table_name: str) -> bool:
+        return os.path.exists(self.path(table_name))
+
+    def scheme(self, table_name: str) -> dict:
+        """Читает схему секционирования таблицы из файла описания."""
+        with open(self.path(table_name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def segment(table_name: str, number: int) -> str:
+        return f"{table_name}@{number}"
+
+    def load(self, table_name: str) -> ColumnTable:
+        """Читает сегменты таблицы и объединяет их в порядке ID.
+
+        Сегменты большой таблицы (см. parallel) читаются в процессах
+        пула.
+
+        Args:
+            table_name (str): Имя таблицы.
+
+        Returns:
+            ColumnTable: Данные таблицы в порядке возрастания ID.
+        """
+        try:
+            partitions = self.scheme(table_name)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return ColumnTable()
+        names = [self.segment(table_name, number)
+                 for number in range(partition_count(partitions))]
+        paths = [self._segments.path(name) for name in names]
+        add_count("bytes_read", sum(map(file_size, paths)))
+        if self._parallel(paths):
+            results = self._workers.map(table_name, paths, read_segment)
+        else:
+            results = list(map(read_log, paths))
+        for name, (segment, records, _) in zip(names, results):
+            self._segments.loaded(name, records, len(segment))
+        table = ColumnTable.merged([segment for segment, _, _ in results])
+        table.mark_saved()
+        self._ids[table_name] = [array('q', segment.ids) for segment, _, _ in results]
+        if any(broken for _, _, broken in results):
+            self._tracked.pop(table_name, None)
+        else:
+            self._tracked[table_name] = weakref.ref(table)
+        return table
+
+    def segment_paths(self, table_name: str) -> list[str]:
+        """Возвращает пути к журналам сегментов таблицы по их номерам."""
+        try:
+            partitions = self.scheme(table_name)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+        return [self._segments.path(self.segment(table_name, number))
+                for number in range(partition_count(partitions))]
+
+    def size(self, table_name: str) -> int:
+        """Возвращает суммарный размер сегментов таблицы в байтах."""
+        return sum(map(file_size, self.segment_paths(table_name)))
+
+    def parallel(self, table_name: str) -> bool:
+        """Проверяет, что сегменты таблицы выгодно обрабатывать в пуле.
+
+        Пул используется, если сегментов и процессоров больше одного, а
+        сегменты вместе не меньше PARALLEL_LOAD_MIN_BYTES.
+        """
+        return self._parallel(self.segment_paths(table_name))
+
+    def scan(self, table_name: str, func, *args) -> list:
+        """Обрабатывает сегменты таблицы в процессах пула, не объединяя их.
+
+        func(данные_сегмента, *args) выполняется для каждого сегмента в
+        процессе, за которым закреплён сегмент (см. SegmentWorkers), и в
+        исходный процесс возвращаются только её результаты, а не данные
+        сегментов.
+
+        Args:
+            table_name (str): Имя таблицы.
+            func (Callable): Функция модуля от данных сегмента.
+            *args: Остальные аргументы func.
+
+        Returns:
+            list: Результаты func по сегментам в порядке их номеров.
+        """
+        paths = self.segment_paths(table_name)
+        add_count("bytes_read", sum(map(file_size, paths)))
+        return self._workers.map(table_name, paths, scan_segment, func, *args)
+
+    def _parallel(self, paths: list[str]) -> bool:
+        workers = min(len(paths), self._workers.count())
+        return workers > 1 and sum(map(file_size, paths)) >= PARALLEL_LOAD_MIN_BYTES
+
+    def create(self, table_name: str, partitions: dict) -> None:
+        """Создаёт файл описания секционированной таблицы.
+
+        Args:
+            table_name (str): Имя таблицы.
+            partitions (dict): Схема секционирования (см. partition_of).
+        """
+        os.makedirs(DATA_FOLDER, exist_ok=True)
+        with open(self.path(table_name), 'w', encoding='utf-8') as f:
+            json.dump(partitions, f)
+
+    def save(self, table_name: str, data: ColumnTable) -> None:
+        """Записывает изменения таблицы в сегменты изменённых записей.
+
+        Удалённые записи и записи, ключ которых сменил сегмент,
+        удаляются из прежних сегментов. Если таблица загружена не из
+        этого хранилища или изменена почти целиком, сегменты
+        переписываются.
+
+        Args:
+            table_name (str): Имя таблицы. Файл описания должен быть
+                создан заранее (см. create).
+            data (ColumnTable): Новое состояние таблицы.
+        """
+        partitions = self.scheme(table_name)
+        changes = self._changes(table_name, data)
+        column = partitions["column"]
+        lines: dict[int, list[str]] = {}
+        if changes is None:
+            ids: list[array] = [array('q') for _ in range(partition_count(partitions))]
+            for row in data:
+                number = partition_of(partitions, row.get(column))
+                lines.setdefault(number, []).append(LogStorage.line("insert", row))
+                ids[number].append(row["ID"])
+            for number, segment_ids in enumerate(ids):
+                self._segments.write_lines(self.segment(table_name, number),
+                                           lines.get(number, []), len(segment_ids))
+        else:
+            ids = self._ids[table_name]
+            for row_id in changes["delete"]:
+                number = self._remove_id(ids, row_id)
+                if number is not None:
+                    lines.setdefault(number, []).append(LogStorage.delete_line(row_id))
+            for row in changes["upsert"]:
+                number = partition_of(partitions, row.get(column))
+                previous = self._remove_id(ids, row["ID"])
+                if previous is not None and previous != number:
+                    lines.setdefault(previous, []).append(
+                        LogStorage.delete_line(row["ID"]))
+                insort(ids[number], row["ID"])
+                lines.setdefault(number, []).append(LogStorage.line("update", row))
+            for number, segment_lines in lines.items():
+                self._segments.append_lines(self.segment(table_name, number),
+                                            segment_lines, len(ids[number]))
+        # Время изменения файла описания служит отметкой актуальности всей
+        # таблицы для кэша (см. file_stamp).
+        os.utime(self.path(table_name))
+        self._ids[table_name] = ids
+        self._tracked[table_name] = weakref.ref(data)
+        data.mark_saved()
+
+    @staticmethod
+    def _remove_id(ids: list[array], row_id: int) -> int | None:
+        """Удаляет ID из списка сегмента, в котором он записан.
+
+        Returns:
+            int | None: Номер сегмента или None, если ID нет ни в одном.
+        """
+        for number, segment_ids in enumerate(ids):
+            pos = bisect_left(segment_ids, row_id)
+            if pos < len(segment_ids) and segment_ids[pos] == row_id:
+                del segment_ids[pos]
+                return number
+        return None
+
+    def changes(self, table_name: str, data: ColumnTable) -> dict:
+        """Описывает новое состояние таблицы для журнала транзакций.
+
+        Args:
+            table_name (str): Имя таблицы.
+            data (ColumnTable): Новое состояние таблицы.
+
+        Returns:
+            dict: {"upsert": [...], "delete": [...]} или {"rows": [...]},
+                если сегменты будут переписаны целиком.
+        """
+        changes = self._changes(table_name, data)
+        return {"rows": list(data)} if changes is None else changes
+
+    def _changes(self, table_name: str, data: ColumnTable) -> dict | None:
+        tracked = self._tracked.get(table_name)
+        if tracked is None or tracked() is not data:
+            return None
+        return data.changes()
+
+    def remove(self, table_name: str) -> None:
+        try:
+            count = partition_count(self.scheme(table_name))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        for number in range(count):
+            self._segments.remove(self.segment(table_name, number))
+        self._tracked.pop(table_name, None)
+        self._ids.pop(table_name, None)
+        os.remove(self.path(table_name))
+
+    def wait(self, table_name: str | None = None) -> None:
+        """Дожидается завершения фонового сжатия сегментов."""
+        self._segments.wait()
+
+
+STORAGES = {storage.name: storage
+            for storage in (JsonStorage(), LogStorage(), BinaryStorage(),
+                            CompressedStorage("zlib"), CompressedStorage("lzma"))}
+PARTITIONED = PartitionedStorage()
+
+
+def get_storage(table_name: str, partitions: dict | None = None):
+    """Определяет хранилище таблицы по файлу данных на диске.
+
+    Args:
+        table_name (str): Имя таблицы.
+        partitions (dict | None): Схема секционирования таблицы из
+            метаданных.
+
+    Returns:
+        Хранилище таблицы. Для таблиц без файла данных — секционированное
+        хранилище, если задана схема, иначе хранилище по умолчанию.
+    """
+    for storage in (*STORAGES.values(), PARTITIONED):
+        if storage.exists(table_name):
+            return storage
+    if partitions:
+        return PARTITIONED
+    return STORAGES[DEFAULT_STORAGE]
+
+
+def migrate_table(table_name: str, target: str) -> None:
+    """Переносит данные таблицы в другое хранилище.
+
+    Args:
+        table_name (str): Имя таблицы.
+        target (str): Имя целевого хранилища.
+
+    Raises:
+        ValueError: Если хранилище неизвестно или таблица уже в нём хранится.
+    """
+    if target not in STORAGES:
+        raise ValueError(f"Неизвестное хранилище: {target}. Допустимые: "
+                         f"{', '.join(STORAGES)}.")
+    source = get_storage(table_name)
+    if source.name == target:
+        raise ValueError(f'Таблица "{table_name}" уже хранится в "{target}".')
+    data = source.load(table_name)
+    STORAGES[target].save(table_name, data)
+    source.remove(table_name)
+
+
+def wait_compactions() -> None:
+    """Дожидается завершения всех фоновых сжатий журналов."""
+    STORAGES[LogStorage.name].wait()
+    PARTITIONED.wait()
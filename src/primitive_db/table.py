@@ -0,0 +1,618 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from heapq import merge
+from itertools import batched, chain, compress, repeat
+from operator import eq, ge, gt, itemgetter, le, lt, ne
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+EXTEND_CHUNK_SIZE = 4096
+
+COMPARISONS = {"=": eq, "!=": ne, "<": lt, "<=": le, ">": gt, ">=": ge}
+
+
+class ObjectColumn:
+    """Столбец произвольных значений в обычном списке.
+
+    Используется, если значения столбца не укладываются в типизированное
+    представление (например, в старых файлах со смешанными типами).
+    """
+
+    def __init__(self, values: Iterable = ()):
+        self.data = list(values)
+
+    def accepts(self, value) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, pos: int):
+        return self.data[pos]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.data)
+
+    def append(self, value) -> None:
+        self.data.append(value)
+
+    def extend(self, values: list) -> bool:
+        """Добавляет пачку значений, если все они подходят столбцу.
+
+        Args:
+            values (list): Добавляемые значения.
+
+        Returns:
+            bool: False, если значения не подходят и столбец не изменён.
+        """
+        self.data.extend(values)
+        return True
+
+    def own(self) -> None:
+        """Копирует значения в собственную память, если столбец лишь
+        отображает буфер (например, файл через mmap), перед изменением."""
+
+    def insert(self, pos: int, value) -> None:
+        self.data.insert(pos, value)
+
+    def set(self, pos: int, value) -> None:
+        self.data[pos] = value
+
+    def delete(self, positions: list[int], keep: list[bool] | None) -> None:
+        """Удаляет значения по позициям.
+
+        Args:
+            positions (list[int]): Позиции по возрастанию.
+            keep (list[bool] | None): Маска оставляемых значений. Если
+                задана, столбец пересобирается по ней целиком.
+        """
+        if keep is None:
+            for pos in reversed(positions):
+                del self.data[pos]
+        else:
+            self.data = list(compress(self.data, keep))
+
+    def match(self, op: str, value, positions: list[int] | None = None) -> list[int]:
+        """Находит позиции значений, удовлетворяющих сравнению.
+
+        Args:
+            op (str): Оператор сравнения из COMPARISONS или "in".
+            value: Значение для сравнения, для "in" — множество значений.
+            positions (list[int] | None): Проверяемые позиции по
+                возрастанию. Если не заданы, просматривается весь столбец.
+
+        Returns:
+            list[int]: Позиции по возрастанию. Значения, несравнимые с
+                value, не подходят.
+        """
+        if positions is None:
+            base, data = range(len(self.data)), self.data
+        else:
+            base, data = positions, map(self.data.__getitem__, positions)
+        try:
+            return list(compress(base, self._mask(op, value, data)))
+        except TypeError:
+            return []
+
+    def _mask(self, op: str, value, data: Iterable) -> Iterator:
+        if op == "in":
+            return map(value.__contains__, data)
+        return map(COMPARISONS[op], data, repeat(value))
+
+    def _truth_table(self, op: str, value, values: list) -> list:
+        """Вычисляет сравнение для каждого из возможных значений."""
+        try:
+            return list(ObjectColumn._mask(self, op, value, values))
+        except TypeError:
+            return [False] * len(values)
+
+
+class IntColumn(ObjectColumn):
+    """Столбец int в массиве 64-битных чисел."""
+
+    def __init__(self, values: Iterable = ()):
+        self.data = array('q', values)
+
+    def accepts(self, value) -> bool:
+        return type(value) is int and INT64_MIN <= value <= INT64_MAX
+
+    def own(self) -> None:
+        if not isinstance(self.data, array):
+            self.data = _owned_array('q', self.data)
+
+    def extend(self, values: list) -> bool:
+        if not set(map(type, values)) <= {int}:
+            return False
+        try:
+            self.data.extend(array('q', values))
+        except OverflowError:
+            return False
+        return True
+
+    def delete(self, positions: list[int], keep: list[bool] | None) -> None:
+        if keep is None:
+            for pos in reversed(positions):
+                del self.data[pos]
+        else:
+            self.data = array('q', compress(self.data, keep))
+
+
+class BoolColumn(ObjectColumn):
+    """Столбец bool, по байту на значение."""
+
+    def __init__(self, values: Iterable = ()):
+        self.data = bytearray(values)
+
+    def accepts(self, value) -> bool:
+        return type(value) is bool
+
+    def own(self) -> None:
+        if not isinstance(self.data, bytearray):
+            self.data = bytearray(self.data)
+
+    def extend(self, values: list) -> bool:
+        if not set(map(type, values)) <= {bool}:
+            return False
+        self.data.extend(values)
+        return True
+
+    def __getitem__(self, pos: int) -> bool:
+        return bool(self.data[pos])
+
+    def __iter__(self) -> Iterator[bool]:
+        return map(bool, self.data)
+
+    def delete(self, positions: list[int], keep: list[bool] | None) -> None:
+        if keep is None:
+            for pos in reversed(positions):
+                del self.data[pos]
+        else:
+            self.data = bytearray(compress(self.data, keep))
+
+    def _mask(self, op: str, value, data: Iterable) -> Iterator:
+        return map(self._truth_table(op, value, [False, True]).__getitem__, data)
+
+
+class StrColumn(ObjectColumn):
+    """Столбец str со словарным кодированием.
+
+    Каждое различное значение хранится один раз, а в столбце лежат
+    32-битные коды значений. Сравнение с константой вычисляется один
+    раз для каждого различного значения, а затем проверяются коды.
+    """
+
+    def __init__(self, values: Iterable = ()):
+        self.data = array('I')
+        self.dictionary: list[str] = []
+        self._codes: dict[str, int] = {}
+        for value in values:
+            self.append(value)
+
+    def accepts(self, value) -> bool:
+        return type(value) is str
+
+    def own(self) -> None:
+        if not isinstance(self.data, array):
+            self.data = _owned_array('I', self.data)
+
+    @classmethod
+    def encoded(cls, dictionary: list[str], codes) -> "StrColumn":
+        """Создаёт столбец из готового словаря и кодов значений.
+
+        Args:
+            dictionary (list[str]): Различные значения столбца.
+            codes: Коды значений — array('I') или отображённый буфер.
+
+        Returns:
+            StrColumn: Столбец без перекодирования значений.
+        """
+        column = cls()
+        column.dictionary = dictionary
+        column._codes = {value: code for code, value in enumerate(dictionary)}
+        column.data = codes
+        return column
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+    def __getitem__(self, pos: int) -> str:
+        return self.dictionary[self.data[pos]]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self.dictionary.__getitem__, self.data)
+
+    def append(self, value: str) -> None:
+        self.data.append(self._code(value))
+
+    def extend(self, values: list) -> bool:
+        if not set(map(type, values)) <= {str}:
+            return False
+        for value in set(values).difference(self._codes):
+            self._code(value)
+        self.data.extend(map(self._codes.__getitem__, values))
+        return True
+
+    def insert(self, pos: int, value: str) -> None:
+        self.data.insert(pos, self._code(value))
+
+    def set(self, pos: int, value: str) -> None:
+        self.data[pos] = self._code(value)
+
+    def delete(self, positions: list[int], keep: list[bool] | None) -> None:
+        if keep is None:
+            for pos in reversed(positions):
+                del self.data[pos]
+        else:
+            self.data = array('I', compress(self.data, keep))
+
+    def _mask(self, op: str, value, data: Iterable) -> Iterator:
+        return map(self._truth_table(op, value, self.dictionary).__getitem__, data)
+
+
+def _keep_positions(found: list[int],
+                    positions: list[int] | None = None) -> list[int]:
+    """Оставляет найденные позиции, которые есть среди проверяемых.
+
+    Args:
+        found (list[int]): Найденные позиции по возрастанию.
+        positions (list[int] | None): Проверяемые позиции по возрастанию;
+            None — вся таблица.
+
+    Returns:
+        list[int]: Позиции по возрастанию.
+    """
+    if positions is None:
+        return found
+    kept = []
+    for pos in found:
+        i = bisect_left(positions, pos)
+        if i < len(positions) and positions[i] == pos:
+            kept.append(pos)
+    return kept
+
+
+def _owned_array(typecode: str, buffer) -> array:
+    data = array(typecode)
+    data.frombytes(memoryview(buffer).cast('B'))
+    return data
+
+
+def _column_for(value) -> ObjectColumn:
+    """Выбирает представление столбца по первому значению."""
+    for column_type in (BoolColumn, IntColumn, StrColumn):
+        column = column_type()
+        if column.accepts(value):
+            return column
+    return ObjectColumn()
+
+
+class ColumnTable:
+    """Данные таблицы, хранящиеся по столбцам.
+
+    Снаружи таблица ведёт себя как последовательность записей-словарей
+    в порядке возрастания ID: len, индексация и перебор возвращают
+    записи, собранные из столбцов. Значения int хранятся в array('q'),
+    bool — в bytearray, str — кодами словаря (см. StrColumn), поэтому
+    запись занимает единицы байт на столбец вместо отдельного словаря.
+    Изменять таблицу нужно её методами: они же запоминают изменённые и
+    удалённые записи со времени последнего сохранения (см. changes).
+    """
+
+    def __init__(self, rows: Iterable[dict] = ()):
+        self._names: list[str] = []
+        self._columns: list[ObjectColumn] = []
+        self._length = 0
+        self._mapped = False
+        self.mark_saved()
+        self.extend(rows)
+
+    @classmethod
+    def mapped(cls, names: list[str], columns: list[ObjectColumn]) -> "ColumnTable":
+        """Создаёт таблицу из готовых столбцов, возможно отображающих файл.
+
+        Столбцы не копируются: их значения читаются прямо из буфера, пока
+        таблица не начнёт изменяться (см. ObjectColumn.own).
+
+        Args:
+            names (list[str]): Имена столбцов.
+            columns (list[ObjectColumn]): Столбцы одинаковой длины.
+
+        Returns:
+            ColumnTable: Таблица, отмеченная как сохранённая.
+        """
+        table = cls()
+        table._names = list(names)
+        table._columns = list(columns)
+        table._length = len(columns[0]) if columns else 0
+        table._mapped = True
+        table.mark_saved()
+        return table
+
+    @classmethod
+    def merged(cls, tables: list["ColumnTable"]) -> "ColumnTable":
+        """Объединяет таблицы с непересекающимися ID в одну.
+
+        Объединение выполняется по столбцам: порядок записей вычисляется
+        один раз сортировкой ID, а затем по нему переставляется каждый
+        столбец.
+
+        Args:
+            tables (list[ColumnTable]): Объединяемые таблицы.
+
+        Returns:
+            ColumnTable: Записи всех таблиц в порядке возрастания ID.
+        """
+        tables = [table for table in tables if table._length]
+        if not tables:
+            return cls()
+        names = tables[0]._names
+        if any(table._names != names for table in tables):
+            return cls(merge(*tables, key=itemgetter("ID")))
+        ids = list(chain.from_iterable(table.ids for table in tables))
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        result = cls()
+        result._names = list(names)
+        for name, sample in zip(names, tables[0]._columns):
+            values = list(chain.from_iterable(table.values(name) for table in tables))
+            values = list(map(values.__getitem__, order))
+            column = type(sample)()
+            if not column.extend(values):
+                column = ObjectColumn(values)
+            result._columns.append(column)
+        result._length = len(ids)
+        return result
+
+    # --- чтение ---
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, pos: int) -> dict:
+        if pos < 0:
+            pos += self._length
+        if not 0 <= pos < self._length:
+            raise IndexError("позиция записи вне таблицы")
+        return {name: column[pos] for name, column in zip(self._names, self._columns)}
+
+    def __iter__(self) -> Iterator[dict]:
+        names = self._names
+        for values in zip(*self._columns):
+            yield dict(zip(names, values))
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._names)
+
+    def typed_columns(self) -> list[tuple[str, ObjectColumn]]:
+        """Возвращает пары (имя, столбец) для записи таблицы на диск."""
+        return list(zip(self._names, self._columns))
+
+    @property
+    def ids(self):
+        """Столбец ID (по возрастанию)."""
+        return self._column("ID").data if self._names else ()
+
+    def values(self, name: str, positions: list[int] | None = None) -> Iterator:
+        """Перебирает значения одного столбца по порядку записей.
+
+        Args:
+            name (str): Имя столбца.
+            positions (list[int] | None): Позиции записей. Если не заданы,
+                перебирается весь столбец.
+
+        Returns:
+            Iterator: Значения столбца. Для отсутствующего столбца — None.
+        """
+        if name not in self._names:
+            return repeat(None, self._length if positions is None else len(positions))
+        if positions is None:
+            return iter(self._column(name))
+        return map(self._column(name).__getitem__, positions)
+
+    def position(self, row_id: int) -> int | None:
+        """Находит позицию записи по ID двоичным поиском.
+
+        Args:
+            row_id (int): ID записи.
+
+        Returns:
+            int | None: Позиция записи или None, если записи нет.
+        """
+        ids = self.ids
+        pos = bisect_left(ids, row_id)
+        if pos < len(ids) and ids[pos] == row_id:
+            return pos
+        return None
+
+    def matcher(self, name: str, op: str, value) -> Callable[..., list[int]]:
+        """Готовит проверку сравнения по столбцу.
+
+        Столбец находится один раз, а сама проверка выполняется сразу по
+        всему столбцу. Равенство ID и in по ID ищутся двоичным поиском
+        каждого ID, без просмотра столбца. Проверку нужно использовать до
+        изменения таблицы.
+
+        Args:
+            name (str): Имя столбца.
+            op (str): Оператор сравнения из COMPARISONS или "in".
+            value: Значение для сравнения, для "in" — множество значений.
+
+        Returns:
+            Callable: Функция от списка проверяемых позиций по возрастанию
+                (None — вся таблица), возвращающая позиции подходящих
+                записей по возрастанию.
+        """
+        if name not in self._names:
+            return lambda positions=None: []
+        if name == "ID" and op in ("=", "in"):
+            ids = value if op == "in" else (value,)
+            if all(type(row_id) is int for row_id in ids):
+                found = sorted(pos for pos in map(self.position, ids)
+                               if pos is not None)
+                return partial(_keep_positions, found)
+        return partial(self._column(name).match, op, value)
+
+    # --- изменение ---
+
+    def append(self, row: dict) -> None:
+        """Добавляет запись в конец таблицы (ID больше всех имеющихся)."""
+        self._insert(self._length, row)
+
+    def extend(self, rows: Iterable[dict]) -> None:
+        """Добавляет записи в конец таблицы.
+
+        Записи добавляются пачками: значения каждого столбца пачки
+        проверяются и дописываются в столбец разом.
+
+        Args:
+            rows (Iterable[dict]): Записи по возрастанию ID, большим всех
+                имеющихся.
+        """
+        for chunk in batched(rows, EXTEND_CHUNK_SIZE):
+            self._own()
+            if not self._names:
+                self._insert(self._length, chunk[0])
+                chunk = chunk[1:]
+            names = dict.fromkeys(self._names).keys()
+            if any(row.keys() != names for row in chunk):
+                for row in chunk:
+                    self._insert(self._length, row)
+                continue
+            for name, column in zip(self._names, self._columns):
+                values = list(map(itemgetter(name), chunk))
+                if not column.extend(values):
+                    self._replace(name, ObjectColumn(column)).extend(values)
+            self._length += len(chunk)
+
+    def upsert(self, row: dict) -> None:
+        """Заменяет запись с тем же ID или вставляет её на место по ID."""
+        if not self._length or row["ID"] > self.ids[-1]:
+            self.append(row)
+            return
+        pos = self.position(row["ID"])
+        if pos is None:
+            self._insert(bisect_left(self.ids, row["ID"]), row)
+            self._touch(row["ID"])
+        else:
+            self.update(pos, row)
+
+    def update(self, pos: int, changes: dict) -> None:
+        """Изменяет значения записи.
+
+        Args:
+            pos (int): Позиция записи.
+            changes (dict): Новые значения (столбец: значение).
+        """
+        self._own()
+        for name, value in changes.items():
+            self._writable(name, value).set(pos, value)
+        self._touch(self.ids[pos])
+
+    def delete(self, positions: list[int]) -> None:
+        """Удаляет записи по позициям.
+
+        Args:
+            positions (list[int]): Позиции по возрастанию.
+        """
+        if not positions:
+            return
+        self._own()
+        ids = self.ids
+        for pos in positions:
+            row_id = ids[pos]
+            if row_id <= self._saved_max_id:
+                self._changed.discard(row_id)
+                self._deleted.add(row_id)
+        keep = None
+        if len(positions) * 8 >= self._length:
+            keep = [True] * self._length
+            for pos in positions:
+                keep[pos] = False
+        for column in self._columns:
+            column.delete(positions, keep)
+        self._length -= len(positions)
+
+    def delete_ids(self, ids: Iterable[int]) -> None:
+        self.delete(sorted(pos for pos in map(self.position, ids)
+                           if pos is not None))
+
+    # --- отслеживание изменений ---
+
+    def mark_saved(self) -> None:
+        """Отмечает текущее состояние таблицы как сохранённое."""
+        self._saved_max_id = self.ids[-1] if self._length else 0
+        self._changed: set[int] = set()
+        self._deleted: set[int] = set()
+        self._rewrite = False
+
+    def changes(self) -> dict | None:
+        """Возвращает изменения со времени последнего сохранения.
+
+        Returns:
+            dict | None: {"upsert": [...], "delete": [...]} — новые и
+                изменённые записи и ID удалённых, или None, если изменено
+                так много записей, что таблицу дешевле записать целиком.
+        """
+        if self._rewrite:
+            return None
+        positions = sorted(pos for pos in map(self.position, self._changed)
+                           if pos is not None)
+        positions.extend(range(bisect_right(self.ids, self._saved_max_id),
+                               self._length))
+        return {"upsert": [self[pos] for pos in sorted(set(positions))],
+                "delete": sorted(self._deleted)}
+
+    def _touch(self, row_id: int) -> None:
+        if self._rewrite or row_id > self._saved_max_id:
+            return
+        self._changed.add(row_id)
+        if len(self._changed) * 2 > self._length:
+            self._rewrite = True
+            self._changed.clear()
+
+    # --- столбцы ---
+
+    def _column(self, name: str) -> ObjectColumn:
+        return self._columns[self._names.index(name)]
+
+    def _writable(self, name: str, value) -> ObjectColumn:
+        """Возвращает столбец, при необходимости расширяя его тип под value."""
+        column = self._column(name)
+        if not column.accepts(value):
+            column = self._replace(name, ObjectColumn(column))
+        return column
+
+    def _replace(self, name: str, column: ObjectColumn) -> ObjectColumn:
+        self._columns[self._names.index(name)] = column
+        return column
+
+    def _own(self) -> None:
+        if self._mapped:
+            for column in self._columns:
+                column.own()
+            self._mapped = False
+
+    def _insert(self, pos: int, row: dict) -> None:
+        self._own()
+        if not self._names:
+            self._names = list(row)
+            self._columns = [_column_for(value) for value in row.values()]
+        for name in row:
+            if name not in self._names:
+                self._names.append(name)
+                self._columns.append(ObjectColumn(repeat(None, self._length)))
+        for name, column in zip(self._names, self._columns):
+            value = row.get(name)
+            if not column.accepts(value):
+                column = self._replace(name, ObjectColumn(column))
+            if pos == self._length:
+                column.append(value)
+            else:
+                column.insert(pos, value)
+        self._length += 1
@@ -1,58 +1,924 @@
 import json
 import os
+import threading
+from contextlib import contextmanager
 
-from .consts import DATA_FOLDER
+from .cache import TableCache, file_stamp
+from .codec import dumps, loads
+from .consts import (
+    META_LOCATION,
+    TABLE_CACHE_BUDGET,
+    TABLE_STATE_KEY,
+    WAL_CHECKPOINT_BYTES,
+    WAL_LOCATION,
+)
+from .index import INDEX_LOG, TableIndexes, build_index
+from .locks import catalog_lock, table_lock, write_locked
+from .metrics import add_count, timed, touch_table
+from .storage import PARTITIONED, get_storage
+from .table import ColumnTable
+from .wal import WriteAheadLog
 
+_metadata_cache = TableCache()
+_table_cache = TableCache(TABLE_CACHE_BUDGET)
+_index_cache = TableCache()
+_wal = WriteAheadLog(WAL_LOCATION)
+# Перенос зафиксированных транзакций в файлы выполняется по одной.
+_write_lock = threading.Lock()
+# Файл и кэш метаданных меняются согласованно.
+_metadata_lock = threading.Lock()
 
+
+class ConflictError(ValueError):
+    """Таблицу, изменённую транзакцией, уже изменил другой процесс."""
+
+
+class _PendingWrites(threading.local):
+    """Незафиксированные изменения метаданных и таблиц текущей транзакции.
+
+    У каждого потока (например, у каждого клиента сервера) своя
+    транзакция.
+
+    Attributes:
+        active (bool): Запись идёт в транзакцию, а не сразу на диск.
+        explicit (bool): Транзакция начата командой begin.
+        group (bool): Изменения копятся до конца group_commit.
+        committed (bool): В текущем group_commit уже записана в журнал
+            хотя бы одна фиксация (см. group_committed).
+        snapshots (dict[str, dict]): Метаданные, впервые прочитанные
+            транзакцией: по отметкам версий в них проверяется, не
+            изменил ли таблицы другой процесс.
+        touched (set[str] | None): Таблицы, метаданные которых изменила
+            транзакция; None — метаданные заменены целиком.
+        indexes (dict[str, TableIndexes]): Индексы таблиц, загруженные
+            транзакцией; их изменения записываются при фиксации.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.explicit = False
+        self.group = False
+        self.committed = False
+        self.metadata: dict[str, dict] = {}
+        self.tables: dict[str, list] = {}
+        self.drops: set[str] = set()
+        self.snapshots: dict[str, dict] = {}
+        self.touched: set[str] | None = set()
+        self.indexes: dict[str, TableIndexes] = {}
+
+
+class _CommitState:
+    """Фиксации, записанные в журнал, но ещё не перенесённые в файлы.
+
+    Журнал можно очистить, только когда таких фиксаций нет.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+
+
+_pending = _PendingWrites()
+_commits = _CommitState()
+
+
+@timed("load")
 def load_metadata(filepath: str) -> dict:
     """Загружает метаданные из json файла.
 
+    Файл перечитывается, только если он изменился с прошлой загрузки.
+
     Args:
         filepath (str): Путь к json файлу с метаданными.
 
     Returns:
         dict: Метаданные в виде словаря. В случае ошибки возвращается пустой словарь.
     """
+    if filepath in _pending.metadata:
+        return _pending.metadata[filepath]
+    data = _stored_metadata(filepath)
+    if _pending.active:
+        _pending.snapshots.setdefault(filepath, data)
+    return data
+
+def _stored_metadata(filepath: str) -> dict:
+    """Возвращает метаданные из файла без изменений текущей транзакции."""
+    with _metadata_lock:
+        stamp = file_stamp(filepath)
+        data = _metadata_cache.get(filepath, stamp)
+        if data is None:
+            data = _read_metadata(filepath)
+            add_count("bytes_read", stamp[1] if stamp else 0)
+            _metadata_cache.put(filepath, stamp, data)
+    return data
+
+def _read_metadata(filepath: str) -> dict:
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
+        with open(filepath, 'rb') as f:
+            return loads(f.read())
     except (FileNotFoundError, json.JSONDecodeError):
         return {}
 
-def save_metadata(filepath: str, data: dict) -> None:
+@timed("save")
+def save_metadata(filepath: str, data: dict,
+                  table_name: str | None = None) -> None:
     """Сохраняет метаданные в json файл.
 
+    Внутри транзакции запись откладывается до её фиксации, а при
+    фиксации в файл переносятся только разделы изменённых таблиц.
+
     Args:
         filepath (str): Путь к json файлу для сохранения метаданных.
         data (dict): Метаданные в виде словаря для сохранения.
+        table_name (str | None): Таблица, метаданные которой изменились;
+            None — метаданные заменяются целиком.
+    """
+    if _pending.active:
+        _pending.metadata[filepath] = data
+        if table_name is None:
+            _pending.touched = None
+        elif _pending.touched is not None:
+            _pending.touched.add(table_name)
+        return
+    # Метаданные сериализуются одним вызовом dumps без отступов: он
+    # быстрее и видит согласованное состояние, даже если другой поток
+    # сервера в это время меняет метаданные своей таблицы. Файл подменяется
+    # целиком, чтобы его не прочитали записанным наполовину.
+    text = dumps(data)
+    with _metadata_lock:
+        with open(filepath + ".tmp", 'wb') as f:
+            f.write(text)
+        os.replace(filepath + ".tmp", filepath)
+        _metadata_cache.put(filepath, file_stamp(filepath), data)
+    add_count("bytes_written", len(text))
+
+def table_names(metadata: dict) -> list[str]:
+    """Возвращает имена таблиц из метаданных без служебного раздела.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+
+    Returns:
+        list[str]: Имена таблиц.
+    """
+    return [name for name in metadata if name != TABLE_STATE_KEY]
+
+def table_version(metadata: dict, table_name: str) -> str | None:
+    """Возвращает отметку версии таблицы.
+
+    Отметка меняется при каждой фиксации, изменившей таблицу, в том числе
+    в другом процессе.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        str | None: Отметка версии или None, если таблицы нет или она
+            ещё не менялась после появления отметок.
+    """
+    return metadata.get(TABLE_STATE_KEY, {}).get(table_name, {}).get("version")
+
+def table_exists(metadata: dict, table_name: str) -> bool:
+    """Проверяет, что таблица есть в метаданных.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        bool: True, если таблица существует.
+    """
+    return table_name != TABLE_STATE_KEY and table_name in metadata
+
+def table_state(metadata: dict, table_name: str) -> dict:
+    """Возвращает служебное состояние таблицы (например, индексы).
+
+    Состояние хранится в разделе TABLE_STATE_KEY метаданных и создаётся
+    при первом обращении.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        dict: Изменяемый словарь состояния таблицы.
+    """
+    return metadata.setdefault(TABLE_STATE_KEY, {}).setdefault(table_name, {})
+
+def peek_next_id(metadata: dict, table_name: str,
+                 table_data: ColumnTable) -> int:
+    """Возвращает следующий ID таблицы, не резервируя его.
+
+    Счётчик next_id хранится в служебном состоянии таблицы. Если его ещё
+    нет или он отстаёт от данных, он выравнивается по последней записи
+    таблицы (записи хранятся по возрастанию ID).
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        table_data (ColumnTable): Данные таблицы.
+
+    Returns:
+        int: Следующий ID.
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    next_id = table_state(metadata, table_name).get("next_id", 1)
+    if table_data and table_data.ids[-1] >= next_id:
+        next_id = table_data.ids[-1] + 1
+    return next_id
+
+def reserve_ids(metadata: dict, table_name: str, table_data: ColumnTable,
+                count: int = 1) -> range:
+    """Резервирует диапазон ID по счётчику таблицы в метаданных.
+
+    ID удалённых записей повторно не выдаются.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        table_data (ColumnTable): Данные таблицы.
+        count (int): Количество резервируемых ID.
+
+    Returns:
+        range: Зарезервированные ID.
+    """
+    next_id = peek_next_id(metadata, table_name, table_data)
+    table_state(metadata, table_name)["next_id"] = next_id + count
+    return range(next_id, next_id + count)
+
+def row_count(metadata: dict, table_name: str) -> int:
+    """Возвращает количество записей таблицы.
+
+    Количество хранится в служебном состоянии таблицы и обновляется при
+    каждом изменении её записей, поэтому таблицу читать не нужно. Для
+    таблиц, созданных до появления счётчика, записи пересчитываются.
 
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        int: Количество записей.
+    """
+    state = table_state(metadata, table_name)
+    if "rows" in state:
+        return state["rows"]
+    return len(load_table_data(table_name))
+
+def set_row_count(metadata: dict, table_name: str, table_data: ColumnTable) -> None:
+    """Запоминает количество записей таблицы в её служебном состоянии.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+        table_data (ColumnTable): Данные таблицы.
+    """
+    table_state(metadata, table_name)["rows"] = len(table_data)
+
+def index_columns(metadata: dict, table_name: str) -> list[str]:
+    """Возвращает столбцы таблицы, по которым построены индексы.
+
+    Сами индексы хранятся в файле индексов таблицы (см. load_indexes), а
+    в служебном состоянии — только список их столбцов.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        list[str]: Имена столбцов.
+    """
+    return list(table_state(metadata, table_name).get("indexes", ()))
+
+def table_indexes(metadata: dict, table_name: str) -> dict:
+    """Возвращает индексы таблицы по столбцам из метаданных.
+
+    Индекс столбца, которого нет в файле индексов (например, если запись
+    файла прервалась), строится по данным таблицы и записывается в файл
+    при следующей фиксации изменений таблицы.
+
+    Args:
+        metadata (dict): Метаданные всех таблиц.
+        table_name (str): Имя таблицы.
+
+    Returns:
+        dict: Индексы (столбец: индекс); пустой словарь, если индексов нет.
+    """
+    columns = index_columns(metadata, table_name)
+    if not columns:
+        return {}
+    indexes = load_indexes(table_name)
+    for column in columns:
+        if column not in indexes:
+            indexes.add(column, build_index(load_table_data(table_name), column,
+                                            metadata[table_name][column]))
+    return {column: indexes[column] for column in columns}
+
+@timed("load")
+def load_indexes(table_name: str) -> TableIndexes:
+    """Загружает индексы таблицы из её файла индексов.
+
+    Как и данные таблицы, индексы хранятся в кэше, пока не изменился их
+    файл, и принадлежат ему. Изменения индексов записываются в файл при
+    фиксации транзакции вместе с данными таблицы (вне транзакции — при
+    save_table_data).
+
+    Args:
+        table_name (str): Имя таблицы.
+
+    Returns:
+        TableIndexes: Индексы таблицы.
+    """
+    if table_name in _pending.indexes:
+        return _pending.indexes[table_name]
+    if table_name in _pending.drops:
+        indexes = TableIndexes()
+    else:
+        lock = table_lock(table_name)
+        lock.acquire(False)
+        try:
+            stamp = file_stamp(INDEX_LOG.path(table_name))
+            indexes = _index_cache.get(table_name, stamp)
+            if indexes is None:
+                indexes = INDEX_LOG.load(table_name)
+                _index_cache.put(table_name, stamp, indexes)
+        finally:
+            lock.release()
+    if _pending.active:
+        _pending.indexes[table_name] = indexes
+    return indexes
+
+def table_storage(table_name: str):
+    """Возвращает хранилище таблицы.
+
+    Для таблиц, у которых ещё нет файлов данных, учитывается схема
+    секционирования из служебного состояния в метаданных.
+
+    Args:
+        table_name (str): Имя таблицы.
+
+    Returns:
+        Хранилище таблицы (см. get_storage).
+    """
+    return get_storage(table_name, _partitions(table_name))
+
+def _partitions(table_name: str) -> dict | None:
+    state = load_metadata(META_LOCATION).get(TABLE_STATE_KEY, {}).get(table_name, {})
+    return state.get("partitions")
+
+@timed("load")
 def load_table_data(table_name):
-    """Загружает данные таблицы из json.
+    """Загружает данные таблицы из её хранилища.
+
+    Разобранные таблицы хранятся в кэше, пока не изменился их файл.
+    Возвращаемая таблица принадлежит кэшу: после изменения её нужно
+    сохранить через save_table_data или сбросить через invalidate_cache.
+    Файл читается под общей блокировкой таблицы, поэтому другой процесс
+    не может в это время записывать в него изменения.
 
     Args:
         table_name (str): Имя таблицы для загрузки данных.
 
     Returns:
-        list: Данные в виде списка. В случае ошибки возвращается пустой список.
+        ColumnTable: Данные таблицы. В случае ошибки возвращается
+            пустая таблица.
     """
+    touch_table(table_name)
+    if table_name in _pending.tables:
+        return _pending.tables[table_name]
+    if table_name in _pending.drops:
+        return ColumnTable()
+    lock = table_lock(table_name)
+    lock.acquire(False)
     try:
-        with open(f'{DATA_FOLDER}/{table_name}.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
+        storage = table_storage(table_name)
+        stamp = file_stamp(storage.path(table_name))
+        data = _table_cache.get(table_name, stamp)
+        if data is None:
+            data = storage.load(table_name)
+            _table_cache.put(table_name, stamp, data,
+                             _cached_size(storage, table_name, stamp))
+    finally:
+        lock.release()
+    return data
+
+def scan_partitions(table_name: str, func, *args) -> list | None:
+    """Обрабатывает сегменты секционированной таблицы в пуле процессов.
+
+    Пул используется, если сегментов несколько и они достаточно велики
+    (см. PartitionedStorage.parallel), независимо от того, загружена ли
+    таблица в память: процессы пула держат прочитанные ими сегменты в
+    своих кэшах. Таблицу, изменённую текущей транзакцией, можно
+    просмотреть только на месте. Сегменты читаются под общей
+    блокировкой таблицы.
+
+    Args:
+        table_name (str): Имя таблицы.
+        func (Callable): Функция модуля от данных сегмента и args (см.
+            PartitionedStorage.scan).
+        *args: Остальные аргументы func.
+
+    Returns:
+        list | None: Результаты func по сегментам или None, если таблицу
+            нужно загрузить через load_table_data.
+    """
+    if table_name in _pending.tables or table_name in _pending.drops:
+        return None
+    storage = table_storage(table_name)
+    if storage is not PARTITIONED:
+        return None
+    touch_table(table_name)
+    lock = table_lock(table_name)
+    lock.acquire(False)
+    try:
+        if not storage.parallel(table_name):
+            return None
+        return storage.scan(table_name, func, *args)
+    finally:
+        lock.release()
 
+@timed("save")
 def save_table_data(table_name, data):
-    """Сохраняет данные таблицы в json файл.
+    """Сохраняет данные таблицы в её хранилище.
+
+    Внутри транзакции запись откладывается до её фиксации, а вне её
+    вместе с данными записываются и изменения индексов таблицы.
 
     Args:
         table_name (str): Имя таблицы для сохранения данных.
-        data (list): Данные в виде списка для сохранения.
+        data (ColumnTable): Данные таблицы для сохранения.
+    """
+    touch_table(table_name)
+    if _pending.active:
+        _pending.tables[table_name] = data
+        return
+    _store_table(table_name, data)
+    indexes = _index_cache.get(table_name, file_stamp(INDEX_LOG.path(table_name)))
+    if indexes is not None:
+        _store_indexes(table_name, indexes.drain(), indexes)
+
+def _store_table(table_name: str, data: ColumnTable) -> None:
+    storage = table_storage(table_name)
+    if storage is PARTITIONED and not storage.exists(table_name):
+        storage.create(table_name, _partitions(table_name))
+    storage.save(table_name, data)
+    stamp = file_stamp(storage.path(table_name))
+    _table_cache.put(table_name, stamp, data, _cached_size(storage, table_name, stamp))
+
+def _cached_size(storage, table_name: str, stamp) -> int:
+    """Оценивает размер таблицы в кэше по размеру её файлов на диске.
+
+    Файл описания секционированной таблицы мал, поэтому для неё
+    учитываются её сегменты.
+    """
+    if storage is PARTITIONED:
+        return storage.size(table_name)
+    return stamp[1] if stamp else 0
+
+def _store_indexes(table_name: str, records: list[dict],
+                   indexes: TableIndexes | None = None) -> None:
+    """Записывает изменения индексов таблицы (см. IndexLog.save)."""
+    indexes = INDEX_LOG.save(table_name, records, indexes)
+    if indexes is not None:
+        _index_cache.put(table_name, file_stamp(INDEX_LOG.path(table_name)),
+                         indexes)
+
+def delete_table_data(table_name):
+    """Удаляет файлы данных и индексов таблицы.
+
+    Внутри транзакции файлы удаляются при её фиксации.
+
+    Args:
+        table_name (str): Имя таблицы.
+    """
+    if _pending.active:
+        _pending.tables.pop(table_name, None)
+        _pending.indexes.pop(table_name, None)
+        _pending.drops.add(table_name)
+        return
+    get_storage(table_name).remove(table_name)
+    INDEX_LOG.remove(table_name)
+    _table_cache.invalidate(table_name)
+    _index_cache.invalidate(table_name)
+
+def _locked_tables() -> set[str]:
+    """Возвращает таблицы, которые изменяет фиксация транзакции."""
+    names = _pending.tables.keys() | _pending.drops
+    if _pending.touched is None:
+        return names | _pending.indexes.keys()
+    return names | _pending.touched
+
+def _transaction_record() -> dict:
+    """Собирает запись журнала из незафиксированных изменений.
+
+    Метаданные записываются только разделами изменённых таблиц (схема и
+    служебное состояние) с новыми отметками версий, а при переносе в
+    файл накладываются на его текущее содержимое: изменения других
+    таблиц, сделанные другими процессами и потоками, сохраняются.
+    Данные таблиц записываются только изменёнными записями и ID
+    удалённых (см. changes хранилищ), а индексы — только изменёнными
+    парами (см. TableIndexes.drain), поэтому размер записи зависит от
+    объёма изменений, а не от размера таблиц.
+
+    Raises:
+        ConflictError: Если изменённую таблицу после начала транзакции
+            изменил другой процесс.
+    """
+    changed = _pending.tables.keys() | _pending.drops
+    sources = dict(_pending.metadata)
+    if changed and META_LOCATION not in sources:
+        sources[META_LOCATION] = _pending.snapshots.get(META_LOCATION) \
+            or _stored_metadata(META_LOCATION)
+    version = os.urandom(8).hex()
+    metadata, touched = {}, {}
+    for filepath, data in sources.items():
+        stored = _stored_metadata(filepath)
+        if _pending.touched is None:
+            names = set(table_names(data)) | set(table_names(stored))
+        else:
+            names = _pending.touched | changed
+        snapshot = _pending.snapshots.get(filepath)
+        for table_name in sorted(names):
+            if snapshot is not None and \
+                    table_version(snapshot, table_name) != table_version(stored,
+                                                                         table_name):
+                raise ConflictError(
+                    f'Таблица "{table_name}" изменена другим процессом.')
+        metadata[filepath] = _sections(data, names, version)
+        touched[filepath] = sorted(names)
+    tables = {}
+    for table_name, data in _pending.tables.items():
+        if table_name in _pending.drops:
+            tables[table_name] = {"rows": list(data)}
+        else:
+            tables[table_name] = table_storage(table_name).changes(table_name, data)
+    locked = _locked_tables()
+    indexes = {}
+    for table_name, loaded in _pending.indexes.items():
+        records = loaded.drain() if table_name in locked else None
+        if records:
+            indexes[table_name] = records
+    return {"metadata": metadata, "touched": touched,
+            "drop": sorted(_pending.drops), "tables": tables, "indexes": indexes}
+
+def _sections(metadata: dict, names, version: str) -> dict:
+    """Выделяет из метаданных разделы таблиц с новой отметкой версии.
+
+    Индексы в разделах представлены только списком столбцов: сами
+    индексы, которые прежние версии хранили в метаданных, отбрасываются
+    (см. table_indexes).
+    """
+    states = metadata.get(TABLE_STATE_KEY, {})
+    sections: dict = {TABLE_STATE_KEY: {}}
+    for table_name in names:
+        if table_name in metadata:
+            sections[table_name] = metadata[table_name]
+            state = {**states.get(table_name, {}), "version": version}
+            if "indexes" in state:
+                state["indexes"] = list(state["indexes"])
+            sections[TABLE_STATE_KEY][table_name] = state
+    return sections
+
+def _merge_sections(stored: dict, sections: dict, names) -> dict:
+    """Накладывает разделы таблиц names на метаданные из файла.
+
+    Таблицы из names, которых нет в sections, удаляются.
+    """
+    merged = {**stored}
+    states = merged[TABLE_STATE_KEY] = {**stored.get(TABLE_STATE_KEY, {})}
+    for table_name in names:
+        if table_name in sections:
+            merged[table_name] = sections[table_name]
+            states[table_name] = sections[TABLE_STATE_KEY][table_name]
+        else:
+            merged.pop(table_name, None)
+            states.pop(table_name, None)
+    return merged
+
+def _apply_changes(table_data: ColumnTable, changes: dict) -> ColumnTable:
+    """Применяет изменения таблицы из записи журнала.
+
+    Изменения применяются к таблице из файла: повторное применение
+    ничего не меняет, а записи, не дошедшие до файла, добавляются.
+    """
+    if "rows" in changes:
+        return ColumnTable(changes["rows"])
+    table_data.delete_ids(changes["delete"])
+    for row in changes["upsert"]:
+        table_data.upsert(row)
+    return table_data
+
+def _write_through(metadata: dict, drops, tables: dict,
+                   touched: dict | None = None, indexes: dict | None = None,
+                   loaded: dict | None = None) -> None:
+    """Записывает изменения в файлы метаданных, таблиц и индексов.
+
+    Метаданные записываются раньше данных, чтобы счётчики ID никогда
+    не отставали от сохранённых записей. Для файлов из touched
+    записываются только разделы перечисленных в нём таблиц (см.
+    _merge_sections), остальные файлы метаданных заменяются целиком.
+    Записи индексов из indexes применяются к индексам из loaded, а для
+    таблиц, которых там нет, — к индексам из файла.
+    """
+    for filepath, data in metadata.items():
+        if touched is not None and filepath in touched:
+            data = _merge_sections(_stored_metadata(filepath), data,
+                                   touched[filepath])
+        save_metadata(filepath, data)
+    for table_name in drops:
+        delete_table_data(table_name)
+    for table_name, data in tables.items():
+        _store_table(table_name, data)
+    for table_name, records in (indexes or {}).items():
+        _store_indexes(table_name, records, (loaded or {}).get(table_name))
+
+def _replay(record: dict) -> None:
+    """Переносит в файлы транзакцию из записи журнала.
+
+    Повторный перенос уже перенесённой транзакции ничего не меняет, если
+    записи журнала переносятся по порядку. Таблицы читаются из файлов в
+    обход кэша: закэшированную таблицу может изменять на месте
+    незафиксированная транзакция, и её изменения не должны попасть в
+    файлы раньше журнала.
+    """
+    indexes = record.get("indexes", {})
+    with write_locked(record["tables"].keys() | set(record["drop"])
+                      | indexes.keys()):
+        tables = {
+            table_name: _apply_changes(
+                ColumnTable() if table_name in record["drop"]
+                else table_storage(table_name).load(table_name),
+                changes,
+            )
+            for table_name, changes in record["tables"].items()
+        }
+        _write_through(record["metadata"], record["drop"], tables,
+                       record.get("touched"), indexes)
+
+@contextmanager
+def _outside_transaction():
+    """Временно выводит поток из его транзакции."""
+    saved = vars(_pending).copy()
+    _PendingWrites.__init__(_pending)
+    try:
+        yield
+    finally:
+        vars(_pending).update(saved)
+
+def _catch_up() -> None:
+    """Переносит в файлы транзакции, которые не перенёс упавший процесс.
+
+    Вызывается под монопольной блокировкой каталога, когда у процесса
+    нет своих неперенесённых фиксаций: всё, что записано в журнал дальше
+    отметки переноса (см. WriteAheadLog.mark_applied), зафиксировал
+    процесс, завершившийся посреди фиксации.
+    """
+    with _outside_transaction():
+        replayed = False
+        for record in _wal.records(_wal.applied()):
+            _replay(record)
+            replayed = True
+        if replayed:
+            _wal.mark_applied()
+
+def _end_transaction() -> None:
+    _pending.metadata = {}
+    _pending.tables = {}
+    _pending.drops = set()
+    _pending.snapshots = {}
+    _pending.touched = set()
+    _pending.indexes = {}
+    _pending.explicit = False
+    _pending.active = _pending.group
+
+def in_transaction() -> bool:
+    """Проверяет, начата ли транзакция командой begin.
+
+    Returns:
+        bool: True, если есть незавершённая явная транзакция.
+    """
+    return _pending.explicit
+
+def begin_transaction(explicit: bool = True) -> None:
+    """Начинает транзакцию.
+
+    Изменения, накопленные в group_commit до начала явной транзакции,
+    предварительно фиксируются.
+
+    Args:
+        explicit (bool): Транзакция начата командой begin.
+
+    Raises:
+        ValueError: Если явная транзакция уже начата.
+    """
+    if _pending.explicit:
+        raise ValueError("Транзакция уже начата.")
+    if _pending.active:
+        commit_transaction()
+    _pending.active = True
+    _pending.explicit = explicit
+
+@timed("save")
+def commit_transaction() -> None:
+    """Фиксирует транзакцию.
+
+    Изменения записываются в журнал одной записью и сбрасываются на
+    диск (fsync), после чего переносятся в файлы метаданных и таблиц.
+    Если процесс упадёт до переноса, recover повторит его при
+    следующем запуске. Файлы обновляются одной фиксацией за раз, а
+    журнал очищается, когда вырастает больше WAL_CHECKPOINT_BYTES и
+    все записанные в него фиксации уже перенесены в файлы.
+
+    Фиксация идёт под монопольными блокировками каталога и изменённых
+    таблиц (см. write_locked), так что процессы, работающие с одной
+    базой, фиксируют транзакции по очереди. Если изменённую таблицу
+    после начала транзакции успел изменить другой процесс, транзакция
+    отменяется.
+
+    Raises:
+        ConflictError: Если транзакция отменена из-за изменений другого
+            процесса.
+    """
+    pending = _pending.metadata, _pending.drops, _pending.tables
+    if not any(pending):
+        _end_transaction()
+        return
+    loaded = _pending.indexes
+    with write_locked(_locked_tables()):
+        with _write_lock:
+            if not _commits.in_flight:
+                _catch_up()
+            _commits.in_flight += 1
+        try:
+            record = _transaction_record()
+            _wal.commit(record)
+            _pending.committed |= _pending.group
+        except BaseException:
+            with _write_lock:
+                _commits.in_flight -= 1
+            rollback_transaction()
+            raise
+        _end_transaction()
+        active, _pending.active = _pending.active, False
+        with _write_lock:
+            try:
+                _write_through(record["metadata"], pending[1], pending[2],
+                               record["touched"], record["indexes"], loaded)
+            finally:
+                _pending.active = active
+                _commits.in_flight -= 1
+            if not _commits.in_flight:
+                if _wal.size() > WAL_CHECKPOINT_BYTES:
+                    _wal.reset()
+                else:
+                    _wal.mark_applied()
+
+def rollback_transaction() -> None:
+    """Отменяет транзакцию.
+
+    Незафиксированные изменения отбрасываются вместе с закэшированными
+    таблицами и индексами, которые они изменили на месте.
+    """
+    for table_name in _pending.tables.keys() | _pending.drops:
+        _table_cache.invalidate(table_name)
+    for table_name in _pending.indexes:
+        _index_cache.invalidate(table_name)
+    _metadata_cache.invalidate()
+    _end_transaction()
+
+def flush_writes():
+    """Фиксирует изменения, накопленные в group_commit вне явной транзакции."""
+    if _pending.active and not _pending.explicit:
+        commit_transaction()
+
+@contextmanager
+def transaction():
+    """Выполняет блок в транзакции, если транзакция ещё не начата.
+
+    При выходе из блока транзакция фиксируется, при исключении —
+    отменяется. Внутри уже начатой транзакции блок просто выполняется.
+    Если в блоке начата явная транзакция (команда begin), она остаётся
+    открытой.
+    """
+    if _pending.active:
+        yield
+        return
+    begin_transaction(explicit=False)
+    try:
+        yield
+    except BaseException:
+        if not _pending.explicit:
+            rollback_transaction()
+        raise
+    if _pending.active and not _pending.explicit:
+        commit_transaction()
+
+@contextmanager
+def group_commit():
+    """Объединяет изменения всех команд блока в одну фиксацию.
+
+    Пока блок выполняется, save_metadata и save_table_data только
+    запоминают новое состояние, а load_metadata и load_table_data
+    возвращают его. При выходе изменения фиксируются одной записью
+    журнала и одним fsync, а каждый изменённый файл записывается один
+    раз. Явные транзакции внутри блока фиксируются отдельно.
+    """
+    if _pending.group:
+        yield
+        return
+    begin_transaction(explicit=False)
+    _pending.group = True
+    _pending.committed = False
+    try:
+        yield
+    finally:
+        _pending.group = False
+        if _pending.explicit:
+            rollback_transaction()
+        commit_transaction()
+
+def group_committed() -> bool:
+    """Проверяет, зафиксировал ли последний group_commit что-то до своей
+    итоговой фиксации.
+
+    Изменения, накопленные до команды begin, и явные транзакции внутри
+    блока фиксируются отдельно. Если после них итоговая фиксация
+    отменена из-за конфликта, блок нельзя выполнить повторно: его
+    зафиксированные изменения применились бы дважды.
+
+    Returns:
+        bool: True, если в блоке уже была успешная фиксация.
+    """
+    return _pending.committed
+
+def checkpoint() -> None:
+    """Очищает журнал, если все транзакции уже перенесены в файлы."""
+    if not _pending.active:
+        with catalog_lock().locked(True), _write_lock:
+            if not _commits.in_flight:
+                _catch_up()
+                _wal.reset()
+
+def recover() -> int:
+    """Переносит в файлы транзакции, зафиксированные в журнале.
+
+    Вызывается при запуске: транзакции, записанные в журнал целиком,
+    применяются повторно (повторное применение ничего не меняет), а
+    оборванная последняя запись отбрасывается. После этого журнал
+    очищается. Повторяются все записи журнала, а не только записанные
+    после отметки переноса: после сбоя питания файлы таблиц, в отличие
+    от журнала, могли не дойти до диска.
+
+    Returns:
+        int: Количество транзакций, не перенесённых в файлы до запуска.
+    """
+    with catalog_lock().locked(True):
+        # Записи до отметки переноса перенесли в файлы процессы, которые
+        # работают с базой или завершились штатно; они не считаются
+        # восстановленными.
+        count = sum(1 for _ in _wal.records(_wal.applied()))
+        for record in _wal.records():
+            _replay(record)
+        _wal.reset()
+    return count
+
+def table_cache_stats() -> dict:
+    """Возвращает счётчики кэша таблиц.
+
+    Returns:
+        dict: Количество записей, объём и счётчики попаданий, промахов,
+            вытеснений и сбросов.
+    """
+    return _table_cache.stats()
+
+def invalidate_cache(table_name=None):
+    """Сбрасывает закэшированные данные и индексы таблицы и метаданные.
+
+    Нужно вызывать, если загруженные данные были изменены, но не сохранены.
+    Для одной таблицы её схема и служебное состояние возвращаются к
+    сохранённым в файле прямо в закэшированных метаданных: метаданные
+    остальных таблиц в это время могут менять другие клиенты сервера.
+    Метаданные незафиксированной транзакции не сбрасываются.
+
+    Args:
+        table_name (str, optional): Имя таблицы. Если не указано,
+            сбрасываются все таблицы.
     """
-    os.makedirs(DATA_FOLDER, exist_ok=True)
-    with open(f'{DATA_FOLDER}/{table_name}.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4)
+    _table_cache.invalidate(table_name)
+    _index_cache.invalidate(table_name)
+    if table_name is None:
+        _metadata_cache.invalidate()
+        return
+    if META_LOCATION in _pending.metadata:
+        return
+    metadata = load_metadata(META_LOCATION)
+    with _metadata_lock:
+        saved = _read_metadata(META_LOCATION)
+    sections = ((metadata, saved),
+                (metadata.get(TABLE_STATE_KEY), saved.get(TABLE_STATE_KEY)))
+    for section, stored in sections:
+        if section is None:
+            continue
+        if stored and table_name in stored:
+            section[table_name] = stored[table_name]
+        else:
+            section.pop(table_name, None)
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Пустой каталог базы данных, ставший текущим.
+
+    Пути к данным, метаданным и журналу транзакций задаются
+    относительно текущего каталога (см. consts).
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+
+@pytest.fixture
+def python(database):
+    """Выполняет код в отдельном процессе в каталоге базы данных.
+
+    Возвращает функцию python(code), которая возвращает вывод процесса
+    и проверяет, что он завершился без ошибок.
+    """
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+
+    def run(code: str) -> str:
+        result = subprocess.run([sys.executable, "-c", code], cwd=database,
+                                env=env, capture_output=True, text=True,
+                                timeout=120)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+    return run
+
+
+@pytest.fixture
+def cli(database):
+    """Выполняет команды скриптом в отдельном процессе приложения.
+
+    Возвращает функцию cli(*statements), которая запускает main -y -e
+    с командами через «;» и возвращает результат процесса.
+    """
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+
+    def run(*statements: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "src.primitive_db.main", "-y", "-e",
+             "; ".join(statements)],
+            cwd=database, env=env, capture_output=True, text=True, timeout=120,
+        )
+    return run
@@ -0,0 +1,115 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Код, выполняемый в отдельном процессе: other_process() вставляет запись
+# в таблицу t из ещё одного процесса приложения.
+WITH_OTHER_PROCESS = """
+import subprocess, sys
+from src.primitive_db import engine
+
+def other_process():
+    subprocess.run([sys.executable, "-m", "src.primitive_db.main", "-y", "-e",
+                    'insert into t values ("other")'], check=True)
+"""
+
+# Другой процесс изменяет таблицу перед первой итоговой фиксацией скрипта.
+SCRIPT_WITH_CONFLICT = WITH_OTHER_PROCESS + """
+flush_writes = engine.flush_writes
+flushes = []
+
+def conflicting_flush():
+    if not flushes:
+        other_process()
+    flushes.append(1)
+    flush_writes()
+
+engine.flush_writes = conflicting_flush
+engine.run_script({statements!r}, True)
+"""
+
+STATE = """
+import json
+from src.primitive_db import utils
+from src.primitive_db.index import build_index, index_entries
+metadata = utils.load_metadata("db_meta.json")
+data = utils.load_table_data("t")
+indexes = utils.table_indexes(metadata, "t")
+print(json.dumps({
+    "names": sorted(row["name"] for row in data),
+    "ids": [row["ID"] for row in data],
+    "indexes_ok": all(
+        index_entries(index)
+        == index_entries(build_index(data, column, metadata["t"][column]))
+        for column, index in indexes.items()
+    ),
+}))
+"""
+
+
+def state(python) -> dict:
+    return json.loads(python(STATE))
+
+
+def test_concurrent_inserts_keep_every_row(cli, python):
+    cli("create_table t name:str n:int", "create_index t n",
+        "create_index t name")
+
+    def single(worker):
+        return [cli(f'insert into t values ("w{worker}", {i})')
+                for i in range(8)]
+
+    def script(worker):
+        return [cli(*(f'insert into t values ("s{worker}", {i})'
+                      for i in range(20)))]
+
+    with ThreadPoolExecutor(6) as pool:
+        futures = [pool.submit(single, w) for w in range(4)]
+        futures += [pool.submit(script, w) for w in range(2)]
+        results = [result for future in futures for result in future.result()]
+
+    for result in results:
+        assert result.returncode == 0, result.stderr
+        assert "Ошибка" not in result.stdout
+    final = state(python)
+    assert final["ids"] == list(range(1, 4 * 8 + 2 * 20 + 1))
+    assert final["indexes_ok"]
+
+
+def test_commit_conflict_rolls_back_transaction(cli, python):
+    cli("create_table t name:str")
+
+    output = python(WITH_OTHER_PROCESS + """
+engine.open_database()
+for text in ["begin", 'insert into t values ("mine")']:
+    engine.execute(engine.prepare_statement(text))
+other_process()
+engine.execute(engine.prepare_statement("commit"))
+""")
+
+    assert 'Ошибка: Таблица "t" изменена другим процессом. Транзакция ' \
+        'отменена' in output
+    assert state(python)["names"] == ["other"]
+
+
+def test_script_is_retried_after_conflict(cli, python):
+    cli("create_table t name:str")
+
+    output = python(SCRIPT_WITH_CONFLICT.format(statements=[
+        'insert into t values ("a")', 'insert into t values ("b")',
+    ]))
+
+    assert "Скрипт выполняется повторно." in output
+    assert state(python)["names"] == ["a", "b", "other"]
+
+
+def test_script_is_not_rerun_after_explicit_commit(cli, python):
+    cli("create_table t name:str")
+
+    output = python(SCRIPT_WITH_CONFLICT.format(statements=[
+        'insert into t values ("a")', "begin", 'insert into t values ("b")',
+        "commit", 'insert into t values ("c")',
+    ]))
+
+    assert "Скрипт выполняется повторно." not in output
+    assert "не сохранены и не повторяются" in output
+    assert state(python)["names"] == ["a", "b", "other"]
@@ -0,0 +1,113 @@
+import os
+from itertools import permutations
+
+import pytest
+
+from src.primitive_db.storage import (
+    STORAGES,
+    BinaryStorage,
+    CompressedStorage,
+    JsonStorage,
+    LogStorage,
+    PartitionedStorage,
+    get_storage,
+    migrate_table,
+)
+from src.primitive_db.table import ColumnTable
+
+ROWS = [
+    {"ID": 1, "name": "Анна", "age": 31, "active": True},
+    {"ID": 2, "name": "Boris", "age": -7, "active": False},
+    {"ID": 3, "name": "", "age": 2**40, "active": True},
+    {"ID": 5, "name": "Анна", "age": 0, "active": False},
+]
+
+FACTORIES = {
+    "json": JsonStorage,
+    "log": LogStorage,
+    "bin": BinaryStorage,
+    "zlib": lambda: CompressedStorage("zlib"),
+    "lzma": lambda: CompressedStorage("lzma"),
+}
+
+
+def reopen(name: str):
+    """Новый экземпляр хранилища: данные читаются с диска, а не из памяти."""
+    return FACTORIES[name]()
+
+
+def save(storage, table_name: str, data: ColumnTable) -> None:
+    """Записывает таблицу и дожидается фонового сжатия журнала."""
+    storage.save(table_name, data)
+    if hasattr(storage, "wait"):
+        storage.wait()
+
+
+def save_and_load(storage, fresh, table_name: str, data: ColumnTable) -> list:
+    save(storage, table_name, data)
+    return list(fresh.load(table_name))
+
+
+@pytest.mark.parametrize("name", FACTORIES)
+def test_round_trip(database, name):
+    storage = reopen(name)
+    assert save_and_load(storage, reopen(name), "users", ColumnTable(ROWS)) == ROWS
+
+
+@pytest.mark.parametrize("name", FACTORIES)
+def test_round_trip_after_changes(database, name):
+    storage = reopen(name)
+    save(storage, "users", ColumnTable(ROWS))
+    data = storage.load("users")
+    data.upsert({"ID": 2, "name": "Борис", "age": 8, "active": True})
+    data.delete_ids([3])
+    data.append({"ID": 6, "name": "new", "age": 1, "active": False})
+
+    expected = [ROWS[0], {"ID": 2, "name": "Борис", "age": 8, "active": True},
+                ROWS[3], {"ID": 6, "name": "new", "age": 1, "active": False}]
+    assert save_and_load(storage, reopen(name), "users", data) == expected
+
+
+@pytest.mark.parametrize("name", FACTORIES)
+def test_empty_table(database, name):
+    storage = reopen(name)
+    assert save_and_load(storage, reopen(name), "empty", ColumnTable()) == []
+    assert reopen(name).exists("empty")
+
+
+@pytest.mark.parametrize("partitions", [
+    {"kind": "hash", "column": "name", "segments": 3},
+    {"kind": "range", "column": "age", "bounds": [0, 100]},
+])
+def test_partitioned_round_trip(database, partitions):
+    storage = PartitionedStorage()
+    storage.create("users", partitions)
+    data = ColumnTable(ROWS)
+    assert save_and_load(storage, PartitionedStorage(), "users", data) == ROWS
+
+    data = storage.load("users")
+    data.upsert({"ID": 1, "name": "Зоя", "age": 500, "active": False})
+    data.delete_ids([2])
+    expected = [{"ID": 1, "name": "Зоя", "age": 500, "active": False},
+                ROWS[2], ROWS[3]]
+    assert save_and_load(storage, PartitionedStorage(), "users", data) == expected
+
+
+@pytest.mark.parametrize("source,target", list(permutations(FACTORIES, 2)))
+def test_migrate_table(database, source, target):
+    save(STORAGES[source], "users", ColumnTable(ROWS))
+
+    migrate_table("users", target)
+
+    assert get_storage("users").name == target
+    assert not os.path.exists(STORAGES[source].path("users"))
+    assert list(reopen(target).load("users")) == ROWS
+
+
+def test_migrate_table_rejects_same_and_unknown_storage(database):
+    save(STORAGES["json"], "users", ColumnTable(ROWS))
+    with pytest.raises(ValueError, match="уже хранится"):
+        migrate_table("users", "json")
+    with pytest.raises(ValueError, match="Неизвестное хранилище"):
+        migrate_table("users", "csv")
+    assert list(reopen("json").load("users")) == ROWS
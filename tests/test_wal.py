@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from src.primitive_db.consts import DEFAULT_STORAGE
+from src.primitive_db.storage import STORAGES
+
+SETUP = """
+from src.primitive_db.engine import run_script
+run_script({statements!r}, True)
+"""
+
+# Процесс завершается сразу после записи транзакции в журнал, до её
+# переноса в файлы таблиц.
+CRASH = """
+import os
+from src.primitive_db import engine, utils
+utils._write_through = lambda *args, **kwargs: os._exit(0)
+engine.run_script(['insert into t values ("b", 2)', 'insert into t values ("c", 2)',
+                   'update t set age = 5 where name = "a"'], True)
+"""
+
+RECOVER = """
+import json
+from src.primitive_db import utils
+from src.primitive_db.engine import open_database
+from src.primitive_db.index import build_index, index_entries
+open_database()
+metadata = utils.load_metadata("db_meta.json")
+data = utils.load_table_data("t")
+index = utils.table_indexes(metadata, "t")["age"]
+print(json.dumps({
+    "rows": sorted([row["name"], row["age"]] for row in data),
+    "index_ok": index_entries(index) == index_entries(build_index(data, "age", "int")),
+    "next_id": utils.peek_next_id(metadata, "t", data),
+}))
+"""
+
+ROWS = """
+from src.primitive_db import utils
+print(sorted(row["name"] for row in utils.load_table_data("t")))
+"""
+
+
+def setup(python, storage: str = DEFAULT_STORAGE) -> None:
+    statements = ["create_table t name:str age:int",
+                  'insert into t values ("a", 1)', "create_index t age"]
+    if storage != DEFAULT_STORAGE:
+        statements.append(f"migrate t {storage}")
+    python(SETUP.format(statements=statements))
+
+
+def recovered(python) -> tuple[str, dict]:
+    *messages, state = python(RECOVER).splitlines()
+    return "\n".join(messages), json.loads(state)
+
+
+@pytest.mark.parametrize("storage", list(STORAGES))
+def test_recovery_replays_committed_transaction(database, python, storage):
+    setup(python, storage)
+    assert STORAGES[storage].exists("t")
+    python(CRASH)
+    assert python(ROWS).strip() == "['a']"
+    assert (database / "db_wal.log").stat().st_size > 0
+
+    message, state = recovered(python)
+
+    assert "Восстановлено транзакций из журнала: 1." in message
+    assert state == {"rows": [["a", 5], ["b", 2], ["c", 2]], "index_ok": True,
+                     "next_id": 4}
+    assert not (database / "db_wal.log").exists() \
+        or (database / "db_wal.log").stat().st_size == 0
+
+
+def test_recovery_drops_torn_last_record(database, python):
+    setup(python)
+    python(CRASH)
+    with open(database / "db_wal.log", "a", encoding="utf-8") as f:
+        f.write('{"metadata": {"db_meta.json": {"t": ')
+
+    message, state = recovered(python)
+
+    assert "Восстановлено транзакций из журнала: 1." in message
+    assert state["rows"] == [["a", 5], ["b", 2], ["c", 2]]
+
+
+def test_recovered_state_survives_restart(database, python):
+    setup(python)
+    python(CRASH)
+    _, state = recovered(python)
+
+    message, restarted = recovered(python)
+
+    assert "Восстановлено" not in message
+    assert restarted == state